@@ -1,9 +1,29 @@
 from json import loads
-from dash import Dash, html, dcc, callback, Input, Output, State
+from dash import Dash, html, dcc, callback, clientside_callback, Input, Output, State, dash_table, no_update
 import dash_bootstrap_components as dbc
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.serving import ChatMessage, ChatMessageRole
 from databricks.sdk.errors import DatabricksError
+from databricks.sdk.core import Config
+from databricks import sql
+from utils.batch_eval import BatchEvaluator, read_prompts, summarize
+from utils.batch_scoring import BatchScorer, read_scoring_input, write_parquet
+from utils.chat_memory import Conversation, endpoint_summarizer, to_chat_messages
+from utils.endpoint_catalog import EndpointCatalog, llm_request, validate_records
+from utils.llm_stream import ChatStream, chat_messages
+from utils.openai_client import openai_client_provider
+from utils.request_batcher import RequestBatcher
+from utils.resilient_invoke import ResilientInvoker
+from utils.response_cache import DEFAULT_CACHE_DIR, ResponseCache
+from utils.ttl_cache import TTLCache
+from flask import Response, abort, stream_with_context
+import pandas as pd
+import base64
+import io
+import itertools
+import json
+import time
+import uuid
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import dash
 
 # pages/ml_serving_invoke.py
@@ -22,16 +42,183 @@ try:
 except Exception:
     w = None
 
+# Adaptive timeouts, hedging and retries for the serving calls of this page. The SDK's
+# own 429/503 retries are kept short so that the invoker's backoff applies.
+try:
+    invoker = ResilientInvoker(WorkspaceClient(config=Config(retry_timeout_seconds=1)))
+    invoker_error = None
+except Exception as e:
+    invoker = None
+    invoker_error = str(e)
+
+def require_invoker():
+    if invoker is None:
+        raise RuntimeError(f"The serving client could not be set up: {invoker_error}")
+    return invoker
+
+# Endpoint list and schemas, refreshed every few minutes instead of on every page load
+endpoint_catalog = EndpointCatalog(w) if w is not None else None
+
 def get_endpoints():
     """Safely get endpoints with error handling"""
     try:
-        if w is not None:
-            endpoints = w.serving_endpoints.list()
-            return [endpoint.name for endpoint in endpoints]
+        if endpoint_catalog is not None:
+            return endpoint_catalog.names()
     except DatabricksError:
         pass
     return []
 
+def get_endpoint(name):
+    try:
+        return endpoint_catalog.get(name) if endpoint_catalog is not None and name else None
+    except DatabricksError:
+        return None
+
+# Opt-in cache of identical requests, shared by every session of this app
+response_cache = ResponseCache(w, disk_dir=DEFAULT_CACHE_DIR) if w is not None else None
+
+def query_endpoint(endpoint_name, use_cache, idempotent=False, **request):
+    """Query the endpoint through the invoker, checking the response cache first if enabled"""
+    if use_cache:
+        response = response_cache.get(endpoint_name, request)
+        if response is not None:
+            return response, True
+    response = require_invoker().query(endpoint_name, idempotent=idempotent, **request)
+    if use_cache:
+        response_cache.put(endpoint_name, request, response)
+    return response, False
+
+# Concurrent single-row requests from all users are sent together as one dataframe_split call
+request_batcher = RequestBatcher(w, invoker=invoker) if w is not None else None
+
+# Upper bound on waiting for a batched prediction, long enough for a cold endpoint to scale up
+PREDICT_TIMEOUT = 900
+
+def predict(endpoint_name, records, use_cache):
+    """Score records through the request batcher, checking the response cache first if enabled"""
+    request = {"dataframe_records": records}
+    if use_cache:
+        response = response_cache.get(endpoint_name, request)
+        if response is not None:
+            return response, True
+    try:
+        response = request_batcher.predict(endpoint_name, records, timeout=PREDICT_TIMEOUT)
+    except FuturesTimeoutError:
+        raise TimeoutError(f"No prediction within {PREDICT_TIMEOUT} s") from None
+    if use_cache:
+        response_cache.put(endpoint_name, request, response)
+    return response, False
+
+def invoke_status(endpoint_name, hit, use_cache):
+    if invoker is None:
+        return html.Small(f"The serving client could not be set up: {invoker_error}", className="text-muted")
+    metrics = invoker.metrics(endpoint_name)
+    status = (
+        f"p95 {metrics['latency_p95'] or '-'} s · timeout {metrics['timeout']} s · "
+        f"{metrics['retries']} retries · {metrics['hedges']} hedged"
+        + (" · warming up" if metrics["warming"] else "")
+    )
+    if use_cache:
+        stats = response_cache.stats()
+        status = (
+            f"{'Served from cache' if hit else 'Sent to the endpoint'} · "
+            f"{stats['hits']} hits, {stats['misses']} misses, {stats['entries']} cached responses · " + status
+        )
+    return html.Small(status, className="text-muted")
+
+def get_openai_client():
+    """The process-wide OpenAI-compatible client, created on first use"""
+    return openai_client_provider().get()
+
+# Streaming requests are handed to the SSE route by a short-lived token
+stream_jobs = TTLCache(ttl=60)
+
+@dash.get_app().server.route("/ml/serving-invoke/stream/<token>")
+def stream_llm_response(token):
+    """Server-sent events with the content deltas of a chat completion"""
+    job = stream_jobs.get(token)
+    if job is None:
+        abort(404)
+    stream_jobs.invalidate(token)
+
+    def events():
+        try:
+            conversation = job.pop("conversation", None)
+            chat_stream = ChatStream(get_openai_client(), **job)
+            for delta in chat_stream:
+                yield f"data: {json.dumps(delta)}\n\n"
+            if conversation:
+                conversation.record(chat_stream.text,
+                                    chat_stream.usage.prompt_tokens if chat_stream.usage else None)
+            yield f"event: done\ndata: {json.dumps(chat_stream.stats())}\n\n"
+        except Exception as e:
+            yield f"event: failed\ndata: {json.dumps(str(e))}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Multi-turn conversations by (browser session, endpoint); only the id is kept in the browser
+conversations = TTLCache(ttl=3600, maxsize=1000)
+
+def get_conversation(conversation_id, model_name, max_prompt_tokens):
+    conversation = conversations.get((conversation_id, model_name))
+    if conversation is None:
+        conversation = Conversation(summarizer=endpoint_summarizer(w, model_name))
+    conversation.max_prompt_tokens = max_prompt_tokens or 4000
+    # Re-setting the entry keeps an active conversation from expiring
+    conversations.set((conversation_id, model_name), conversation)
+    return conversation
+
+def render_history(conversation):
+    if conversation is None:
+        return None
+    stats = conversation.stats()
+    return html.Div([
+        html.Div([html.Strong(f"{turn.role.capitalize()}: "), html.Span(turn.content)],
+                 className="mb-2", style={"whiteSpace": "pre-wrap"})
+        for turn in conversation.transcript
+    ] + [
+        html.Small(
+            f"Prompt ~{stats['prompt_tokens']:,}/{stats['max_prompt_tokens']:,} tokens · "
+            f"{stats['turns_in_prompt']} of {stats['turns_total']} turns sent · "
+            f"{stats['compacted_turns']} summarized",
+            className="text-muted"
+        )
+    ], className="mb-3")
+
+# Scored files are served by a short-lived token instead of a data: URL,
+# since a million scored rows do not fit comfortably in the browser
+scored_files = TTLCache(ttl=600, maxsize=16)
+
+@dash.get_app().server.route("/ml/serving-invoke/scored/<token>.parquet")
+def download_scored_file(token):
+    data = scored_files.get(token)
+    if data is None:
+        abort(404)
+    return Response(
+        data,
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="scored_{token[:8]}.parquet"'}
+    )
+
+def read_table(table_name, http_path, chunk_rows=100_000):
+    """Read a Unity Catalog table through a SQL warehouse, a chunk at a time"""
+    cfg = Config()
+    with sql.connect(
+        server_hostname=cfg.host,
+        http_path=http_path,
+        credentials_provider=lambda: cfg.authenticate,
+    ) as conn, conn.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {table_name}")
+        while True:
+            chunk = cursor.fetchmany_arrow(chunk_rows)
+            if chunk.num_rows == 0:
+                return
+            yield chunk.to_pandas()
+
 # Complete model examples table
 MODEL_EXAMPLES = [
     {
@@ -134,6 +321,27 @@ response = w.serving_endpoints.query(
     ],
 )'''
     },
+    {
+        "type": "Chat Models (streaming)",
+        "param": "stream",
+        "description": "Stream the answer token by token through the OpenAI-compatible client.",
+        "code": '''from databricks.sdk import WorkspaceClient
+
+w = WorkspaceClient()
+client = w.serving_endpoints.get_open_ai_client()
+
+stream = client.chat.completions.create(
+    model="chat-assistant-model",
+    messages=[
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "Provide tips for deploying Databricks Apps."},
+    ],
+    stream=True,
+)
+for chunk in stream:
+    if chunk.choices and chunk.choices[0].delta.content:
+        print(chunk.choices[0].delta.content, end="")'''
+    },
     {
         "type": "Embeddings Models",
         "param": "input",
@@ -215,6 +423,14 @@ def layout():
                         )
                     ], width=4)
                 ]),
+                dcc.Store(id="conversation-id", storage_type="session"),
+                dbc.Switch(
+                    id="cache-switch",
+                    label="Cache identical requests (LLM requests only at temperature 0, never when streamed)",
+                    value=False,
+                    className="mb-3"
+                ),
+                html.Div(id="endpoint-info"),
                 html.Div(id="model-inputs"),
                 html.Div(id="model-output", className="mt-3")
             ], label="Try it", tab_id="tab-1"),
@@ -267,19 +483,25 @@ def layout():
                     dbc.Col([
                         html.H4("Permissions (app service principal)", className="mb-3"),
                         html.Ul([
-                            dcc.Markdown("**```CAN QUERY```** on the model serving endpoint")
+                            dcc.Markdown("**```CAN QUERY```** on the model serving endpoint"),
+                            dcc.Markdown("**```CAN USE```** on the SQL warehouse and **```SELECT```** on the table (scoring a Unity Catalog table)"),
+                            dcc.Markdown("**```WRITE VOLUME```** on the volume (writing scored rows to a volume)")
                         ], className="mb-4")
                     ]),
                     dbc.Col([
                         html.H4("Databricks resources", className="mb-3"),
                         html.Ul([
-                            html.Li("Model serving endpoint")
+                            html.Li("Model serving endpoint"),
+                            html.Li("SQL warehouse (scoring a Unity Catalog table)")
                         ], className="mb-4")
                     ]),
                     dbc.Col([
                         html.H4("Dependencies", className="mb-3"),
                         html.Ul([
                             dcc.Markdown("* [Databricks SDK for Python](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`"),
+                            dcc.Markdown("* [Databricks SQL Connector](https://pypi.org/project/databricks-sql-connector/) - `databricks-sql-connector`"),
+                            dcc.Markdown("* [Pandas](https://pypi.org/project/pandas/) - `pandas`"),
+                            dcc.Markdown("* [PyArrow](https://pypi.org/project/pyarrow/) - `pyarrow`"),
                             dcc.Markdown("* [Dash](https://pypi.org/project/dash/) - `dash`")
                         ], className="mb-4")
                     ])
@@ -288,11 +510,30 @@ def layout():
         ], id="tabs", active_tab="tab-1", className="mb-4")
     ], fluid=True, className="py-4")
 
+@callback(
+    [Output("endpoint-info", "children"),
+     Output("model-type", "value")],
+    Input("model-select", "value"),
+    prevent_initial_call=True
+)
+def show_endpoint_info(model_name):
+    endpoint = get_endpoint(model_name)
+    if endpoint is None:
+        return None, no_update
+    serving = ", ".join(e.describe() for e in endpoint.served_entities) or "-"
+    info = [html.Small(f"Task: {endpoint.task or 'custom model'} · State: {endpoint.state} · Serving: {serving}",
+                       className="text-muted d-block mb-3")]
+    if not endpoint.ready:
+        info.append(dbc.Alert(f"Endpoint {endpoint.name} is not ready ({endpoint.state}), requests will likely fail.",
+                              color="warning"))
+    return html.Div(info), "LLM" if endpoint.is_llm else "Traditional ML"
+
 @callback(
     Output("model-inputs", "children"),
-    Input("model-type", "value")
+    Input("model-type", "value"),
+    State("model-select", "value")
 )
-def update_model_inputs(model_type):
+def update_model_inputs(model_type, model_name):
     if model_type == "LLM":
         return html.Div([
             dbc.Label("Temperature", className="fw-bold mb-2"),
@@ -317,21 +558,81 @@ def update_model_inputs(model_type):
                     "boxShadow": "inset 0 1px 2px rgba(0,0,0,0.075)"
                 }
             ),
+            dbc.Switch(
+                id="stream-switch",
+                label="Stream tokens",
+                value=True,
+                className="mb-3"
+            ),
+            dbc.Row([
+                dbc.Col(dbc.Switch(
+                    id="memory-switch",
+                    label="Remember conversation (older turns are summarized once the history exceeds the token budget)",
+                    value=False
+                )),
+                dbc.Col(dbc.InputGroup([
+                    dbc.InputGroupText("Prompt token budget"),
+                    dbc.Input(id="memory-budget", type="number", min=500, max=32000, value=4000)
+                ]), width=4),
+                dbc.Col(dbc.Button("Clear conversation", id="clear-conversation", color="secondary", size="sm"), width="auto")
+            ], className="mb-3"),
+            html.Div(id="chat-history"),
             dbc.Button(
                 "Invoke LLM",
                 id="llm-invoke-button",
                 color="primary",
                 className="mb-3"
             ),
+            dcc.Store(id="llm-stream-token"),
+            html.Div(id="llm-stream-output", className="mt-3", style={"whiteSpace": "pre-wrap"}),
+            html.Small(id="llm-stream-stats", className="text-muted"),
             # Add spinner for model output
             dbc.Spinner(
                 html.Div(id="model-output", className="mt-3"),
                 color="primary",
                 type="border",
                 fullscreen=False,
-            )
+            ),
+            dbc.Accordion([
+                dbc.AccordionItem([
+                    html.P("Run a file of prompts against the endpoint. Results are checkpointed as they arrive, so running the same file again resumes where it stopped."),
+                    dcc.Upload(
+                        id="batch-prompts-upload",
+                        children=html.Div([
+                            dbc.Button("Select prompt file", color="secondary", className="me-2"),
+                            html.Span(".csv with a prompt column, .jsonl, .json or .txt", id="batch-prompts-filename", style={"vertical-align": "middle"})
+                        ]),
+                        className="mb-3"
+                    ),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Concurrent requests", className="fw-bold mb-2"),
+                            dbc.Input(id="batch-workers", type="number", min=1, max=64, value=16)
+                        ]),
+                        dbc.Col([
+                            dbc.Label("Requests per second", className="fw-bold mb-2"),
+                            dbc.Input(id="batch-rate", type="number", min=0.1, max=100, step=0.1, value=10)
+                        ]),
+                        dbc.Col([
+                            dbc.Label("Max tokens", className="fw-bold mb-2"),
+                            dbc.Input(id="batch-max-tokens", type="number", min=1, max=8192, value=512)
+                        ])
+                    ], className="mb-3"),
+                    dbc.Button("Run batch", id="batch-run-button", color="primary"),
+                    dbc.Spinner(html.Div(id="batch-output", className="mt-3"), color="primary", type="border")
+                ], title="Batch evaluation")
+            ], start_collapsed=True, className="mt-4")
         ])
     else:
+        schema = endpoint_catalog.schema(model_name) if endpoint_catalog is not None and model_name else None
+        signature = None
+        if schema and schema.columns:
+            signature = html.Small(
+                "Model signature: " + ", ".join(
+                    f"{c.name} ({c.type or 'any'}{'' if c.required else ', optional'})" for c in schema.columns
+                ),
+                className="text-muted d-block mb-2"
+            )
         return html.Div([
             dbc.Alert([
                 "The model has to be ",
@@ -346,10 +647,11 @@ def update_model_inputs(model_type):
                            href="https://docs.databricks.com/en/machine-learning/manage-model-lifecycle/index.html#train-and-register-unity-catalog-compatible-models",
                            target="_blank")
             ], color="info", className="mb-3"),
+            signature,
             dbc.Label("Enter model input:", className="fw-bold mb-2"),
             dbc.Textarea(
                 id="ml-input",
-                placeholder='{"feature1": [1.5], "feature2": [2.5]}',
+                placeholder=schema.example() if schema and schema.columns else '{"feature1": [1.5], "feature2": [2.5]}',
                 className="mb-3",
                 style={
                     "backgroundColor": "#f8f9fa",
@@ -369,47 +671,147 @@ def update_model_inputs(model_type):
                 color="primary",
                 type="border",
                 fullscreen=False,
-            )
+            ),
+            dbc.Accordion([
+                dbc.AccordionItem([
+                    html.P("Score many rows at once. Rows are sent as concurrent dataframe_split batches sized to the endpoint's payload limit, and predictions are appended to the input in order."),
+                    dcc.Upload(
+                        id="score-upload",
+                        children=html.Div([
+                            dbc.Button("Select CSV or Parquet file", color="secondary", className="me-2"),
+                            html.Span(id="score-filename", style={"vertical-align": "middle"})
+                        ]),
+                        className="mb-3"
+                    ),
+                    html.P("or read a Unity Catalog table:", className="text-muted mb-2"),
+                    dbc.Row([
+                        dbc.Col(dbc.Input(id="score-http-path", type="text", placeholder="/sql/1.0/warehouses/xxxxxx")),
+                        dbc.Col(dbc.Input(id="score-table", type="text", placeholder="main.marketing.leads_features"))
+                    ], className="mb-3"),
+                    dbc.Label("Concurrent requests", className="fw-bold mb-2"),
+                    dcc.Slider(id="score-workers", min=1, max=32, step=1, value=8,
+                               marks={1: "1", 8: "8", 16: "16", 32: "32"}),
+                    dbc.Label("Also write the scored rows to a volume (optional)", className="fw-bold mb-2 mt-3"),
+                    dbc.Input(id="score-output-path", type="text", placeholder="/Volumes/main/marketing/raw_files/leads_scored.parquet", className="mb-3"),
+                    dbc.Button("Score rows", id="score-button", color="primary"),
+                    dbc.Spinner(html.Div(id="score-output", className="mt-3"), color="primary", type="border")
+                ], title="Score a file or table")
+            ], start_collapsed=True, className="mt-4")
         ])
 
 # Separate callback for LLM models
 @callback(
-    Output("model-output", "children", allow_duplicate=True),
+    [Output("model-output", "children", allow_duplicate=True),
+     Output("llm-stream-token", "data"),
+     Output("chat-history", "children", allow_duplicate=True),
+     Output("conversation-id", "data")],
     [Input("llm-invoke-button", "n_clicks")],
     [State("model-select", "value"),
      State("temperature-slider", "value"),
-     State("prompt-input", "value")],
+     State("prompt-input", "value"),
+     State("stream-switch", "value"),
+     State("cache-switch", "value"),
+     State("memory-switch", "value"),
+     State("memory-budget", "value"),
+     State("conversation-id", "data")],
     prevent_initial_call=True
 )
-def invoke_llm_model(n_clicks, model_name, temperature, prompt):
+def invoke_llm_model(n_clicks, model_name, temperature, prompt, stream_tokens, use_cache,
+                     remember, max_prompt_tokens, conversation_id):
     if not model_name:
-        return dbc.Alert("Please select a model", color="warning")
+        return dbc.Alert("Please select a model", color="warning"), "", no_update, no_update
     
     if not prompt:
-        return dbc.Alert("Please enter a prompt", color="warning")
+        return dbc.Alert("Please enter a prompt", color="warning"), "", no_update, no_update
+
+    endpoint = get_endpoint(model_name)
+    request_format = endpoint.request_format() if endpoint else "messages"
+
+    conversation = None
+    if remember and request_format == "messages":
+        conversation_id = conversation_id or uuid.uuid4().hex
+        conversation = get_conversation(conversation_id, model_name, max_prompt_tokens)
+        messages = conversation.prepare(prompt)
+    else:
+        messages = chat_messages(prompt)
+
+    # Only chat endpoints can be streamed through the OpenAI-compatible client
+    if stream_tokens and request_format == "messages":
+        # The browser opens the SSE route for this token and renders the deltas
+        token = uuid.uuid4().hex
+        stream_jobs.set(token, {
+            "endpoint_name": model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "conversation": conversation
+        })
+        return None, token, render_history(conversation), conversation_id
         
     try:
-        response = w.serving_endpoints.query(
-            name=model_name,
-            messages=[
-                ChatMessage(role=ChatMessageRole.SYSTEM, content="You are a helpful assistant."),
-                ChatMessage(role=ChatMessageRole.USER, content=prompt),
-            ],
-            temperature=temperature
-        )
-        return dcc.Markdown(f"```json\n{response.as_dict()}\n```")
+        if conversation:
+            request = {"messages": to_chat_messages(messages), "temperature": temperature}
+        else:
+            request = llm_request(request_format, prompt, temperature)
+        response, hit = query_endpoint(model_name, use_cache, **request)
+        if conversation and response.choices:
+            conversation.record(response.choices[0].message.content,
+                                response.usage.prompt_tokens if response.usage else None)
+        output = dcc.Markdown(f"```json\n{response.as_dict()}\n```")
+        return html.Div([output, invoke_status(model_name, hit, use_cache)]), "", render_history(conversation), conversation_id
     except Exception as e:
-        return dbc.Alert(f"Error invoking model: {str(e)}", color="danger")
+        return dbc.Alert(f"Error invoking model: {str(e)}", color="danger"), "", no_update, conversation_id
+
+@callback(
+    Output("chat-history", "children", allow_duplicate=True),
+    Input("clear-conversation", "n_clicks"),
+    [State("model-select", "value"),
+     State("conversation-id", "data")],
+    prevent_initial_call=True
+)
+def clear_conversation(n_clicks, model_name, conversation_id):
+    conversations.invalidate((conversation_id, model_name))
+    return None
+
+clientside_callback(
+    """
+    function(token) {
+        const output = document.getElementById("llm-stream-output");
+        const stats = document.getElementById("llm-stream-stats");
+        output.textContent = "";
+        stats.textContent = "";
+        if (!token) {
+            return window.dash_clientside.no_update;
+        }
+        const source = new EventSource(`/ml/serving-invoke/stream/${token}`);
+        source.onmessage = (event) => { output.textContent += JSON.parse(event.data); };
+        source.addEventListener("done", (event) => {
+            const result = JSON.parse(event.data);
+            stats.textContent = `First token after ${result.time_to_first_token} s, complete after ${result.elapsed} s.`;
+            source.close();
+        });
+        source.addEventListener("failed", (event) => {
+            stats.textContent = `Error invoking model: ${JSON.parse(event.data)}`;
+            source.close();
+        });
+        source.onerror = () => source.close();
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output("llm-stream-stats", "children"),
+    Input("llm-stream-token", "data"),
+    prevent_initial_call=True
+)
 
 # Separate callback for traditional ML models
 @callback(
     Output("model-output", "children", allow_duplicate=True),
     [Input("ml-invoke-button", "n_clicks")],
     [State("model-select", "value"),
-     State("ml-input", "value")],
+     State("ml-input", "value"),
+     State("cache-switch", "value")],
     prevent_initial_call=True
 )
-def invoke_ml_model(n_clicks, model_name, ml_input):
+def invoke_ml_model(n_clicks, model_name, ml_input, use_cache):
     if not model_name:
         return dbc.Alert("Please select a model", color="warning")
     
@@ -417,13 +819,151 @@ def invoke_ml_model(n_clicks, model_name, ml_input):
         return dbc.Alert("Please enter model input", color="warning")
         
     try:
-        response = w.serving_endpoints.query(
-            name=model_name,
-            dataframe_records=loads(ml_input)
-        )
-        return dcc.Markdown(f"```json\n{response.as_dict()}\n```")
+        records = loads(ml_input)
+    except ValueError as e:
+        return dbc.Alert(f"Input is not valid JSON: {str(e)}", color="danger")
+    schema = endpoint_catalog.schema(model_name) if endpoint_catalog is not None else None
+    problems = validate_records(records, schema)
+    if problems:
+        return dbc.Alert(["Fix the input before sending it:", html.Ul([html.Li(p) for p in problems])], color="danger")
+
+    try:
+        response, hit = predict(model_name, records, use_cache)
+        output = dcc.Markdown(f"```json\n{response.as_dict()}\n```")
+        return html.Div([output, invoke_status(model_name, hit, use_cache)])
     except Exception as e:
         return dbc.Alert(f"Error invoking model: {str(e)}", color="danger")
 
+@callback(
+    Output("batch-prompts-filename", "children"),
+    Input("batch-prompts-upload", "filename"),
+    prevent_initial_call=True
+)
+def show_prompt_file(filename):
+    return filename
+
+@callback(
+    Output("batch-output", "children"),
+    Input("batch-run-button", "n_clicks"),
+    [State("model-select", "value"),
+     State("temperature-slider", "value"),
+     State("batch-prompts-upload", "contents"),
+     State("batch-prompts-upload", "filename"),
+     State("batch-workers", "value"),
+     State("batch-rate", "value"),
+     State("batch-max-tokens", "value")],
+    prevent_initial_call=True
+)
+def run_batch_evaluation(n_clicks, model_name, temperature, contents, filename, workers, rate, max_tokens):
+    if not model_name:
+        return dbc.Alert("Please select a model", color="warning")
+    if not contents:
+        return dbc.Alert("Please select a prompt file", color="warning")
+
+    try:
+        prompts = read_prompts(base64.b64decode(contents.split(",")[1]), filename)
+        start = time.perf_counter()
+        results = BatchEvaluator(w, max_workers=int(workers or 16), rate=float(rate or 10)).run(
+            model_name,
+            prompts,
+            temperature=temperature,
+            max_tokens=int(max_tokens) if max_tokens else None
+        )
+        summary = summarize(results, time.perf_counter() - start)
+        results_df = pd.DataFrame(BatchEvaluator.to_records(results))
+        encoded = base64.b64encode(results_df.to_csv(index=False).encode()).decode()
+        return html.Div([
+            dcc.Markdown(f"```json\n{json.dumps(summary, indent=2)}\n```"),
+            html.A(
+                dbc.Button("Download results", color="success", className="mb-3"),
+                href=f"data:text/csv;base64,{encoded}",
+                download=f"{model_name}_eval.csv"
+            ),
+            dash_table.DataTable(
+                data=results_df.to_dict("records"),
+                columns=[{"name": c, "id": c} for c in results_df.columns],
+                page_size=20,
+                style_table={"overflowX": "auto"},
+                style_header={"backgroundColor": "#f8f9fa", "fontWeight": "bold"},
+                style_cell={"textAlign": "left", "padding": "8px", "maxWidth": "400px", "overflow": "hidden", "textOverflow": "ellipsis"}
+            )
+        ])
+    except Exception as e:
+        return dbc.Alert(f"Error running batch evaluation: {str(e)}", color="danger")
+
+@callback(
+    Output("score-filename", "children"),
+    Input("score-upload", "filename"),
+    prevent_initial_call=True
+)
+def show_score_file(filename):
+    return filename
+
+@callback(
+    Output("score-output", "children"),
+    Input("score-button", "n_clicks"),
+    [State("model-select", "value"),
+     State("score-upload", "contents"),
+     State("score-upload", "filename"),
+     State("score-http-path", "value"),
+     State("score-table", "value"),
+     State("score-workers", "value"),
+     State("score-output-path", "value"),
+     State("cache-switch", "value")],
+    prevent_initial_call=True
+)
+def score_rows(n_clicks, model_name, contents, filename, http_path, table_name, workers, output_path, use_cache):
+    if not model_name:
+        return dbc.Alert("Please select a model", color="warning")
+
+    try:
+        if contents:
+            chunks = iter([read_scoring_input(base64.b64decode(contents.split(",")[1]), filename)])
+        elif http_path and table_name:
+            # Scored a chunk at a time, so a large table is never loaded at once
+            chunks = read_table(table_name, http_path)
+        else:
+            return dbc.Alert("Please select a file or specify a warehouse and a table", color="warning")
+        first = next(chunks, None)
+        if first is None:
+            return dbc.Alert("There are no rows to score", color="warning")
+
+        scorer = BatchScorer(w, max_workers=workers, cache=response_cache if use_cache else None, invoker=invoker)
+        batch_rows = scorer.batch_rows(first)
+        start = time.perf_counter()
+        output = io.BytesIO()
+        rows, preview = write_parquet(
+            scorer.score_chunks(model_name, itertools.chain([first], chunks), batch_rows=batch_rows), output
+        )
+        elapsed = time.perf_counter() - start
+
+        if output_path:
+            output.seek(0)
+            w.files.upload(output_path, output, overwrite=True)
+        token = uuid.uuid4().hex
+        scored_files.set(token, output.getvalue())
+
+        return html.Div([
+            dbc.Alert(
+                f"Scored {rows:,} rows in {elapsed:.1f} s ({batch_rows:,} rows per request)."
+                + (f" Written to {output_path}." if output_path else ""),
+                color="success"
+            ),
+            html.A(
+                dbc.Button("Download scored rows (Parquet)", color="success", className="mb-3"),
+                href=f"/ml/serving-invoke/scored/{token}.parquet"
+            ),
+            dash_table.DataTable(
+                data=json.loads(preview.to_json(orient="records", date_format="iso")),
+                columns=[{"name": str(c), "id": str(c)} for c in preview.columns],
+                page_size=20,
+                style_table={"overflowX": "auto"},
+                style_header={"backgroundColor": "#f8f9fa", "fontWeight": "bold"},
+                style_cell={"textAlign": "left", "padding": "8px"}
+            )
+        ])
+    except Exception as e:
+        return dbc.Alert(f"Error scoring rows: {str(e)}", color="danger")
+
 # Make layout available at module level
 __all__ = ['layout']
@@ -1,7 +1,18 @@
 from dash import html, dcc, callback, Input, Output, State
 import dash_bootstrap_components as dbc
+import numpy as np
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.core import Config
+from databricks import sql
 import dash
+from utils.embedding_cache import DEFAULT_EMBEDDING_CACHE, EmbeddingCache
+from utils.embedding_service import EmbeddingService
+from utils.local_vector_index import LOCAL_INDEX_DIR, LocalVectorIndexes
+from utils.openai_client import openai_client_provider
+from utils.rerank import rerank, response_frame
+from utils.vector_index_catalog import VectorIndexCatalog
+from utils.vector_index_ingest import TableSource, VectorIndexIngest, VolumeFileSource
+from utils.vector_search_cache import CachedVectorSearchIndexes
 
 # pages/ml_vector_search.py
 dash.register_page(
@@ -15,37 +26,78 @@ dash.register_page(
 
 w = WorkspaceClient()
 
-try:
-    openai_client = w.serving_endpoints.get_open_ai_client()
-except Exception:
-    openai_client = None
+# Created on the first embedding request and shared with the other pages.
+openai_client = openai_client_provider()
 
 EMBEDDING_MODEL_ENDPOINT_NAME = "databricks-gte-large-en"
 
+# Offline stand-in: serve indexes saved under LOCAL_VECTOR_INDEX_DIR in-process.
+vector_search_indexes = CachedVectorSearchIndexes(
+    LocalVectorIndexes(LOCAL_INDEX_DIR) if LOCAL_INDEX_DIR else w.vector_search_indexes
+)
+index_catalog = VectorIndexCatalog(vector_search_indexes)
+
+embedding_cache = EmbeddingCache(DEFAULT_EMBEDDING_CACHE)
+embedding_service = EmbeddingService(openai_client, EMBEDDING_MODEL_ENDPOINT_NAME, cache=embedding_cache)
+# Documents are embedded without the query cache, which they would crowd out.
+document_embedding_service = EmbeddingService(openai_client, EMBEDDING_MODEL_ENDPOINT_NAME)
+vector_index_ingest = VectorIndexIngest(vector_search_indexes, document_embedding_service)
+
 def get_embeddings(text):
     try:
-        response = openai_client.embeddings.create(
-            model=EMBEDDING_MODEL_ENDPOINT_NAME, input=text
-        )
-        return response.data[0].embedding
+        return embedding_service.embed_one(text).tolist()
     except Exception as e:
         return f"Error generating embeddings: {e}"
 
-def run_vector_search(prompt: str, index_name: str, columns: str) -> str:
-    prompt_vector = get_embeddings(prompt)
-    if prompt_vector is None or isinstance(prompt_vector, str):
-        return f"Failed to generate embeddings: {prompt_vector}"
+def candidate_vectors(candidates, vector_column, source_column):
+    """Vectors of the candidates for diversification, or None if unavailable."""
+    if candidates.empty:
+        return None
+    # Self-managed indexes return their stored vectors with the results.
+    if vector_column:
+        return np.vstack(candidates[vector_column].to_numpy()).astype(np.float32)
+    if source_column:
+        # Managed embeddings aren't returned: embed the candidates in one batch.
+        return document_embedding_service.embed(candidates[source_column].astype(str).tolist())
+    return None
+
+def run_vector_search(prompt: str, index_name: str, columns: str, num_results: int = 3, page: int = 1,
+                      num_candidates: int = 30, diversity: float = 0.0, keyword_column: str = None):
+    # Indexes with managed embeddings embed the text themselves: one round-trip less.
+    if index_catalog.computes_embeddings(index_name):
+        query = {"query_text": prompt}
+    else:
+        prompt_vector = get_embeddings(prompt)
+        if prompt_vector is None or isinstance(prompt_vector, str):
+            return f"Failed to generate embeddings: {prompt_vector}"
+        query = {"query_vector": prompt_vector}
 
     columns_to_fetch = [col.strip() for col in columns.split(",") if col.strip()]
+    vector_column = index_catalog.vector_column(index_name) if diversity > 0 else None
+    source_column = index_catalog.source_column(index_name) if diversity > 0 else None
+    extra_columns = [keyword_column, vector_column or source_column]
+    fetch = columns_to_fetch + [column for column in extra_columns if column and column not in columns_to_fetch]
 
     try:
-        query_result = w.vector_search_indexes.query_index(
+        query_result = vector_search_indexes.query_index(
             index_name=index_name,
-            columns=columns_to_fetch,
-            query_vector=prompt_vector,
-            num_results=3,
+            columns=fetch,
+            num_results=max(num_candidates, page * num_results),
+            **query,
         )
-        return query_result.result.data_array
+        candidates = response_frame(query_result)
+        vectors = candidate_vectors(candidates, vector_column, source_column)
+        results = rerank(
+            candidates,
+            candidates.pop("score"),
+            vectors=vectors,
+            query_text=prompt,
+            text_column=keyword_column or None,
+            diversity=diversity,
+            offset=(page - 1) * num_results,
+            limit=num_results,
+        )
+        return results[columns_to_fetch + ["score"]]
     except Exception as e:
         return f"Error during vector search: {e}"
 
@@ -97,6 +149,35 @@ def layout():
                             "boxShadow": "inset 0 1px 2px rgba(0,0,0,0.075)"
                         }
                     ),
+
+                    dbc.Accordion([
+                        dbc.AccordionItem([
+                            dbc.Row([
+                                dbc.Col([
+                                    dbc.Label("Results per page"),
+                                    dbc.Input(id="num-results-input", type="number", min=1, max=100, value=3)
+                                ]),
+                                dbc.Col([
+                                    dbc.Label("Page"),
+                                    dbc.Input(id="page-input", type="number", min=1, max=100, value=1)
+                                ]),
+                                dbc.Col([
+                                    dbc.Label("Candidates to rerank"),
+                                    dbc.Input(id="num-candidates-input", type="number", min=1, max=1000, value=30)
+                                ])
+                            ]),
+                            dbc.Label("Diversity", className="mt-3"),
+                            dcc.Slider(id="diversity-slider", min=0, max=1, step=0.05, value=0,
+                                       marks={0: "relevance only", 1: "most diverse"}),
+                            dbc.Label("Keyword column for hybrid ranking (optional):", className="mt-3"),
+                            dbc.Input(id="keyword-column-input", type="text", placeholder="text"),
+                            dbc.FormText(
+                                "Candidates are fetched from the index in one query and reranked locally: "
+                                "diversity uses maximal marginal relevance, and a keyword column fuses a "
+                                "BM25 keyword ranking with the vector ranking by reciprocal rank fusion."
+                            )
+                        ], title="Reranking")
+                    ], start_collapsed=True, className="mt-3"),
                     
                     dbc.Button(
                         "Run vector search",
@@ -110,7 +191,39 @@ def layout():
                     color="primary",
                     type="border",
                     fullscreen=False,
-                )
+                ),
+
+                dbc.Accordion([
+                    dbc.AccordionItem([
+                        html.P(
+                            "Embeds rows from a table or a volume file and upserts them to the index above. "
+                            "Progress is checkpointed, so loading the same source again resumes where it stopped.",
+                            className="text-muted"
+                        ),
+                        dbc.RadioItems(
+                            id="ingest-source",
+                            options=[
+                                {"label": "Unity Catalog table", "value": "table"},
+                                {"label": "Volume file", "value": "file"}
+                            ],
+                            value="table",
+                            inline=True,
+                            className="mb-2"
+                        ),
+                        dbc.Row([
+                            dbc.Col(dbc.Input(id="ingest-http-path", type="text", placeholder="/sql/1.0/warehouses/xxxxxx")),
+                            dbc.Col(dbc.Input(id="ingest-table", type="text", placeholder="catalog.schema.table"))
+                        ], id="ingest-table-inputs", className="mb-2"),
+                        dbc.Input(id="ingest-file", type="text", placeholder="/Volumes/catalog/schema/volume/rows.parquet",
+                                  className="mb-2", style={"display": "none"}),
+                        dbc.Label("Text column to embed:"),
+                        dbc.Input(id="ingest-text-column", type="text", placeholder="text"),
+                        dbc.FormText("Leave empty if the source already has the index's vector column."),
+                        dbc.Checkbox(id="ingest-restart", label="Start over instead of resuming", value=False, className="mt-2"),
+                        dbc.Button("Load data", id="ingest-button", color="primary", className="mt-3"),
+                        dbc.Spinner(html.Div(id="ingest-results", className="mt-3"), color="primary", type="border")
+                    ], title="Load data into a direct-access index")
+                ], start_collapsed=True, className="mt-4")
             ], label="Try it", tab_id="tab-1"),
             
             # Code snippet tab
@@ -162,20 +275,24 @@ def run_vector_search(prompt: str) -> str:
                         html.Ul([
                             dcc.Markdown("**```USE CATALOG```** on the Catalog that contains the Vector Search index"),
                             dcc.Markdown("**```USE SCHEMA```** on the Schema that contains the Vector Search index"),
-                            dcc.Markdown("**```SELECT```** on the Vector Search index")
+                            dcc.Markdown("**```SELECT```** on the Vector Search index"),
+                            dcc.Markdown("**```CAN USE```** on the SQL warehouse and **```SELECT```** on the source table, or **```READ VOLUME```** on the source volume (loading data)"),
+                            dcc.Markdown("**```MODIFY```** on a direct-access index (loading data)")
                         ], className="mb-4")
                     ]),
                     dbc.Col([
                         html.H4("Databricks resources", className="mb-3"),
                         html.Ul([
                             html.Li("Vector Search endpoint"),
-                            html.Li("Vector Search index")
+                            html.Li("Vector Search index"),
+                            html.Li("SQL warehouse (loading data from a table)")
                         ], className="mb-4")
                     ]),
                     dbc.Col([
                         html.H4("Dependencies", className="mb-3"),
                         html.Ul([
                             dcc.Markdown("* [Databricks SDK for Python](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`"),
+                            dcc.Markdown("* [Databricks SQL Connector](https://pypi.org/project/databricks-sql-connector/) - `databricks-sql-connector`"),
                             dcc.Markdown("* [Dash](https://pypi.org/project/dash/) - `dash`")
                         ], className="mb-4")
                     ])
@@ -189,21 +306,101 @@ def run_vector_search(prompt: str) -> str:
     [Input("search-button", "n_clicks")],
     [State("index-name-input", "value"),
      State("columns-input", "value"),
-     State("search-query-input", "value")],
+     State("search-query-input", "value"),
+     State("num-results-input", "value"),
+     State("page-input", "value"),
+     State("num-candidates-input", "value"),
+     State("diversity-slider", "value"),
+     State("keyword-column-input", "value")],
     prevent_initial_call=True
 )
-def update_results(n_clicks, index_name, columns, query):
+def update_results(n_clicks, index_name, columns, query, num_results, page, num_candidates, diversity, keyword_column):
     if not all([index_name, columns, query]):
         return dbc.Alert("Please fill in all fields", color="warning")
     
     try:
-        results = run_vector_search(query, index_name, columns)
+        results = run_vector_search(query, index_name, columns, num_results=num_results or 3, page=page or 1,
+                                    num_candidates=num_candidates or 30, diversity=diversity or 0.0,
+                                    keyword_column=keyword_column)
+        if index_catalog.computes_embeddings(index_name):
+            status = "Query embedded by the index (managed embeddings)"
+        else:
+            stats = embedding_cache.stats()
+            status = (
+                f"Query embedded with {EMBEDDING_MODEL_ENDPOINT_NAME} · embedding cache: "
+                f"{stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+                f"{stats['misses']} misses"
+            )
+        cached = vector_search_indexes.stats()
+        status += f" · result cache: {cached['hits']} hits, {cached['misses']} misses"
         return dbc.Card(dbc.CardBody([
             html.H5("Search Results:", className="mb-3"),
-            html.Pre(str(results))
+            html.Pre(results) if isinstance(results, str) else
+            dbc.Table.from_dataframe(results, striped=True, bordered=True, hover=True, size="sm"),
+            html.Small(status, className="text-muted")
         ]))
     except Exception as e:
         return dbc.Alert(f"Error: {str(e)}", color="danger")
 
+@callback(
+    Output("ingest-table-inputs", "style"),
+    Output("ingest-file", "style"),
+    Input("ingest-source", "value")
+)
+def toggle_ingest_source(source):
+    hidden = {"display": "none"}
+    return (None, hidden) if source == "table" else (hidden, None)
+
+@callback(
+    Output("ingest-results", "children"),
+    Input("ingest-button", "n_clicks"),
+    [State("index-name-input", "value"),
+     State("ingest-source", "value"),
+     State("ingest-http-path", "value"),
+     State("ingest-table", "value"),
+     State("ingest-file", "value"),
+     State("ingest-text-column", "value"),
+     State("ingest-restart", "value")],
+    prevent_initial_call=True
+)
+def load_data(n_clicks, index_name, source_type, http_path, table_name, file_path, text_column, restart):
+    if not index_name:
+        return dbc.Alert("Please enter the vector search index", color="warning")
+    connection = None
+    try:
+        if source_type == "table":
+            if not http_path or not table_name:
+                return dbc.Alert("Please specify a warehouse and a table", color="warning")
+            cfg = Config()
+            connection = sql.connect(
+                server_hostname=cfg.host,
+                http_path=http_path,
+                credentials_provider=lambda: cfg.authenticate,
+            )
+            source = TableSource(connection, table_name)
+        else:
+            if not file_path:
+                return dbc.Alert("Please enter a file path", color="warning")
+            source = VolumeFileSource(w, file_path)
+        progress = vector_index_ingest.run(index_name, source, text_column=text_column or None, restart=bool(restart))
+    except Exception as e:
+        return dbc.Alert(f"Error loading data: {e}", color="danger")
+    finally:
+        if connection is not None:
+            connection.close()
+
+    resumed = f" after resuming at row {progress.rows_resumed:,}" if progress.rows_resumed else ""
+    children = [dbc.Alert(
+        f"Upserted {progress.rows_upserted:,} rows in {progress.elapsed:.1f} s "
+        f"({progress.embed_seconds:.1f} s embedding, {progress.requests} requests, {progress.retries} retries){resumed}",
+        color="success"
+    )]
+    if progress.failed_keys:
+        children.append(dbc.Alert(
+            f"{progress.rows_failed:,} rows failed, e.g. keys {', '.join(progress.failed_keys[:10])}. Load again to retry them.",
+            color="warning"
+        ))
+    return children
+
 # Make layout available at module level
 __all__ = ['layout']
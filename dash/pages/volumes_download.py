@@ -1,8 +1,18 @@
-from dash import Dash, html, dcc, callback, Input, Output, State
+from dash import Dash, html, dcc, callback, Input, Output, State, ALL, ctx, no_update
 import dash_bootstrap_components as dbc
 from databricks.sdk import WorkspaceClient
+from utils.ttl_cache import TTLCache
+from utils.volume_browser import VolumeBrowser, normalize_directory
+from utils.volume_export import ZipExporter
+from utils.transfer_progress import CHUNK_SIZE, DOWNLOAD, TransferTracker
+from utils.volume_sync import VolumeSync
+from flask import Response, abort, stream_with_context
 import os
+import io
+import posixpath
+import shutil
 import base64
+import uuid
 import dash
 
 # pages/volumes_download.py
@@ -16,9 +26,58 @@ dash.register_page(
 )
 
 
-
 w = WorkspaceClient()
 
+volume_browser = VolumeBrowser(w, page_size=200, ttl=30)
+zip_exporter = ZipExporter(w, max_workers=8)
+# Transfers by browser session, so users only see their own; only the id is kept in the browser.
+# Progress of running transfers is read by the interval callback below while the
+# transfer callback is still busy on another request thread.
+transfer_trackers = TTLCache(ttl=3600, maxsize=1000)
+
+def get_transfer_tracker(session_id):
+    if not session_id:
+        return TransferTracker()
+    tracker = transfer_trackers.get(session_id)
+    if tracker is None:
+        tracker = TransferTracker()
+    # Re-setting the entry keeps an active session from expiring
+    transfer_trackers.set(session_id, tracker)
+    return tracker
+
+# Export requests are handed to the streaming route by a short-lived token, so
+# large selections do not have to fit in a URL.
+export_jobs = TTLCache(ttl=300)
+
+@dash.get_app().server.route("/volumes/export/<token>.zip")
+def stream_export(token):
+    """Stream the zip archive for a prepared export without buffering it"""
+    job = export_jobs.get(token)
+    if job is None:
+        abort(404)
+    base_dir, file_paths = job
+    if file_paths is None:
+        file_paths = [posixpath.join(base_dir, relative) for relative in VolumeSync(w).scan_remote(base_dir)]
+    return Response(
+        stream_with_context(zip_exporter.stream(file_paths, base_dir=base_dir)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{posixpath.basename(base_dir)}.zip"'}
+    )
+
+def render_entries(entries):
+    """Render directory entries as clickable list items"""
+    return dbc.ListGroup([
+        dbc.ListGroupItem(
+            [
+                html.Span(entry.name + ("/" if entry.is_directory else ""), className="fw-bold" if entry.is_directory else ""),
+                html.Small(f"{entry.file_size:,} bytes" if entry.file_size is not None else "", className="text-muted ms-2")
+            ],
+            id={"type": "browse-entry", "index": entry.path, "kind": "dir" if entry.is_directory else "file"},
+            action=True,
+            n_clicks=0
+        ) for entry in entries
+    ], flush=True, style={"maxHeight": "400px", "overflowY": "auto"})
+
 def layout():
     """Return the layout for this view"""
     return dbc.Container([
@@ -36,6 +95,48 @@ def layout():
         # Tabs
         dbc.Tabs([
             dbc.Tab(label="Try it", tab_id="try-it", children=[
+                dbc.Accordion([
+                    dbc.AccordionItem([
+                        dbc.Label("Volume or directory to browse:", className="fw-bold mb-2"),
+                        dbc.InputGroup([
+                            dbc.Input(
+                                id="browse-root-input",
+                                type="text",
+                                placeholder="/Volumes/main/marketing/raw_files",
+                                style={
+                                    "backgroundColor": "#f8f9fa",
+                                    "border": "1px solid #dee2e6",
+                                    "boxShadow": "inset 0 1px 2px rgba(0,0,0,0.075)"
+                                }
+                            ),
+                            dbc.Button("Open", id="browse-open-button", color="primary")
+                        ], className="mb-3"),
+                        dcc.Store(id="browse-dir-store"),
+                        html.Div([
+                            dbc.Button("Up one level", id="browse-up-button", color="secondary", outline=True, size="sm", className="me-2"),
+                            dbc.Button("Load more", id="browse-more-button", color="secondary", outline=True, size="sm")
+                        ], className="mb-2"),
+                        dbc.Spinner(html.Div(id="browse-listing"), color="primary", type="border"),
+                        dbc.Label("Search opened folders by name prefix:", className="fw-bold mt-3 mb-2"),
+                        dbc.Input(
+                            id="browse-search-input",
+                            type="text",
+                            placeholder="leads_2025",
+                            debounce=True,
+                            style={
+                                "backgroundColor": "#f8f9fa",
+                                "border": "1px solid #dee2e6",
+                                "boxShadow": "inset 0 1px 2px rgba(0,0,0,0.075)"
+                            }
+                        ),
+                        html.Div(id="browse-search-results", className="mt-2"),
+                        dbc.Label("Export several files as a zip archive:", className="fw-bold mt-3 mb-2"),
+                        dcc.Dropdown(id="export-files-select", multi=True, placeholder="Files to export", className="mb-2"),
+                        dbc.Checkbox(id="export-folder-check", label="Export everything in the current folder (recursive)", value=False, className="mb-2"),
+                        dbc.Button("Prepare zip export", id="export-button", color="primary", size="sm"),
+                        html.Div(id="export-area", className="mt-2")
+                    ], title="Browse a volume")
+                ], start_collapsed=True, className="mt-3"),
                 dbc.Form([
                     dbc.Row([
                         dbc.Col([
@@ -63,7 +164,14 @@ def layout():
                     )
                 ], className="mt-3"),
                 html.Div(id="download-area", className="mt-3"),
-                html.Div(id="status-area-download", className="mt-3")
+                html.Div(id="status-area-download", className="mt-3"),
+                html.Div([
+                    html.H5("Transfers", className="mt-4"),
+                    dcc.Interval(id="download-transfer-interval", interval=500),
+                    dcc.Store(id="transfer-session-id", storage_type="session", data=uuid.uuid4().hex),
+                    dcc.Store(id="download-transfer-store"),
+                    html.Div(id="download-transfer-progress")
+                ])
             ], className="p-3"),
             
             dbc.Tab(label="Code snippet", tab_id="code-snippet", children=[
@@ -118,16 +226,20 @@ file_name = os.path.basename(download_file_path)
     [Output("download-area", "children"),
      Output("status-area-download", "children")],
     Input("get-file-button", "n_clicks"),
-    State("file-path-input", "value"),
+    [State("file-path-input", "value"),
+     State("transfer-session-id", "data")],
     prevent_initial_call=True
 )
-def handle_file_download(n_clicks, file_path):
+def handle_file_download(n_clicks, file_path, session_id):
     if not file_path:
         return None, dbc.Alert("Please specify a file path.", color="warning")
     
     try:
         resp = w.files.download(file_path)
-        file_data = resp.contents.read()
+        buffer = io.BytesIO()
+        with get_transfer_tracker(session_id).track(DOWNLOAD, file_path, resp.content_length) as transfer:
+            shutil.copyfileobj(transfer.wrap(resp.contents), buffer, CHUNK_SIZE)
+        file_data = buffer.getvalue()
         file_name = os.path.basename(file_path)
         
         # Encode file data for download
@@ -148,5 +260,128 @@ def handle_file_download(n_clicks, file_path):
     except Exception as e:
         return None, dbc.Alert(f"Error downloading file: {str(e)}", color="danger")
 
+@callback(
+    [Output("browse-dir-store", "data"),
+     Output("file-path-input", "value")],
+    [Input("browse-open-button", "n_clicks"),
+     Input("browse-up-button", "n_clicks"),
+     Input({"type": "browse-entry", "index": ALL, "kind": ALL}, "n_clicks")],
+    [State("browse-root-input", "value"),
+     State("browse-dir-store", "data")],
+    prevent_initial_call=True
+)
+def navigate_volume(open_clicks, up_clicks, entry_clicks, root, current_dir):
+    if not root:
+        return no_update, no_update
+    root_dir = normalize_directory(root)
+    trigger = ctx.triggered_id
+
+    if trigger == "browse-open-button":
+        return root_dir, no_update
+    if trigger == "browse-up-button":
+        if not current_dir or current_dir == root_dir:
+            return no_update, no_update
+        return posixpath.dirname(current_dir), no_update
+    if isinstance(trigger, dict) and ctx.triggered[0]["value"]:
+        if trigger["kind"] == "dir":
+            return normalize_directory(trigger["index"]), no_update
+        return no_update, trigger["index"]
+    return no_update, no_update
+
+@callback(
+    [Output("browse-listing", "children"),
+     Output("export-files-select", "options")],
+    [Input("browse-dir-store", "data"),
+     Input("browse-more-button", "n_clicks")],
+    prevent_initial_call=True
+)
+def render_listing(directory, more_clicks):
+    if not directory:
+        return None, []
+    try:
+        if ctx.triggered_id == "browse-more-button":
+            listing = volume_browser.load_more(directory)
+        else:
+            listing = volume_browser.list(directory)
+        summary = f"{len(listing.entries)} entries loaded" + ("" if listing.complete else " (more available)")
+        export_options = [{"label": entry.name, "value": entry.path} for entry in listing.files]
+        return html.Div([
+            html.Code(directory),
+            render_entries(listing.entries),
+            html.Small(summary, className="text-muted")
+        ]), export_options
+    except Exception as e:
+        return dbc.Alert(f"Error listing directory: {str(e)}", color="danger"), []
+
+@callback(
+    Output("browse-search-results", "children"),
+    Input("browse-search-input", "value"),
+    State("browse-root-input", "value"),
+    prevent_initial_call=True
+)
+def search_volume(prefix, root):
+    if not prefix:
+        return None
+    matches = volume_browser.search(prefix, under=root)
+    if not matches:
+        return html.Small("No matches in the folders opened so far.", className="text-muted")
+    return render_entries(matches)
+
+@callback(
+    Output("export-area", "children"),
+    Input("export-button", "n_clicks"),
+    [State("browse-dir-store", "data"),
+     State("export-files-select", "value"),
+     State("export-folder-check", "value")],
+    prevent_initial_call=True
+)
+def prepare_export(n_clicks, directory, file_paths, whole_folder):
+    if not directory:
+        return dbc.Alert("Please open a folder first.", color="warning")
+    if not whole_folder and not file_paths:
+        return dbc.Alert("Please select files to export.", color="warning")
+
+    token = uuid.uuid4().hex
+    export_jobs.set(token, (directory, None if whole_folder else list(file_paths)))
+    count = "all files" if whole_folder else f"{len(file_paths)} files"
+    return html.A(
+        dbc.Button(f"Download {count} as zip", color="success"),
+        href=f"/volumes/export/{token}.zip"
+    )
+
+@callback(
+    Output("download-transfer-store", "data"),
+    Input("download-transfer-interval", "n_intervals"),
+    [State("download-transfer-store", "data"),
+     State("transfer-session-id", "data")]
+)
+def poll_download_transfers(n_intervals, current, session_id):
+    """Publish this session's latest transfer stats to the store; skip the update when nothing changed"""
+    records = [
+        {**stats.to_dict(), "label": stats.describe()}
+        for stats in get_transfer_tracker(session_id).recent(5)
+    ]
+    return no_update if records == current else records
+
+@callback(
+    Output("download-transfer-progress", "children"),
+    Input("download-transfer-store", "data")
+)
+def render_download_transfers(records):
+    return [
+        html.Div([
+            html.Small(f"{posixpath.basename(record['path'])}: {record['status']}"),
+            dbc.Progress(
+                value=100 * (record["fraction"] or (1.0 if record["status"] in ("done", "skipped") else 0.0)),
+                label=record["label"],
+                striped=record["status"] == "running",
+                animated=record["status"] == "running",
+                color={"failed": "danger", "done": "success", "skipped": "secondary"}.get(record["status"], "primary"),
+                className="mb-2"
+            )
+        ])
+        for record in records or []
+    ]
+
 # Make layout available at module level
 __all__ = ['layout']
\ No newline at end of file
@@ -1,10 +1,23 @@
-from dash import Dash, html, dcc, callback, Input, Output, State
+from dash import Dash, html, dcc, callback, Input, Output, State, dash_table, no_update
 import dash_bootstrap_components as dbc
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.catalog import SecurableType
+from utils.volume_browser import VolumeBrowser, normalize_directory
+from utils.volume_permissions import (
+    PERMISSIONS_VALIDATED,
+    VolumePermissionCache,
+    is_permission_error,
+)
+from utils.upload_manifest import DedupUploader, UploadManifest
+from utils.parquet_ingest import COMPRESSION_CODECS, ParquetIngest, detect_format
+from utils.transfer_progress import TransferTracker
+from utils.ttl_cache import TTLCache
+from utils.volume_sync import DOWNLOAD, LOCAL_SYNC_ROOT, UPLOAD, VolumeSync
 import os
 import io
+import json
+import posixpath
 import base64
+import uuid
 import dash
 
 # pages/volumes_upload.py
@@ -19,28 +32,84 @@ dash.register_page(
 
 w = WorkspaceClient()
 
+permission_cache = VolumePermissionCache(w, ttl=60)
+
 def check_upload_permissions(volume_name: str):
-    """Check if user has required permissions on the volume"""
-    try:
-        volume = w.volumes.read(name=volume_name)
-        current_user = w.current_user.me()
-        grants = w.grants.get_effective(
-            securable_type=SecurableType.VOLUME,
-            full_name=volume.full_name,
-            principal=current_user.user_name,
-        )
+    """Check if user has required permissions on the volume (cached per principal and volume)"""
+    return permission_cache.check(volume_name)
 
-        if not grants or not grants.privilege_assignments:
-            return "Insufficient permissions: No grants found."
+volume_browser = VolumeBrowser(w, page_size=200, ttl=30)
+upload_manifest = UploadManifest()
+dedup_uploader = DedupUploader(w, upload_manifest)
+# Transfers by browser session, so users only see their own; only the id is kept in the browser.
+# Progress of running transfers is read by the interval callback below while the
+# transfer callback is still busy on another request thread.
+transfer_trackers = TTLCache(ttl=3600, maxsize=1000)
 
-        for assignment in grants.privilege_assignments:
-            for privilege in assignment.privileges:
-                if privilege.privilege.value in ["ALL_PRIVILEGES", "WRITE_VOLUME"]:
-                    return "Volume and permissions validated"
+def get_transfer_tracker(session_id):
+    if not session_id:
+        return TransferTracker()
+    tracker = transfer_trackers.get(session_id)
+    if tracker is None:
+        tracker = TransferTracker()
+    # Re-setting the entry keeps an active session from expiring
+    transfer_trackers.set(session_id, tracker)
+    return tracker
 
-        return "Insufficient permissions: Required privileges not found."
-    except Exception as e:
-        return f"Error: {e}"
+def list_target_folders(volume_name: str):
+    """List the top-level folders of the volume (first page only)"""
+    try:
+        return [entry.name for entry in volume_browser.list(volume_name).directories]
+    except Exception:
+        return []
+
+def sync_form(volume_path: str):
+    """Folder sync controls, offered once the volume is checked and a local sync root is set"""
+    return dbc.Accordion([
+        dbc.AccordionItem([
+            html.P([
+                "Transfer only the files that differ between a folder under ",
+                html.Code(LOCAL_SYNC_ROOT),
+                " on the app's file system and a directory of ",
+                html.Strong(volume_path),
+                "."
+            ]),
+            dbc.Label("Local folder (relative to the sync root):", className="fw-bold mb-2"),
+            dbc.Input(id="sync-local-input", type="text", placeholder="daily_drop", className="mb-3"),
+            dbc.Label("Volume directory:", className="fw-bold mb-2"),
+            dbc.Input(id="sync-volume-input", type="text", placeholder="/Volumes/main/marketing/raw_files/daily_drop", className="mb-3"),
+            dbc.Row([
+                dbc.Col([
+                    dbc.Label("Direction", className="fw-bold mb-2"),
+                    dbc.RadioItems(
+                        id="sync-direction",
+                        options=[
+                            {"label": "Local → volume", "value": UPLOAD},
+                            {"label": "Volume → local", "value": DOWNLOAD}
+                        ],
+                        value=UPLOAD,
+                        className="mb-3"
+                    ),
+                    dbc.Label("Concurrent transfers", className="fw-bold mb-2"),
+                    dcc.Slider(id="sync-workers", min=1, max=32, step=1, value=8,
+                               marks={1: "1", 8: "8", 16: "16", 32: "32"})
+                ]),
+                dbc.Col([
+                    dbc.Checklist(
+                        id="sync-options",
+                        options=[
+                            {"label": "Delete files that are not on the source", "value": "delete"},
+                            {"label": "Also if the source is empty (deletes everything on the target)", "value": "confirm_empty"},
+                            {"label": "Dry run (only report the differences)", "value": "dry_run"}
+                        ],
+                        value=[]
+                    )
+                ])
+            ]),
+            dbc.Button("Run sync", id="sync-button", color="primary", className="mt-3"),
+            dbc.Spinner(html.Div(id="sync-report", className="mt-3"), color="primary", type="border")
+        ], title="Sync a local folder")
+    ], start_collapsed=True, className="mt-4")
 
 def layout():
     """Return the layout for this view"""
@@ -86,7 +155,14 @@ def layout():
                 ], className="mt-3"),
                 
                 html.Div(id="upload-area", className="mt-3"),
-                html.Div(id="status-area-upload", className="mt-3")
+                html.Div(id="status-area-upload", className="mt-3"),
+                html.Div([
+                    html.H5("Transfers", className="mt-4"),
+                    dcc.Interval(id="upload-transfer-interval", interval=500),
+                    dcc.Store(id="upload-transfer-store"),
+                    dcc.Store(id="transfer-session-id", storage_type="session", data=uuid.uuid4().hex),
+                    html.Div(id="upload-transfer-progress")
+                ])
             ], className="p-3"),
             
             dbc.Tab(label="Code snippet", tab_id="code-snippet", children=[
@@ -132,13 +208,16 @@ w.files.upload(volume_file_path, binary_data, overwrite=True)
                     dbc.Col([
                         html.H4("Databricks resources", className="mb-3"),
                         html.Ul([
-                            html.Li("Unity Catalog volume")
+                            html.Li("Unity Catalog volume"),
+                            html.Li(["Local folder sync: the ", html.Code("VOLUME_SYNC_LOCAL_ROOT"),
+                                     " environment variable, set to the directory the app may sync"])
                         ], className="mb-4")
                     ]),
                     dbc.Col([
                         html.H4("Dependencies", className="mb-3"),
                         html.Ul([
                             dcc.Markdown("* [Databricks SDK](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`"),
+                            dcc.Markdown("* [PyArrow](https://pypi.org/project/pyarrow/) - `pyarrow` (Parquet conversion)"),
                             dcc.Markdown("* [Dash](https://pypi.org/project/dash/) - `dash`")
                         ], className="mb-4")
                     ])
@@ -159,7 +238,7 @@ def handle_volume_check(n_clicks, volume_path):
         return None, dbc.Alert("Please specify a volume path.", color="warning")
     
     permission_result = check_upload_permissions(volume_path.strip())
-    if permission_result == "Volume and permissions validated":
+    if permission_result == PERMISSIONS_VALIDATED:
         upload_form = dbc.Form([
             # File upload section with simple inline filename display
             html.Div([
@@ -175,6 +254,36 @@ def handle_volume_check(n_clicks, volume_path):
                     ], style={"display": "inline-block"})
                 )
             ], className="mb-3"),
+            dbc.Label("Target folder", className="fw-bold mb-2"),
+            dcc.Dropdown(
+                id="target-folder-select",
+                options=[{"label": "(volume root)", "value": ""}] + [
+                    {"label": folder, "value": folder} for folder in list_target_folders(volume_path.strip())
+                ],
+                value="",
+                clearable=False,
+                className="mb-3"
+            ),
+            dbc.Switch(
+                id="skip-unchanged-switch",
+                label="Skip upload if the file is unchanged",
+                value=False,
+                className="mb-3"
+            ),
+            dbc.Switch(
+                id="parquet-switch",
+                label="Convert CSV/JSON to Parquet",
+                value=False,
+                className="mb-2"
+            ),
+            dbc.Label("Parquet compression", className="fw-bold mb-2"),
+            dcc.Dropdown(
+                id="parquet-compression-select",
+                options=[{"label": codec, "value": codec} for codec in COMPRESSION_CODECS],
+                value="zstd",
+                clearable=False,
+                className="mb-3"
+            ),
             dbc.Button(
                 f"Upload file to {volume_path}",
                 id="upload-button",
@@ -183,7 +292,9 @@ def handle_volume_check(n_clicks, volume_path):
                 disabled=True
             )
         ])
-        return upload_form, dbc.Alert("Volume and permissions validated", color="success")
+        if LOCAL_SYNC_ROOT:
+            upload_form = html.Div([upload_form, sync_form(volume_path.strip())])
+        return upload_form, dbc.Alert(PERMISSIONS_VALIDATED, color="success")
     else:
         return None, dbc.Alert(permission_result, color="danger")
 
@@ -195,18 +306,35 @@ def handle_volume_check(n_clicks, volume_path):
 def enable_upload_button(contents):
     return contents is None
 
+# Skipping unchanged files and converting to Parquet exclude each other:
+# a converted file is never compared to the manifest.
+@callback(
+    [Output("parquet-switch", "disabled"),
+     Output("skip-unchanged-switch", "disabled")],
+    [Input("skip-unchanged-switch", "value"),
+     Input("parquet-switch", "value")]
+)
+def exclude_upload_options(skip_unchanged, convert_to_parquet):
+    return bool(skip_unchanged), bool(convert_to_parquet)
+
 @callback(
     Output("status-area-upload", "children", allow_duplicate=True),
     Input("upload-button", "n_clicks"),
     [State("upload-data", "contents"),
      State("upload-data", "filename"),
-     State("volume-path-input", "value")],
+     State("volume-path-input", "value"),
+     State("target-folder-select", "value"),
+     State("skip-unchanged-switch", "value"),
+     State("parquet-switch", "value"),
+     State("parquet-compression-select", "value"),
+     State("transfer-session-id", "data")],
     prevent_initial_call=True
 )
-def handle_file_upload(n_clicks, contents, filename, volume_path):
+def handle_file_upload(n_clicks, contents, filename, volume_path, target_folder, skip_unchanged, convert_to_parquet, compression, session_id):
     if not contents or not filename or not volume_path:
         return dbc.Alert("Please select a file and specify a volume path.", color="warning")
     
+    transfer_tracker = get_transfer_tracker(session_id)
     try:
         # Decode base64 file content
         content_type, content_string = contents.split(',')
@@ -215,15 +343,50 @@ def handle_file_upload(n_clicks, contents, filename, volume_path):
         
         # Parse volume path and create file path
         parts = volume_path.strip().split(".")
-        volume_file_path = f"/Volumes/{parts[0]}/{parts[1]}/{parts[2]}/{filename}"
-        
-        # Upload file
-        w.files.upload(volume_file_path, binary_data, overwrite=True)
+        volume_file_path = "/".join(
+            part for part in [normalize_directory(volume_path), target_folder, filename] if part
+        )
         
         # Generate volume URL for success message
         databricks_host = os.getenv("DATABRICKS_HOST") or os.getenv("DATABRICKS_HOSTNAME")
         volume_url = f"https://{databricks_host}/explore/data/volumes/{parts[0]}/{parts[1]}/{parts[2]}"
         
+        # Convert CSV/JSON to Parquet while streaming it to the volume
+        if convert_to_parquet and detect_format(filename):
+            with transfer_tracker.track(UPLOAD, volume_file_path, len(file_bytes)) as transfer:
+                result = ParquetIngest(w, compression=compression).upload(transfer.wrap(binary_data), volume_file_path)
+            volume_browser.invalidate(volume_file_path.rsplit("/", 1)[0])
+            return dbc.Alert([
+                f"File '{filename}' converted to '{os.path.basename(result.file_path)}' and uploaded to ",
+                html.Strong(volume_path),
+                ". ",
+                html.A("Go to volume", href=volume_url, target="_blank"),
+                html.Br(),
+                html.Small(
+                    f"{result.rows:,} rows in {result.row_groups} row groups, "
+                    f"{result.input_bytes:,} → {result.output_bytes:,} bytes ({result.compression_ratio}x smaller)."
+                )
+            ], color="success")
+
+        # Upload file, optionally skipping it when the checksum manifest says it is unchanged.
+        # Hashing reads the raw bytes; only the upload itself counts as progress.
+        with transfer_tracker.track(UPLOAD, volume_file_path, len(file_bytes)) as transfer:
+            if skip_unchanged:
+                uploaded = dedup_uploader.upload(volume_file_path, binary_data, wrap=transfer.wrap).uploaded
+                if not uploaded:
+                    transfer.skip()
+            else:
+                w.files.upload(volume_file_path, transfer.wrap(binary_data), overwrite=True)
+                uploaded = True
+        if not uploaded:
+            return dbc.Alert([
+                f"File '{filename}' is unchanged in ",
+                html.Strong(volume_path),
+                ", upload skipped. ",
+                html.A("Go to volume", href=volume_url, target="_blank")
+            ], color="info")
+        volume_browser.invalidate(volume_file_path.rsplit("/", 1)[0])
+        
         return dbc.Alert([
             f"File '{filename}' successfully uploaded to ",
             html.Strong(volume_path),
@@ -231,8 +394,98 @@ def handle_file_upload(n_clicks, contents, filename, volume_path):
             html.A("Go to volume", href=volume_url, target="_blank")
         ], color="success")
     except Exception as e:
+        if is_permission_error(e):
+            permission_cache.invalidate(volume_path.strip())
         return dbc.Alert(f"Error uploading file: {str(e)}", color="danger")
 
+@callback(
+    Output("sync-report", "children"),
+    Input("sync-button", "n_clicks"),
+    [State("volume-path-input", "value"),
+     State("sync-local-input", "value"),
+     State("sync-volume-input", "value"),
+     State("sync-direction", "value"),
+     State("sync-workers", "value"),
+     State("sync-options", "value"),
+     State("transfer-session-id", "data")],
+    prevent_initial_call=True
+)
+def handle_sync(n_clicks, volume_path, local_dir, volume_dir, direction, workers, options, session_id):
+    if not LOCAL_SYNC_ROOT:
+        return dbc.Alert("Local folder sync is disabled: VOLUME_SYNC_LOCAL_ROOT is not set.", color="warning")
+    if not volume_path or not local_dir or not volume_dir:
+        return dbc.Alert("Please specify a local folder and a volume directory.", color="warning")
+    # Callbacks can be triggered without the form, so check the volume again (cached)
+    permission_result = check_upload_permissions(volume_path.strip())
+    if permission_result != PERMISSIONS_VALIDATED:
+        return dbc.Alert(permission_result, color="danger")
+    volume_root = normalize_directory(volume_path)
+    volume_dir = normalize_directory(volume_dir)
+    if posixpath.commonpath([volume_root, volume_dir]) != volume_root:
+        return dbc.Alert(f"The volume directory must be in {volume_root}.", color="warning")
+
+    try:
+        report = VolumeSync(w, upload_manifest, max_workers=workers, tracker=get_transfer_tracker(session_id),
+                            local_root=LOCAL_SYNC_ROOT).run(
+            local_dir.strip(),
+            volume_dir,
+            direction=direction,
+            delete="delete" in options,
+            dry_run="dry_run" in options,
+            confirm_empty_source="confirm_empty" in options
+        )
+        volume_browser.invalidate(volume_dir)
+        summary = report.summary()
+        records = report.to_records()
+        return html.Div([
+            dbc.Alert(f"{len(report.failed)} transfers failed.", color="danger") if report.failed else None,
+            dcc.Markdown(f"```json\n{json.dumps(summary, indent=2)}\n```"),
+            dash_table.DataTable(
+                data=records,
+                columns=[{"name": c, "id": c} for c in ["action", "relative_path", "size", "reason", "status", "error", "seconds"]],
+                page_size=20,
+                style_table={"overflowX": "auto"},
+                style_header={"backgroundColor": "#f8f9fa", "fontWeight": "bold"},
+                style_cell={"textAlign": "left", "padding": "8px"}
+            )
+        ])
+    except Exception as e:
+        return dbc.Alert(f"Error syncing folder: {str(e)}", color="danger")
+
+@callback(
+    Output("upload-transfer-store", "data"),
+    Input("upload-transfer-interval", "n_intervals"),
+    [State("upload-transfer-store", "data"),
+     State("transfer-session-id", "data")]
+)
+def poll_upload_transfers(n_intervals, current, session_id):
+    """Publish this session's latest transfer stats to the store; skip the update when nothing changed"""
+    records = [
+        {**stats.to_dict(), "label": stats.describe()}
+        for stats in get_transfer_tracker(session_id).recent(5)
+    ]
+    return no_update if records == current else records
+
+@callback(
+    Output("upload-transfer-progress", "children"),
+    Input("upload-transfer-store", "data")
+)
+def render_upload_transfers(records):
+    return [
+        html.Div([
+            html.Small(f"{posixpath.basename(record['path'])}: {record['status']}"),
+            dbc.Progress(
+                value=100 * (record["fraction"] or (1.0 if record["status"] in ("done", "skipped") else 0.0)),
+                label=record["label"],
+                striped=record["status"] == "running",
+                animated=record["status"] == "running",
+                color={"failed": "danger", "done": "success", "skipped": "secondary"}.get(record["status"], "primary"),
+                className="mb-2"
+            )
+        ])
+        for record in records or []
+    ]
+
 # Simple callback to show filename
 @callback(
     Output("selected-filename", "children"),
@@ -0,0 +1,268 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import posixpath
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.serving import ChatMessage, ChatMessageRole
+
+from utils.rate_limit import endpoint_rate_limiter
+
+DEFAULT_EVAL_DIR = os.getenv("BATCH_EVAL_DIR", ".batch_eval")
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+
+@dataclass
+class PromptRecord:
+    id: str
+    prompt: str
+
+
+@dataclass
+class EvalResult:
+    id: str
+    prompt: str
+    response: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    latency: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+
+
+def read_prompts(data: bytes, file_name: str) -> List[PromptRecord]:
+    """Parse a prompt file.
+
+    `.csv` files use the `prompt` column (or the first column), `.jsonl` files
+    the `prompt` field, `.json` files an array of such objects or of plain
+    strings, and anything else is read as one prompt per line. An `id`
+    column or field is kept if present; otherwise the row number is used.
+    Rows without a prompt are skipped; rows that aren't objects or whose
+    prompt isn't a string are reported in a `ValueError`.
+    """
+    text = data.decode("utf-8-sig")
+    extension = posixpath.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        rows = list(csv.DictReader(io.StringIO(text)))
+        column = "prompt" if rows and "prompt" in rows[0] else None
+        rows = [
+            {
+                "id": row.get("id") or None,
+                "prompt": row[column] if column else next(iter(row.values())),
+            }
+            for row in rows
+        ]
+    elif extension in (".jsonl", ".ndjson"):
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"Line {number} is not valid JSON: {e}") from None
+    elif extension == ".json":
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError("A .json prompt file must hold an array of prompts")
+        rows = [{"prompt": row} if isinstance(row, str) else row for row in rows]
+    else:
+        rows = [{"prompt": line} for line in text.splitlines()]
+
+    records, problems = [], []
+    for i, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            problems.append(f"row {i} is not an object")
+            continue
+        prompt = row.get("prompt")
+        if prompt is None:
+            continue
+        if not isinstance(prompt, str):
+            problems.append(f"row {i} has a prompt that is not a string")
+            continue
+        if prompt.strip():
+            record_id = row["id"] if row.get("id") is not None else i
+            records.append(PromptRecord(id=str(record_id), prompt=prompt.strip()))
+    if problems:
+        more = f" and {len(problems) - 5} more" if len(problems) > 5 else ""
+        raise ValueError(f"Invalid prompt rows: {'; '.join(problems[:5])}{more}")
+    if len({record.id for record in records}) != len(records):
+        raise ValueError("Prompt ids must be unique")
+    return records
+
+
+def summarize(results: List[EvalResult], elapsed: float = None) -> dict:
+    ok = [r for r in results if r.status == "ok"]
+    latencies = sorted(r.latency for r in ok if r.latency is not None)
+    return {
+        "prompts": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "prompt_tokens": sum(r.prompt_tokens or 0 for r in ok),
+        "completion_tokens": sum(r.completion_tokens or 0 for r in ok),
+        "latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+        "latency_p95": (
+            round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None
+        ),
+        "elapsed_seconds": None if elapsed is None else round(elapsed, 2),
+    }
+
+
+class BatchEvaluator:
+    """Runs a set of prompts against a chat endpoint with bounded concurrency.
+
+    At most `max_workers` requests are in flight, and all of them share the
+    endpoint's process-wide `rate` limit (requests per second). Every result
+    is appended to a checkpoint file as soon as it arrives; the file name is
+    derived from the endpoint, the generation parameters and the prompts, so
+    re-running the same evaluation resumes where it stopped and only retries
+    prompts that failed or were never sent.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        max_workers: int = 16,
+        rate: float = 10.0,
+        checkpoint_dir: str = DEFAULT_EVAL_DIR,
+    ):
+        self.w = w
+        self.max_workers = max_workers
+        self.rate = rate
+        self.checkpoint_dir = checkpoint_dir
+
+    def checkpoint_path(
+        self,
+        endpoint_name: str,
+        prompts: List[PromptRecord],
+        temperature: float,
+        max_tokens: Optional[int],
+        system_prompt: str,
+    ) -> str:
+        key = json.dumps(
+            [
+                endpoint_name,
+                temperature,
+                max_tokens,
+                system_prompt,
+                [[p.id, p.prompt] for p in prompts],
+            ]
+        )
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(self.checkpoint_dir, f"{endpoint_name}-{digest}.jsonl")
+
+    @staticmethod
+    def load_checkpoint(path: str) -> Dict[str, EvalResult]:
+        """Successful results from a previous run, keyed by prompt id."""
+        results = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        result = EvalResult(**json.loads(line))
+                    except (ValueError, TypeError):
+                        continue  # a line cut short by an interrupted run
+                    if result.status == "ok":
+                        results[result.id] = result
+        return results
+
+    def _query(
+        self,
+        endpoint_name: str,
+        record: PromptRecord,
+        temperature: float,
+        max_tokens: Optional[int],
+        system_prompt: str,
+    ) -> EvalResult:
+        endpoint_rate_limiter(endpoint_name, self.rate).acquire()
+        start = time.perf_counter()
+        try:
+            response = self.w.serving_endpoints.query(
+                name=endpoint_name,
+                messages=[
+                    ChatMessage(role=ChatMessageRole.SYSTEM, content=system_prompt),
+                    ChatMessage(role=ChatMessageRole.USER, content=record.prompt),
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+        except Exception as e:
+            return EvalResult(
+                id=record.id,
+                prompt=record.prompt,
+                latency=round(time.perf_counter() - start, 3),
+                status="failed",
+                error=str(e),
+            )
+        usage = response.usage
+        return EvalResult(
+            id=record.id,
+            prompt=record.prompt,
+            response=response.choices[0].message.content if response.choices else None,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            total_tokens=usage.total_tokens if usage else None,
+            latency=round(time.perf_counter() - start, 3),
+        )
+
+    def run(
+        self,
+        endpoint_name: str,
+        prompts: List[PromptRecord],
+        temperature: float = 0.0,
+        max_tokens: int = None,
+        system_prompt: str = SYSTEM_PROMPT,
+        on_progress: Callable[[int, int, EvalResult], None] = None,
+    ) -> List[EvalResult]:
+        """Evaluate `prompts` and return one result per prompt, in input order.
+
+        `on_progress(done, total, result)` is called after each new result.
+        """
+        path = self.checkpoint_path(
+            endpoint_name, prompts, temperature, max_tokens, system_prompt
+        )
+        results = self.load_checkpoint(path)
+        pending = [p for p in prompts if p.id not in results]
+        done = len(prompts) - len(pending)
+
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="batch-eval"
+        )
+        try:
+            with open(path, "a") as checkpoint:
+                futures = [
+                    pool.submit(
+                        self._query,
+                        endpoint_name,
+                        record,
+                        temperature,
+                        max_tokens,
+                        system_prompt,
+                    )
+                    for record in pending
+                ]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results[result.id] = result
+                    checkpoint.write(json.dumps(asdict(result)) + "\n")
+                    checkpoint.flush()
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(prompts), result)
+        finally:
+            # Drop queued prompts if the run is interrupted; they resume next time.
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return [results[p.id] for p in prompts]
+
+    @staticmethod
+    def to_records(results: List[EvalResult]) -> List[dict]:
+        return [asdict(result) for result in results]
@@ -0,0 +1,212 @@
+import io
+import json
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.serving import DataframeSplitInput
+
+from utils.rate_limit import endpoint_rate_limiter
+
+# Model Serving rejects request bodies above 16 MB.
+MAX_PAYLOAD_BYTES = 16 * 1024 * 1024
+
+
+def read_scoring_input(data: bytes, file_name: str) -> pd.DataFrame:
+    """Load a `.csv` or `.parquet` file into a DataFrame."""
+    extension = posixpath.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        return pd.read_csv(io.BytesIO(data))
+    if extension == ".parquet":
+        return pd.read_parquet(io.BytesIO(data))
+    raise ValueError(f"Unsupported input format: {file_name}")
+
+
+def write_parquet(
+    chunks: Iterable[pd.DataFrame], sink: BinaryIO, preview_rows: int = 100
+) -> Tuple[int, pd.DataFrame]:
+    """Write DataFrame chunks to one Parquet file as they arrive.
+
+    Later chunks are cast to the first chunk's schema. Returns the number of
+    rows written and the first `preview_rows` of them.
+    """
+    writer = None
+    rows = 0
+    preview = pd.DataFrame()
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+                preview = chunk.head(preview_rows)
+            else:
+                table = pa.Table.from_pandas(
+                    chunk, schema=writer.schema, preserve_index=False
+                )
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, preview
+
+
+def is_payload_too_large(e: Exception) -> bool:
+    message = str(e).lower()
+    return "413" in message or "too large" in message or "payload size" in message
+
+
+def split_payload(batch: pd.DataFrame) -> DataframeSplitInput:
+    # Round-trip through pandas' JSON writer so NaN, timestamps and numpy
+    # scalars become JSON-safe values.
+    split = json.loads(batch.to_json(orient="split", date_format="iso", index=False))
+    return DataframeSplitInput(columns=split["columns"], data=split["data"])
+
+
+class BatchScorer:
+    """Scores a DataFrame against a traditional ML endpoint in `dataframe_split` batches.
+
+    The batch size is derived from the serialized size of a sample of rows so
+    that each request uses about `target_fraction` of the endpoint's payload
+    limit; a batch that is still rejected as too large is split in half and
+    retried. Up to `max_workers` batches are in flight at once, optionally
+    limited to `rate` requests per second, and predictions are joined back
+    onto the input rows in their original order. Batches already answered by
+    the optional `ResponseCache` are not sent again, and requests go through
+    the optional `ResilientInvoker` for timeouts, hedging and retries.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        max_workers: int = 8,
+        max_payload_bytes: int = MAX_PAYLOAD_BYTES,
+        target_fraction: float = 0.5,
+        max_batch_rows: int = 10_000,
+        rate: float = None,
+        cache=None,
+        invoker=None,
+    ):
+        self.w = w
+        self.max_workers = max_workers
+        self.max_payload_bytes = max_payload_bytes
+        self.target_fraction = target_fraction
+        self.max_batch_rows = max_batch_rows
+        self.rate = rate
+        self.cache = cache
+        self.invoker = invoker
+
+    def batch_rows(self, df: pd.DataFrame, sample_rows: int = 1000) -> int:
+        """Rows per request that keep the payload under the target size."""
+        if df.empty:
+            return 1
+        sample = df.head(sample_rows)
+        sample_bytes = len(
+            sample.to_json(orient="split", date_format="iso", index=False)
+        )
+        bytes_per_row = max(sample_bytes / len(sample), 1)
+        rows = int(self.max_payload_bytes * self.target_fraction / bytes_per_row)
+        return max(1, min(rows, self.max_batch_rows))
+
+    def _score(self, endpoint_name: str, batch: pd.DataFrame) -> List:
+        request = {"dataframe_split": split_payload(batch)}
+        response = self.cache.get(endpoint_name, request) if self.cache else None
+        if response is not None:
+            return response.predictions
+        if self.rate:
+            endpoint_rate_limiter(endpoint_name, self.rate).acquire()
+        try:
+            if self.invoker:
+                response = self.invoker.query(endpoint_name, idempotent=True, **request)
+            else:
+                response = self.w.serving_endpoints.query(name=endpoint_name, **request)
+        except Exception as e:
+            if len(batch) > 1 and is_payload_too_large(e):
+                middle = len(batch) // 2
+                return self._score(endpoint_name, batch.iloc[:middle]) + self._score(
+                    endpoint_name, batch.iloc[middle:]
+                )
+            raise
+        predictions = response.predictions or []
+        if len(predictions) != len(batch):
+            raise ValueError(
+                f"Endpoint returned {len(predictions)} predictions for {len(batch)} rows"
+            )
+        if self.cache:
+            self.cache.put(endpoint_name, request, response)
+        return predictions
+
+    def score(
+        self,
+        endpoint_name: str,
+        df: pd.DataFrame,
+        batch_rows: int = None,
+        on_progress: Callable[[int, int], None] = None,
+    ) -> pd.DataFrame:
+        """Return `df` with the endpoint's predictions appended as columns.
+
+        Scalar predictions go into a `prediction` column; dict predictions are
+        expanded into one `prediction_<key>` column per key.
+        `on_progress(rows_done, rows_total)` is called after each batch.
+        """
+        batch_rows = batch_rows or self.batch_rows(df)
+        batches = [df.iloc[i : i + batch_rows] for i in range(0, len(df), batch_rows)]
+        predictions: List[Optional[List]] = [None] * len(batches)
+        rows_done = 0
+
+        pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="batch-scoring"
+        )
+        try:
+            futures = {
+                pool.submit(self._score, endpoint_name, batch): i
+                for i, batch in enumerate(batches)
+            }
+            for future in futures:
+                i = futures[future]
+                predictions[i] = future.result()
+                rows_done += len(batches[i])
+                if on_progress:
+                    on_progress(rows_done, len(df))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        flat = [p for batch in predictions for p in batch]
+        if flat and isinstance(flat[0], dict):
+            scores = pd.DataFrame(flat).add_prefix("prediction_")
+        else:
+            scores = pd.DataFrame({"prediction": flat})
+        scores.index = df.index
+        return pd.concat([df, scores], axis=1)
+
+    def score_chunks(
+        self,
+        endpoint_name: str,
+        chunks: Iterable[pd.DataFrame],
+        batch_rows: int = None,
+        on_progress: Callable[[int], None] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Score `chunks` (e.g. a table read a chunk at a time) one after the other.
+
+        Yields each chunk with its predictions, so only one chunk is held in
+        memory. `batch_rows` is derived from the first chunk if not given.
+        `on_progress(rows_done)` is called after each batch.
+        """
+        rows_before = 0
+        for chunk in chunks:
+            batch_rows = batch_rows or self.batch_rows(chunk)
+
+            def progress(done, total, before=rows_before):
+                on_progress(before + done)
+
+            yield self.score(
+                endpoint_name,
+                chunk,
+                batch_rows=batch_rows,
+                on_progress=progress if on_progress else None,
+            )
+            rows_before += len(chunk)
@@ -0,0 +1,193 @@
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.serving import ChatMessage, ChatMessageRole
+
+from utils.llm_stream import SYSTEM_PROMPT
+
+# Tokens a chat template adds around each message (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in a few sentences. Keep the facts, names, "
+    "numbers and decisions the assistant will need to continue it."
+)
+
+
+@dataclass
+class Turn:
+    role: str
+    content: str
+
+
+def to_chat_messages(messages: List[Dict[str, str]]) -> List[ChatMessage]:
+    """Convert `{"role", "content"}` dicts for `w.serving_endpoints.query`."""
+    return [
+        ChatMessage(role=ChatMessageRole(message["role"]), content=message["content"])
+        for message in messages
+    ]
+
+
+class TokenCounter:
+    """Estimates token counts from text length.
+
+    Starts at `chars_per_token` and moves toward the ratio observed in the
+    `prompt_tokens` the endpoint reports, so no tokenizer is needed.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, smoothing: float = 0.3):
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        return sum(
+            self.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            for message in messages
+        )
+
+    def calibrate(self, messages: List[Dict[str, str]], prompt_tokens: int):
+        chars = sum(len(message["content"]) for message in messages)
+        content_tokens = prompt_tokens - MESSAGE_OVERHEAD_TOKENS * len(messages)
+        if chars and content_tokens > 0:
+            observed = chars / content_tokens
+            self.chars_per_token += self.smoothing * (observed - self.chars_per_token)
+
+
+def endpoint_summarizer(
+    w: WorkspaceClient, endpoint_name: str, max_tokens: int = 300
+) -> Callable[[str, List[Turn]], str]:
+    """A summarizer for `Conversation` that asks the chat endpoint itself."""
+
+    def summarize(summary: str, turns: List[Turn]) -> str:
+        transcript = "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+        response = w.serving_endpoints.query(
+            name=endpoint_name,
+            messages=[
+                ChatMessage(role=ChatMessageRole.SYSTEM, content=SUMMARY_PROMPT),
+                ChatMessage(
+                    role=ChatMessageRole.USER,
+                    content=f"Earlier summary:\n{summary or '-'}\n\nConversation:\n{transcript}",
+                ),
+            ],
+            temperature=0.0,
+            max_tokens=max_tokens,
+        )
+        return response.choices[0].message.content.strip()
+
+    return summarize
+
+
+class Conversation:
+    """Multi-turn chat history kept within a prompt token budget.
+
+    Each request is the system prompt (plus a summary of earlier turns), the
+    recent turns and the new prompt. When that would exceed
+    `max_prompt_tokens`, the oldest turns are folded into the summary by
+    `summarizer(summary, turns)`, or dropped if there is none, until the
+    prompt is below `compact_to` of the budget. Compacting in one step
+    instead of a turn at a time leaves the start of the prompt unchanged
+    between compactions, so endpoints with prompt caching can reuse it, and
+    keeps the prompt size, and with it the per-turn latency, bounded.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str = SYSTEM_PROMPT,
+        max_prompt_tokens: int = 4000,
+        compact_to: float = 0.5,
+        summarizer: Callable[[str, List[Turn]], str] = None,
+        max_summary_chars: int = 2000,
+        counter: TokenCounter = None,
+    ):
+        self.system_prompt = system_prompt
+        self.max_prompt_tokens = max_prompt_tokens
+        self.compact_to = compact_to
+        self.summarizer = summarizer
+        self.max_summary_chars = max_summary_chars
+        self.counter = counter or TokenCounter()
+        self.turns: List[Turn] = []
+        self.transcript: List[Turn] = []
+        self.summary = ""
+        self.compactions = 0
+        self.compacted_turns = 0
+        self._last_sent: Optional[List[Dict[str, str]]] = None
+
+    def messages(self, prompt: str = None) -> List[Dict[str, str]]:
+        system = self.system_prompt
+        if self.summary:
+            system += f"\n\nSummary of the earlier conversation:\n{self.summary}"
+        turns = self.turns + ([Turn("user", prompt)] if prompt else [])
+        return [{"role": "system", "content": system}] + [
+            {"role": turn.role, "content": turn.content} for turn in turns
+        ]
+
+    def prompt_tokens(self, prompt: str = None) -> int:
+        return self.counter.count_messages(self.messages(prompt))
+
+    def _compact(self, prompt: str):
+        target = self.max_prompt_tokens * self.compact_to
+        dropped = []
+        while self.turns and self.prompt_tokens(prompt) > target:
+            dropped.append(self.turns.pop(0))
+            # Keep user/assistant pairs together.
+            if self.turns and self.turns[0].role == "assistant":
+                dropped.append(self.turns.pop(0))
+        if not dropped:
+            return
+        self.compactions += 1
+        self.compacted_turns += len(dropped)
+        if self.summarizer:
+            try:
+                summary = self.summarizer(self.summary, dropped)
+                self.summary = summary[: self.max_summary_chars]
+            except Exception:
+                pass  # keep the previous summary; the turns are dropped either way
+
+    def prepare(self, prompt: str) -> List[Dict[str, str]]:
+        """Add the user's prompt and return the messages to send.
+
+        A previous prompt that never got an answer (the request failed) is
+        replaced.
+        """
+        if self.turns and self.turns[-1].role == "user":
+            self.turns.pop()
+            self.transcript.pop()
+        if self.prompt_tokens(prompt) > self.max_prompt_tokens:
+            self._compact(prompt)
+        turn = Turn("user", prompt)
+        self.turns.append(turn)
+        self.transcript.append(turn)
+        self._last_sent = self.messages()
+        return self._last_sent
+
+    def record(self, answer: str, prompt_tokens: int = None):
+        """Add the assistant's answer; `prompt_tokens` from the usage calibrates counting."""
+        turn = Turn("assistant", answer)
+        self.turns.append(turn)
+        self.transcript.append(turn)
+        if prompt_tokens and self._last_sent:
+            self.counter.calibrate(self._last_sent, prompt_tokens)
+
+    def clear(self):
+        self.turns.clear()
+        self.transcript.clear()
+        self.summary = ""
+        self.compactions = 0
+        self.compacted_turns = 0
+        self._last_sent = None
+
+    def stats(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens(),
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "turns_in_prompt": len(self.turns),
+            "turns_total": len(self.transcript),
+            "compactions": self.compactions,
+            "compacted_turns": self.compacted_turns,
+            "chars_per_token": round(self.counter.chars_per_token, 2),
+        }
@@ -0,0 +1,346 @@
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from databricks.sdk.service.vectorsearch import (
+    ColumnInfo,
+    DirectAccessVectorIndexSpec,
+    EmbeddingSourceColumn,
+    EmbeddingVectorColumn,
+    QueryVectorIndexResponse,
+    ResultData,
+    ResultManifest,
+    VectorIndex,
+    VectorIndexType,
+)
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_VECTOR_INDEX_DIR")
+
+METRICS = ("cosine", "dot", "l2")
+
+# Column name under which `query_index` returns the vectors themselves.
+VECTOR_COLUMN = "vector"
+
+# Comparison suffixes of `filters_json` keys, e.g. {"price <": 10}.
+FILTER_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+def filter_mask(
+    rows: pd.DataFrame, filters_json: Optional[str]
+) -> Optional[np.ndarray]:
+    """Rows matching a Vector Search `filters_json`, or None if there is no filter.
+
+    Supports `{"col": value}`, `{"col": [values]}`, `{"col NOT": value}`
+    and the comparisons `<`, `<=`, `>` and `>=`.
+    """
+    if not filters_json:
+        return None
+    mask = np.ones(len(rows), dtype=bool)
+    for key, value in json.loads(filters_json).items():
+        name, _, operator = key.strip().partition(" ")
+        if name not in rows.columns:
+            raise ValueError(f"Unknown filter column `{name}`")
+        column = rows[name].to_numpy()
+        values = value if isinstance(value, list) else [value]
+        if not operator:
+            mask &= np.isin(column, values)
+        elif operator.upper() == "NOT":
+            mask &= ~np.isin(column, values)
+        elif operator in FILTER_OPERATORS:
+            mask &= FILTER_OPERATORS[operator](column, value)
+        else:
+            raise ValueError(f"Unsupported filter operator `{operator}`")
+    return mask
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _kmeans(
+    vectors: np.ndarray,
+    k: int,
+    normalize: bool = False,
+    iterations: int = 10,
+    sample_size: int = 256,
+    seed: int = 0,
+) -> np.ndarray:
+    """Centroids from Lloyd's algorithm on a sample of `sample_size` rows per centroid."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = np.asarray(
+        vectors[np.sort(rng.choice(n, min(n, k * sample_size), replace=False))],
+        dtype=np.float32,
+    )
+    if normalize:
+        sample = _normalized(sample)
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _nearest(
+    vectors: np.ndarray,
+    centroids: np.ndarray,
+    normalize: bool = False,
+    chunk: int = 65536,
+) -> np.ndarray:
+    """Index of the closest centroid (L2) for each row, in chunks to bound memory."""
+    centroid_norms = (centroids**2).sum(axis=1)
+    assignments = []
+    for i in range(0, len(vectors), chunk):
+        block = np.asarray(vectors[i : i + chunk], dtype=np.float32)
+        if normalize:
+            block = _normalized(block)
+        assignments.append(np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1))
+    return np.concatenate(assignments)
+
+
+class LocalVectorIndex:
+    """An in-process vector index answering `query_index` like Vector Search.
+
+    `vectors` is a float32 matrix, which may be memory-mapped, and `rows`
+    holds the other columns, one row per vector. Indexes below
+    `ann_threshold` rows are searched exactly with one matrix product.
+    Larger ones get an IVF index: the vectors are clustered into `nlist`
+    lists (√rows by default) with k-means, and a query scores only the
+    vectors in its `nprobe` closest lists, trading some recall for speed.
+    Filtered queries are always exact over the matching rows.
+
+    Scores are cosine similarity, the dot product, or for `l2`
+    `1 / (1 + distance²)`, so higher is always closer.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        rows: pd.DataFrame,
+        metric: str = "cosine",
+        ann_threshold: int = 50_000,
+        nlist: int = None,
+        nprobe: int = 16,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        if len(vectors) != len(rows):
+            raise ValueError(f"{len(vectors)} vectors but {len(rows)} rows")
+        self.vectors = vectors
+        self.rows = rows.reset_index(drop=True)
+        self.metric = metric
+        self.nprobe = nprobe
+        self._norms = np.concatenate(
+            [
+                np.linalg.norm(np.asarray(vectors[i : i + 65536]), axis=1)
+                for i in range(0, len(vectors), 65536)
+            ]
+            or [np.empty(0, dtype=np.float32)]
+        )
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        if len(vectors) >= ann_threshold:
+            self.build_ivf(nlist or int(np.sqrt(len(vectors))))
+
+    @classmethod
+    def from_parquet(
+        cls, path: str, vector_column: str, **kwargs
+    ) -> "LocalVectorIndex":
+        """An index over a Parquet file with the embeddings in `vector_column`."""
+        rows = pd.read_parquet(path)
+        vectors = np.vstack(rows.pop(vector_column).to_numpy()).astype(np.float32)
+        return cls(vectors, rows, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, nprobe: int = 16) -> "LocalVectorIndex":
+        """Load an index written by `save`; the vectors are memory-mapped unless `mmap` is False."""
+        with open(os.path.join(path, "index.json")) as f:
+            meta = json.load(f)
+        vectors = np.load(
+            os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None
+        )
+        rows = pd.read_parquet(os.path.join(path, "rows.parquet"))
+        index = cls(
+            vectors,
+            rows,
+            metric=meta["metric"],
+            ann_threshold=len(vectors) + 1,  # the saved IVF lists are reused
+            nprobe=nprobe,
+        )
+        ivf_path = os.path.join(path, "ivf.npz")
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            index._centroids = ivf["centroids"]
+            index._lists = ivf["lists"]
+            index._offsets = ivf["offsets"]
+        return index
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), np.asarray(self.vectors))
+        self.rows.to_parquet(os.path.join(path, "rows.parquet"), index=False)
+        if self._centroids is not None:
+            np.savez(
+                os.path.join(path, "ivf.npz"),
+                centroids=self._centroids,
+                lists=self._lists,
+                offsets=self._offsets,
+            )
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump({"metric": self.metric}, f)
+
+    def build_ivf(self, nlist: int):
+        """Cluster the vectors into `nlist` lists for approximate search."""
+        nlist = max(1, min(nlist, len(self.vectors)))
+        normalize = self.metric == "cosine"
+        self._centroids = _kmeans(self.vectors, nlist, normalize)
+        assignment = _nearest(self.vectors, self._centroids, normalize)
+        self._lists = np.argsort(assignment, kind="stable")
+        self._offsets = np.searchsorted(assignment[self._lists], np.arange(nlist + 1))
+
+    def _scores(self, ids: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        vectors = self.vectors if ids is None else self.vectors[ids]
+        norms = self._norms if ids is None else self._norms[ids]
+        dots = np.asarray(vectors) @ query
+        if self.metric == "dot":
+            return dots
+        if self.metric == "cosine":
+            return dots / np.maximum(norms * np.linalg.norm(query), 1e-12)
+        return 1 / (1 + np.maximum(norms**2 - 2 * dots + query @ query, 0))
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self._centroids))
+        # Cosine neighbours are L2 neighbours of the normalized vectors.
+        if self.metric == "cosine":
+            query = _normalized(query)
+        distances = ((self._centroids - query) ** 2).sum(axis=1)
+        probed = np.argpartition(distances, nprobe - 1)[:nprobe]
+        return np.sort(
+            np.concatenate(
+                [self._lists[self._offsets[i] : self._offsets[i + 1]] for i in probed]
+            )
+        )
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        num_results: int = 10,
+        filters_json: str = None,
+    ):
+        """Positions and scores of the `num_results` closest rows, best first."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape != (self.vectors.shape[1],):
+            raise ValueError(
+                f"Query vector has {query.size} dimensions, the index {self.vectors.shape[1]}"
+            )
+        mask = filter_mask(self.rows, filters_json)
+        ids = np.flatnonzero(mask) if mask is not None else self._candidates(query)
+        scores = self._scores(ids, query)
+        k = min(num_results, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (top if ids is None else ids[top]), scores[top]
+
+    def query_index(
+        self,
+        index_name: str,
+        columns: List[str],
+        *,
+        query_vector: Sequence[float] = None,
+        num_results: int = None,
+        filters_json: str = None,
+        score_threshold: float = None,
+        **kwargs,
+    ) -> QueryVectorIndexResponse:
+        """Same arguments and response as `w.vector_search_indexes.query_index`."""
+        if query_vector is None:
+            raise ValueError("Local indexes are queried with `query_vector`")
+        unknown = [
+            c for c in columns if c not in self.rows.columns and c != VECTOR_COLUMN
+        ]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        positions, scores = self.search(query_vector, num_results or 10, filters_json)
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            positions, scores = positions[keep], scores[keep]
+        selected = self.rows.iloc[positions]
+        if VECTOR_COLUMN in columns and VECTOR_COLUMN not in self.rows.columns:
+            vectors = np.asarray(self.vectors[positions]).tolist()
+            selected = selected.assign(**{VECTOR_COLUMN: vectors})
+        data = selected[columns].to_dict("split")["data"]
+        data_array = [row + [float(score)] for row, score in zip(data, scores)]
+        return QueryVectorIndexResponse(
+            manifest=ResultManifest(
+                column_count=len(columns) + 1,
+                columns=[ColumnInfo(name=name) for name in [*columns, "score"]],
+            ),
+            result=ResultData(data_array=data_array, row_count=len(data_array)),
+        )
+
+
+class LocalVectorIndexes:
+    """Stand-in for `w.vector_search_indexes` backed by indexes saved under `root`.
+
+    `query_index(index_name, ...)` loads `<root>/<index_name>` on first use.
+    With `embed`, a function from text to vector, `query_text` queries work
+    like on indexes with managed embeddings.
+    """
+
+    def __init__(self, root: str, embed: Callable[[str], Sequence[float]] = None):
+        self.root = root
+        self.embed = embed
+        self._indexes: Dict[str, LocalVectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, index_name: str) -> LocalVectorIndex:
+        with self._lock:
+            index = self._indexes.get(index_name)
+            if index is None:
+                index = LocalVectorIndex.load(os.path.join(self.root, index_name))
+                self._indexes[index_name] = index
+            return index
+
+    def get_index(self, index_name: str) -> VectorIndex:
+        """Describe a local index like `w.vector_search_indexes.get_index`."""
+        index = self.get(index_name)
+        return VectorIndex(
+            name=index_name,
+            index_type=VectorIndexType.DIRECT_ACCESS,
+            direct_access_index_spec=DirectAccessVectorIndexSpec(
+                embedding_source_columns=(
+                    [EmbeddingSourceColumn(name="text")] if self.embed else None
+                ),
+                embedding_vector_columns=[
+                    EmbeddingVectorColumn(
+                        name=VECTOR_COLUMN, embedding_dimension=index.vectors.shape[1]
+                    )
+                ],
+            ),
+        )
+
+    def query_index(
+        self, index_name: str, columns: List[str], **kwargs: Any
+    ) -> QueryVectorIndexResponse:
+        query_text = kwargs.pop("query_text", None)
+        if kwargs.get("query_vector") is None and query_text and self.embed:
+            kwargs["query_vector"] = self.embed(query_text)
+        return self.get(index_name).query_index(index_name, columns, **kwargs)
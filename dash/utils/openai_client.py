@@ -0,0 +1,138 @@
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+from databricks.sdk.core import Config
+from openai import OpenAI
+
+
+class _DatabricksAuth(httpx.Auth):
+    """Bearer auth from the SDK config, re-read for every request.
+
+    `Config.authenticate` returns a cached token and refreshes it before it
+    expires. A 401 is retried once with freshly read headers, in case the
+    token expired while the request was in flight.
+    """
+
+    def __init__(self, cfg: Config, provider: "OpenAIClientProvider"):
+        self.cfg = cfg
+        self.provider = provider
+
+    def auth_flow(self, request: httpx.Request):
+        request.headers["Authorization"] = self.cfg.authenticate()["Authorization"]
+        response = yield request
+        if response.status_code == 401:
+            self.provider._record(auth_retry=True)
+            request.headers["Authorization"] = self.cfg.authenticate()["Authorization"]
+            response = yield request
+        self.provider._record(
+            error=(
+                f"HTTP {response.status_code}" if response.status_code == 401 else None
+            )
+        )
+
+
+class OpenAIClientProvider:
+    """One OpenAI client for the workspace's serving endpoints, created on first use.
+
+    Equivalent to `w.serving_endpoints.get_open_ai_client()`, except that
+    nothing is resolved until a request is made, and every caller shares
+    one HTTP connection pool that keeps up to `max_keepalive_connections`
+    connections open for `keepalive_expiry` seconds. The provider can be
+    used in place of the client: `provider.embeddings.create(...)`. A
+    failure to create the client is raised to the caller and retried on
+    the next use; `health()` reports the last outcome.
+    """
+
+    def __init__(
+        self,
+        config_factory: Callable[[], Config] = Config,
+        max_connections: int = 64,
+        max_keepalive_connections: int = 32,
+        keepalive_expiry: float = 120.0,
+    ):
+        self.config_factory = config_factory
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client = None
+        self._lock = threading.Lock()
+        self._created_at: Optional[float] = None
+        self._requests = 0
+        self._auth_retries = 0
+        self._last_error: Optional[str] = None
+
+    def get(self):
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                try:
+                    cfg = self.config_factory()
+                    self._client = OpenAI(
+                        base_url=cfg.host + "/serving-endpoints",
+                        # Placeholder: requests are authenticated by _DatabricksAuth.
+                        api_key="no-token",
+                        http_client=httpx.Client(
+                            auth=_DatabricksAuth(cfg, self), limits=self.limits
+                        ),
+                    )
+                    self._created_at = time.time()
+                    self._last_error = None
+                except Exception as e:
+                    self._last_error = f"Client creation failed: {e}"
+                    raise
+            return self._client
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def _record(self, auth_retry: bool = False, error: str = None):
+        with self._lock:
+            if auth_retry:
+                self._auth_retries += 1
+            else:
+                self._requests += 1
+                self._last_error = error
+
+    def reset(self):
+        """Close the client; the next use creates a new one."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def health(self) -> dict:
+        with self._lock:
+            if self._last_error:
+                status = "error"
+            elif self._client is None:
+                status = "not started"
+            else:
+                status = "ok"
+            return {
+                "status": status,
+                "created_at": self._created_at,
+                "requests": self._requests,
+                "auth_retries": self._auth_retries,
+                "last_error": self._last_error,
+            }
+
+
+_provider: Optional[OpenAIClientProvider] = None
+_provider_lock = threading.Lock()
+
+
+def openai_client_provider() -> OpenAIClientProvider:
+    """Process-wide provider shared by every page that calls serving endpoints."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = OpenAIClientProvider()
+        return _provider
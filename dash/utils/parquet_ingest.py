@@ -0,0 +1,276 @@
+import posixpath
+import queue
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, Optional, Union
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+from databricks.sdk import WorkspaceClient
+
+FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".json": "json",
+    ".jsonl": "json",
+    ".ndjson": "json",
+}
+COMPRESSION_CODECS = ["snappy", "zstd", "gzip", "brotli", "lz4", "none"]
+_EOF = object()
+
+
+def detect_format(file_name: str) -> Optional[str]:
+    return FORMATS.get(posixpath.splitext(file_name)[1].lower())
+
+
+def parquet_file_name(file_name: str) -> str:
+    return posixpath.splitext(file_name)[0] + ".parquet"
+
+
+class _Pipe:
+    """Bounded in-memory pipe between the Parquet writer thread and `w.files.upload`.
+
+    The writer side looks like an unseekable output file to pyarrow; the
+    reader side is the `BinaryIO` handed to the upload. A failure on the
+    writer side is re-raised from `read()`, so a truncated file is never
+    uploaded.
+    """
+
+    def __init__(self, max_chunks: int = 16):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._buffer = b""
+        self._eof = False
+        self._position = 0
+        self.error: Optional[BaseException] = None
+        self.aborted = threading.Event()
+        self.closed = False
+
+    # Writer side
+    def write(self, data) -> int:
+        data = bytes(data)
+        while not self.aborted.is_set():
+            try:
+                self._chunks.put(data, timeout=0.5)
+                self._position += len(data)
+                return len(data)
+            except queue.Full:
+                continue
+        raise IOError("Upload stopped reading from the pipe")
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        # pyarrow closes its output file before the producer knows whether the
+        # conversion succeeded; the pipe is only ended through `finish()`.
+        pass
+
+    def finish(self, error: BaseException = None):
+        self.error = error
+        while not self.aborted.is_set():
+            try:
+                self._chunks.put(_EOF, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    # Reader side
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if chunk is _EOF:
+                self._eof = True
+                if self.error is not None:
+                    raise self.error
+            else:
+                self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+@dataclass
+class IngestResult:
+    file_path: str
+    rows: int
+    row_groups: int
+    input_bytes: int
+    output_bytes: int
+    schema: str
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        return (
+            round(self.input_bytes / self.output_bytes, 2)
+            if self.output_bytes
+            else None
+        )
+
+
+class _CountingReader:
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self.bytes_read = 0
+        self.closed = False
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+def json_batches(source, block_size: int) -> Iterator[pa.RecordBatch]:
+    """Record batches of newline-delimited JSON, parsed `block_size` bytes at a time.
+
+    The schema is inferred from the first block and locked for the rest of
+    the input; fields that are not in it are ignored.
+    """
+    schema = None
+    remainder = b""
+    while True:
+        block = source.read(block_size)
+        data = remainder + block
+        if block:
+            cut = data.rfind(b"\n") + 1
+            data, remainder = data[:cut], data[cut:]
+        else:
+            remainder = b""
+        if data.strip():
+            parse_options = (
+                pa_json.ParseOptions(
+                    explicit_schema=schema, unexpected_field_behavior="ignore"
+                )
+                if schema is not None
+                else None
+            )
+            table = pa_json.read_json(
+                pa.BufferReader(data), parse_options=parse_options
+            )
+            schema = schema or table.schema
+            yield from table.to_batches()
+        if not block:
+            return
+
+
+class ParquetIngest:
+    """Converts CSV or newline-delimited JSON to Parquet while uploading it.
+
+    The input is parsed in `block_size` chunks. The schema is inferred from
+    the first chunk and locked for the rest of the file, batches are grouped
+    into row groups of `row_group_size` rows, and the Parquet bytes are
+    streamed to the volume as they are produced. `compression` is a codec
+    name or a `{column: codec}` mapping.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        compression: Union[str, Dict[str, str]] = "zstd",
+        compression_level: Optional[int] = None,
+        row_group_size: int = 128 * 1024,
+        block_size: int = 4 * 1024 * 1024,
+    ):
+        self.w = w
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.block_size = block_size
+
+    def _csv_batches(self, source, delimiter: str) -> Iterator[pa.RecordBatch]:
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(block_size=self.block_size),
+            parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        )
+        # open_csv infers the schema from the first block and enforces it afterwards.
+        yield from reader
+
+    def _json_batches(self, source) -> Iterator[pa.RecordBatch]:
+        return json_batches(source, self.block_size)
+
+    def _row_groups(self, batches: Iterator[pa.RecordBatch]) -> Iterator[pa.Table]:
+        pending, rows = [], 0
+        for batch in batches:
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows >= self.row_group_size:
+                yield pa.Table.from_batches(pending)
+                pending, rows = [], 0
+        if pending:
+            yield pa.Table.from_batches(pending)
+
+    def convert(self, source: BinaryIO, sink, fmt: str) -> dict:
+        """Write `source` as Parquet into the file-like `sink`; returns conversion stats."""
+        if fmt == "json":
+            batches = self._json_batches(source)
+        else:
+            batches = self._csv_batches(source, "\t" if fmt == "tsv" else ",")
+        out = pa.PythonFile(sink, mode="w")
+        writer = None
+        rows = row_groups = 0
+        schema = None
+        try:
+            for table in self._row_groups(batches):
+                if writer is None:
+                    schema = table.schema
+                    writer = pq.ParquetWriter(
+                        out,
+                        schema,
+                        compression=self.compression,
+                        compression_level=self.compression_level,
+                    )
+                writer.write_table(table, row_group_size=table.num_rows)
+                rows += table.num_rows
+                row_groups += 1
+            if writer is None:
+                raise ValueError("The file contains no rows to convert")
+        finally:
+            if writer is not None:
+                writer.close()
+            out.close()
+        return {"rows": rows, "row_groups": row_groups, "schema": str(schema)}
+
+    def upload(self, source: BinaryIO, file_path: str, fmt: str = None) -> IngestResult:
+        """Convert `source` and stream the Parquet output to `file_path` in a volume."""
+        fmt = fmt or detect_format(file_path)
+        if fmt not in ("csv", "tsv", "json"):
+            raise ValueError(f"Unsupported format for Parquet conversion: {file_path}")
+        target_path = parquet_file_name(file_path)
+        counting = _CountingReader(source)
+        pipe = _Pipe()
+        stats = {}
+
+        def produce():
+            try:
+                stats.update(self.convert(counting, pipe, fmt))
+                pipe.finish()
+            except BaseException as e:
+                pipe.finish(e)
+
+        producer = threading.Thread(target=produce, name="parquet-ingest", daemon=True)
+        producer.start()
+        try:
+            self.w.files.upload(target_path, pipe, overwrite=True)
+        finally:
+            pipe.aborted.set()
+            producer.join()
+        if pipe.error is not None:
+            raise pipe.error
+
+        return IngestResult(
+            file_path=target_path,
+            rows=stats["rows"],
+            row_groups=stats["row_groups"],
+            input_bytes=counting.bytes_read,
+            output_bytes=pipe.tell(),
+            schema=stats["schema"],
+        )
@@ -0,0 +1,110 @@
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from databricks.sdk.service.vectorsearch import QueryVectorIndexResponse
+
+TOKEN = re.compile(r"\w+")
+
+
+def _tokens(text) -> List[str]:
+    return TOKEN.findall(str(text).lower()) if text is not None else []
+
+
+def response_frame(response: QueryVectorIndexResponse) -> pd.DataFrame:
+    """The rows of a `query_index` response, with the trailing `score` column."""
+    columns = [column.name for column in response.manifest.columns or []]
+    return pd.DataFrame(response.result.data_array or [], columns=columns)
+
+
+def keyword_scores(
+    query: str, texts: Sequence[str], k1: float = 1.2, b: float = 0.75
+) -> np.ndarray:
+    """BM25 scores of `texts` for the words in `query`, with statistics from `texts` alone."""
+    terms = sorted(set(_tokens(query)))
+    documents = [_tokens(text) for text in texts]
+    if not terms or not documents:
+        return np.zeros(len(documents))
+    lengths = np.array([len(document) for document in documents], dtype=float)
+    tf = np.array(
+        [[document.count(term) for term in terms] for document in documents],
+        dtype=float,
+    )
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1))
+    return (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def reciprocal_rank_fusion(scores: Sequence[np.ndarray], k: int = 60) -> np.ndarray:
+    """Sum of `1 / (k + rank)` over rankings, each given as scores (higher is better)."""
+    fused = np.zeros(len(scores[0]))
+    for ranking in scores:
+        ranks = np.empty(len(ranking), dtype=int)
+        ranks[np.argsort(-np.asarray(ranking), kind="stable")] = np.arange(
+            1, len(ranking) + 1
+        )
+        fused += 1 / (k + ranks)
+    return fused
+
+
+def mmr(
+    relevance: np.ndarray, vectors: np.ndarray, count: int, lambda_: float = 0.7
+) -> List[int]:
+    """Maximal marginal relevance order of the first `count` candidates.
+
+    Each step picks the candidate maximizing `lambda_ * relevance - (1 -
+    lambda_) * max similarity to the already picked ones`. `relevance` is
+    rescaled to 0..1 so it is comparable to cosine similarity.
+    """
+    n = len(relevance)
+    count = min(count, n)
+    if count == 0:
+        return []
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread else np.ones(n)
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = unit @ unit.T
+    redundancy = np.zeros(n)
+    available = np.ones(n, dtype=bool)
+    picked = []
+    for _ in range(count):
+        score = lambda_ * relevance - (1 - lambda_) * redundancy
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return picked
+
+
+def rerank(
+    candidates: pd.DataFrame,
+    scores: Sequence[float],
+    vectors: Optional[np.ndarray] = None,
+    query_text: str = None,
+    text_column: str = None,
+    diversity: float = 0.0,
+    rrf_k: int = 60,
+    offset: int = 0,
+    limit: int = 10,
+) -> pd.DataFrame:
+    """Reorder over-fetched search results and return one page with a `score` column.
+
+    With `query_text` and `text_column`, the index's ranking is fused with
+    a BM25 keyword ranking of the candidates by reciprocal rank fusion.
+    With `vectors` (one per candidate) and `diversity` above 0, results are
+    then picked by maximal marginal relevance with `lambda = 1 - diversity`.
+    The score is the index's similarity, or the fused score if fused.
+    """
+    relevance = np.asarray(scores, dtype=float)
+    if query_text and text_column:
+        keywords = keyword_scores(query_text, candidates[text_column].tolist())
+        relevance = reciprocal_rank_fusion([relevance, keywords], k=rrf_k)
+    if vectors is not None and diversity > 0:
+        order = mmr(relevance, vectors, offset + limit, lambda_=1 - diversity)
+    else:
+        order = np.argsort(-relevance, kind="stable")[: offset + limit].tolist()
+    page = order[offset : offset + limit]
+    return candidates.iloc[page].assign(score=relevance[page]).reset_index(drop=True)
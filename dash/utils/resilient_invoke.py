@@ -0,0 +1,345 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import (
+    RequestLimitExceeded,
+    TemporarilyUnavailable,
+    TooManyRequests,
+)
+from databricks.sdk.service.serving import (
+    EndpointStateReady,
+    QueryEndpointResponse,
+    ServedModelStateDeployment,
+)
+
+from utils.stats import percentile
+from utils.ttl_cache import TTLCache
+
+
+def retry_reason(e: Exception) -> Optional[str]:
+    """`throttled` for 429s, `unavailable` for 503s, otherwise None."""
+    if isinstance(e, TimeoutError) and isinstance(e.__cause__, Exception):
+        e = e.__cause__  # the SDK gave up its own retries
+    if isinstance(e, (TooManyRequests, RequestLimitExceeded)):
+        return "throttled"
+    if isinstance(e, TemporarilyUnavailable):
+        return "unavailable"
+    return None
+
+
+def is_generation(request: Dict[str, Any]) -> bool:
+    """Whether `request` asks for generated text (chat or completions)."""
+    return "messages" in request or "prompt" in request
+
+
+@dataclass
+class EndpointMetrics:
+    requests: int = 0
+    successes: int = 0
+    errors: int = 0
+    retries: int = 0
+    throttled: int = 0
+    timeouts: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    warmups: int = 0
+    warming: bool = False
+    probe_next: bool = False
+    last_success: Optional[float] = None
+    latencies: deque = field(default_factory=lambda: deque(maxlen=500))
+
+
+class ResilientInvoker:
+    """Calls `w.serving_endpoints.query` with adaptive timeouts, hedging and retries.
+
+    - Each endpoint's timeout is `timeout_multiplier` times its observed p99
+      latency, within `min_timeout`..`max_timeout`. Until `min_samples`
+      calls have completed, `default_timeout` is used. Chat and completions
+      requests get `max_timeout`, as their latency depends on the length of
+      the generated text rather than on the endpoint, and are not hedged.
+    - Other idempotent requests that are still running after the endpoint's
+      p95 latency are sent a second time, and the first response wins.
+      Hedges run in their own pool of `hedge_workers` threads.
+    - The timeout counts from the moment a call starts. A call that waits
+      longer than its timeout for a free worker is cancelled, as are hedges
+      still queued when the attempt ends.
+    - 429 and 503 responses, and timeouts of idempotent requests, are
+      retried up to `max_retries` times with full-jitter exponential backoff.
+    - An endpoint that has been idle for `idle_after` seconds, or that just
+      answered 503, is probed with `w.serving_endpoints.get`. While it is not
+      ready or a served entity is still deploying, calls get
+      `warmup_timeout`, are not hedged and don't count toward the latency
+      percentiles.
+
+    The SDK retries 429 and 503 responses itself for `retry_timeout_seconds`
+    (5 minutes by default), so `w` should be created with a short
+    `retry_timeout_seconds` for this backoff to take effect.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        default_timeout: float = 120,
+        min_timeout: float = 5,
+        max_timeout: float = 300,
+        timeout_multiplier: float = 3,
+        min_samples: int = 20,
+        hedge_percentile: float = 95,
+        max_retries: int = 4,
+        base_backoff: float = 0.5,
+        max_backoff: float = 10,
+        warmup_timeout: float = 600,
+        idle_after: float = 300,
+        probe_ttl: float = 10,
+        max_workers: int = 32,
+        hedge_workers: int = 8,
+    ):
+        self.w = w
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.hedge_percentile = hedge_percentile
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.warmup_timeout = warmup_timeout
+        self.idle_after = idle_after
+        self._probes = TTLCache(ttl=probe_ttl)
+        self._metrics: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+        # Hedged or timed-out calls keep running here until the SDK returns.
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="serving-invoke"
+        )
+        self._hedge_pool = ThreadPoolExecutor(
+            max_workers=hedge_workers, thread_name_prefix="serving-hedge"
+        )
+
+    def _endpoint(self, endpoint_name: str) -> EndpointMetrics:
+        with self._lock:
+            return self._metrics.setdefault(endpoint_name, EndpointMetrics())
+
+    def _count(self, endpoint_name: str, name: str, n: int = 1):
+        metrics = self._endpoint(endpoint_name)
+        with self._lock:
+            setattr(metrics, name, getattr(metrics, name) + n)
+
+    def _percentile(self, endpoint_name: str, q: float) -> Optional[float]:
+        metrics = self._endpoint(endpoint_name)
+        with self._lock:
+            latencies = list(metrics.latencies)
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, q)
+
+    def timeout(self, endpoint_name: str) -> float:
+        p99 = self._percentile(endpoint_name, 99)
+        if p99 is None:
+            return self.default_timeout
+        return min(
+            self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier)
+        )
+
+    def hedge_delay(self, endpoint_name: str) -> Optional[float]:
+        return self._percentile(endpoint_name, self.hedge_percentile)
+
+    def probe(self, endpoint_name: str) -> bool:
+        """Whether the endpoint is warming up (not ready, or a served entity still deploying)."""
+        warming = self._probes.get(endpoint_name)
+        if warming is None:
+            try:
+                endpoint = self.w.serving_endpoints.get(endpoint_name)
+            except Exception:
+                return False
+            entities = (
+                endpoint.config.served_entities if endpoint.config else None
+            ) or []
+            warming = not (
+                endpoint.state and endpoint.state.ready == EndpointStateReady.READY
+            ) or any(
+                entity.state
+                and entity.state.deployment
+                not in (None, ServedModelStateDeployment.READY)
+                for entity in entities
+            )
+            self._probes.set(endpoint_name, warming)
+        return warming
+
+    def _is_warming(self, endpoint_name: str) -> bool:
+        metrics = self._endpoint(endpoint_name)
+        idle = (
+            metrics.last_success is None
+            or time.monotonic() - metrics.last_success > self.idle_after
+        )
+        warming = (idle or metrics.warming or metrics.probe_next) and self.probe(
+            endpoint_name
+        )
+        with self._lock:
+            metrics.probe_next = False
+            if warming and not metrics.warming:
+                metrics.warmups += 1
+            metrics.warming = warming
+        return warming
+
+    def _call(
+        self,
+        endpoint_name: str,
+        request: Dict[str, Any],
+        started: Optional[threading.Event] = None,
+    ):
+        if started is not None:
+            started.set()
+        start = time.monotonic()
+        response = self.w.serving_endpoints.query(name=endpoint_name, **request)
+        return response, time.monotonic() - start
+
+    def _attempt(
+        self,
+        endpoint_name: str,
+        request: Dict[str, Any],
+        timeout: float,
+        hedge_delay: Optional[float],
+    ):
+        started = threading.Event()
+        primary = self._pool.submit(self._call, endpoint_name, request, started)
+        if not started.wait(timeout) and primary.cancel():
+            raise TimeoutError(
+                f"No worker free for {endpoint_name} within {timeout:.1f} s"
+            )
+        start = time.monotonic()
+        hedge: Optional[Future] = None
+        pending = {primary}
+        error = None
+        try:
+            while pending:
+                elapsed = time.monotonic() - start
+                if elapsed >= timeout:
+                    break
+                wait_for = timeout - elapsed
+                if hedge_delay is not None and hedge is None:
+                    wait_for = min(wait_for, max(0.0, hedge_delay - elapsed))
+                done, pending = wait(
+                    pending, timeout=wait_for, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    if future.exception() is None:
+                        if future is hedge:
+                            self._count(endpoint_name, "hedge_wins")
+                        return future.result()
+                    error = error or future.exception()
+                if (
+                    pending
+                    and hedge is None
+                    and hedge_delay is not None
+                    and time.monotonic() - start >= hedge_delay
+                ):
+                    hedge = self._hedge_pool.submit(self._call, endpoint_name, request)
+                    pending.add(hedge)
+                    self._count(endpoint_name, "hedges")
+        finally:
+            # Calls that haven't started yet are dropped; running ones can't be stopped.
+            for future in pending:
+                future.cancel()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"No response from {endpoint_name} after {timeout:.1f} s")
+
+    def query(
+        self, endpoint_name: str, idempotent: bool = False, **request
+    ) -> QueryEndpointResponse:
+        """Send `request` to the endpoint.
+
+        Only `idempotent` requests (e.g. scoring a fixed input) are hedged or
+        resent after a timeout; others may already be processed by the time
+        they time out.
+        """
+        self._count(endpoint_name, "requests")
+        generation = is_generation(request)
+        for attempt in range(self.max_retries + 1):
+            warming = self._is_warming(endpoint_name)
+            if warming:
+                timeout = self.warmup_timeout
+            elif generation:
+                timeout = self.max_timeout
+            else:
+                timeout = self.timeout(endpoint_name)
+            hedge_delay = (
+                self.hedge_delay(endpoint_name)
+                if idempotent and not warming and not generation
+                else None
+            )
+            try:
+                response, latency = self._attempt(
+                    endpoint_name, request, timeout, hedge_delay
+                )
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None:
+                    if not (idempotent and isinstance(e, TimeoutError)):
+                        self._count(endpoint_name, "errors")
+                        raise
+                    self._count(endpoint_name, "timeouts")
+                elif reason == "throttled":
+                    self._count(endpoint_name, "throttled")
+                else:
+                    # 503s are typical while an endpoint scales up from zero.
+                    self._probes.invalidate(endpoint_name)
+                    self._endpoint(endpoint_name).probe_next = True
+                error = e
+            else:
+                metrics = self._endpoint(endpoint_name)
+                with self._lock:
+                    metrics.successes += 1
+                    metrics.last_success = time.monotonic()
+                    if not warming:
+                        metrics.latencies.append(latency)
+                return response
+
+            if attempt == self.max_retries:
+                self._count(endpoint_name, "errors")
+                raise error
+            self._count(endpoint_name, "retries")
+            time.sleep(
+                random.uniform(0, min(self.max_backoff, self.base_backoff * 2**attempt))
+            )
+
+    def metrics(self, endpoint_name: str) -> dict:
+        metrics = self._endpoint(endpoint_name)
+        with self._lock:
+            latencies = list(metrics.latencies)
+            snapshot = {
+                key: getattr(metrics, key)
+                for key in (
+                    "requests",
+                    "successes",
+                    "errors",
+                    "retries",
+                    "throttled",
+                    "timeouts",
+                    "hedges",
+                    "hedge_wins",
+                    "warmups",
+                    "warming",
+                )
+            }
+
+        def rounded(value):
+            return None if value is None else round(value, 3)
+
+        hedge_delay = self.hedge_delay(endpoint_name)
+        return {
+            **snapshot,
+            "latency_p50": rounded(percentile(latencies, 50)),
+            "latency_p95": rounded(percentile(latencies, 95)),
+            "latency_p99": rounded(percentile(latencies, 99)),
+            "timeout": rounded(self.timeout(endpoint_name)),
+            "hedge_after": rounded(hedge_delay),
+        }
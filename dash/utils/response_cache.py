@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.serving import QueryEndpointResponse
+
+from utils.ttl_cache import TTLCache
+
+DEFAULT_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", ".response_cache")
+
+
+def _jsonable(value: Any) -> Any:
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    return value
+
+
+def payload_hash(request: Dict[str, Any]) -> str:
+    """SHA-256 of the request arguments in canonical JSON (sorted keys, no whitespace)."""
+    canonical = json.dumps(
+        _jsonable({k: v for k, v in request.items() if v is not None}),
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def is_deterministic(request: Dict[str, Any]) -> bool:
+    """Chat and completion requests are only repeatable at temperature 0."""
+    if request.get("messages") is not None or request.get("prompt") is not None:
+        return request.get("temperature") == 0
+    return True
+
+
+class ResponseCache:
+    """Opt-in cache for `w.serving_endpoints.query` responses.
+
+    Entries are keyed by endpoint, served model version and the hash of the
+    canonicalized request, and live in an LRU memory tier plus, if
+    `disk_dir` is set, one JSON file per response on disk. The served
+    version (config version and entity versions) is re-read at most every
+    `version_ttl` seconds; when it changes, cached responses of the old
+    version are dropped from both tiers. Non-deterministic requests are
+    always sent to the endpoint.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        maxsize: int = 1024,
+        ttl: float = 24 * 3600,
+        disk_dir: Optional[str] = None,
+        version_ttl: float = 30,
+    ):
+        self.w = w
+        self.disk_dir = disk_dir
+        self._memory = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._versions = TTLCache(ttl=version_ttl)
+        self._last_version: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def served_version(self, endpoint_name: str) -> Optional[str]:
+        """`<config_version>:<entity>=<version>,...`, or None if the endpoint can't be read."""
+        version = self._versions.get(endpoint_name)
+        if version is None:
+            try:
+                config = self.w.serving_endpoints.get(endpoint_name).config
+            except Exception:
+                return None
+            if config is None:
+                return None
+            entities = sorted(
+                f"{entity.entity_name or entity.name}={entity.entity_version or ''}"
+                for entity in config.served_entities or []
+            )
+            version = f"{config.config_version}:{','.join(entities)}"
+            self._versions.set(endpoint_name, version)
+            self._on_version(endpoint_name, version)
+        return version
+
+    def _on_version(self, endpoint_name: str, version: str):
+        with self._lock:
+            previous = self._last_version.get(endpoint_name)
+            self._last_version[endpoint_name] = version
+        if previous is not None and previous != version:
+            self._memory.invalidate_where(
+                lambda key: key[0] == endpoint_name and key[1] != version
+            )
+            if self.disk_dir:
+                endpoint_dir = os.path.join(self.disk_dir, endpoint_name)
+                current = self._version_dir(version)
+                for name in (
+                    os.listdir(endpoint_dir) if os.path.isdir(endpoint_dir) else []
+                ):
+                    if name != current:
+                        shutil.rmtree(
+                            os.path.join(endpoint_dir, name), ignore_errors=True
+                        )
+
+    def _key(self, endpoint_name: str, request: Dict[str, Any]) -> Optional[Tuple]:
+        if not is_deterministic(request):
+            return None
+        version = self.served_version(endpoint_name)
+        if version is None:
+            return None
+        return (endpoint_name, version, payload_hash(request))
+
+    @staticmethod
+    def _version_dir(version: str) -> str:
+        return hashlib.sha256(version.encode()).hexdigest()[:16]
+
+    def _disk_path(self, key: Tuple) -> str:
+        endpoint_name, version, digest = key
+        return os.path.join(
+            self.disk_dir, endpoint_name, self._version_dir(version), f"{digest}.json"
+        )
+
+    def get(
+        self, endpoint_name: str, request: Dict[str, Any]
+    ) -> Optional[QueryEndpointResponse]:
+        key = self._key(endpoint_name, request)
+        if key is None:
+            return None
+        cached = self._memory.get(key)
+        if cached is None and self.disk_dir:
+            try:
+                with open(self._disk_path(key)) as f:
+                    cached = json.load(f)
+                self._memory.set(key, cached)
+            except (OSError, ValueError):
+                cached = None
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if cached is None else QueryEndpointResponse.from_dict(cached)
+
+    def put(
+        self,
+        endpoint_name: str,
+        request: Dict[str, Any],
+        response: QueryEndpointResponse,
+    ):
+        key = self._key(endpoint_name, request)
+        if key is None:
+            return
+        body = response.as_dict()
+        self._memory.set(key, body)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(body, f)
+            os.replace(tmp_path, path)
+
+    def query(
+        self, endpoint_name: str, **request
+    ) -> Tuple[QueryEndpointResponse, bool]:
+        """Cached `w.serving_endpoints.query`; returns the response and whether it was a cache hit."""
+        response = self.get(endpoint_name, request)
+        if response is not None:
+            return response, True
+        response = self.w.serving_endpoints.query(name=endpoint_name, **request)
+        self.put(endpoint_name, request, response)
+        return response, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
+
+    def clear(self):
+        self._memory.clear()
+        self._versions.clear()
+        if self.disk_dir:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Callable, Dict, Optional, Tuple, Union
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import NotFound
+
+CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MANIFEST_DIR = os.getenv("UPLOAD_MANIFEST_DIR", ".upload_manifests")
+
+
+class HashingReader:
+    """Wraps a binary stream and hashes the bytes as they are read."""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._hash = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self._hash.update(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def file_digest(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Tuple[str, int]:
+    """Return the SHA-256 hex digest and size of a seekable stream, rewinding it after."""
+    start = stream.tell()
+    reader = HashingReader(stream)
+    while reader.read(chunk_size):
+        pass
+    stream.seek(start)
+    return reader.hexdigest(), reader.bytes_read
+
+
+def epoch_seconds(timestamp: Union[str, int, None]) -> Optional[int]:
+    """Normalize an HTTP date (`get_metadata`) or epoch millis (directory listings) to seconds."""
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, int):
+        return timestamp // 1000
+    return int(parsedate_to_datetime(timestamp).timestamp())
+
+
+def volume_root(file_path: str) -> str:
+    """`/Volumes/catalog/schema/volume/a/b.csv` -> `/Volumes/catalog/schema/volume`."""
+    parts = file_path.strip("/").split("/")
+    if len(parts) < 4 or parts[0] != "Volumes":
+        raise ValueError(f"Not a Unity Catalog volume path: {file_path}")
+    return "/" + "/".join(parts[:4])
+
+
+@dataclass
+class ManifestEntry:
+    sha256: str
+    size: int
+    last_modified: Optional[str] = None
+    local_mtime: Optional[float] = None
+
+
+class UploadManifest:
+    """Local record of the digests uploaded to each volume.
+
+    One JSON file per volume lives in `manifest_dir`, mapping the file path
+    inside the volume to the digest, size and remote `last_modified` seen
+    right after the upload.
+    """
+
+    def __init__(self, manifest_dir: str = DEFAULT_MANIFEST_DIR):
+        self.manifest_dir = manifest_dir
+        self._volumes: Dict[str, Dict[str, ManifestEntry]] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _manifest_file(self, root: str) -> str:
+        return os.path.join(
+            self.manifest_dir, root.strip("/").replace("/", ".") + ".json"
+        )
+
+    def _entries(self, root: str) -> Dict[str, ManifestEntry]:
+        if root not in self._volumes:
+            entries = {}
+            try:
+                with open(self._manifest_file(root)) as f:
+                    entries = {
+                        path: ManifestEntry(**entry)
+                        for path, entry in json.load(f).items()
+                    }
+            except FileNotFoundError:
+                pass
+            self._volumes[root] = entries
+        return self._volumes[root]
+
+    def _save(self, root: str):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        target = self._manifest_file(root)
+        tmp = f"{target}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {path: asdict(entry) for path, entry in self._entries(root).items()}, f
+            )
+        os.replace(tmp, target)
+        self._dirty.discard(root)
+
+    def get(self, file_path: str) -> Optional[ManifestEntry]:
+        root = volume_root(file_path)
+        with self._lock:
+            return self._entries(root).get(file_path[len(root) :])
+
+    def record(self, file_path: str, entry: ManifestEntry, save: bool = True):
+        """Remember `entry` for `file_path`; with `save=False` it is written on `flush()`."""
+        root = volume_root(file_path)
+        with self._lock:
+            self._entries(root)[file_path[len(root) :]] = entry
+            self._dirty.add(root)
+            if save:
+                self._save(root)
+
+    def flush(self):
+        with self._lock:
+            for root in list(self._dirty):
+                self._save(root)
+
+    def forget(self, file_path: str):
+        root = volume_root(file_path)
+        with self._lock:
+            if self._entries(root).pop(file_path[len(root) :], None) is not None:
+                self._save(root)
+
+
+@dataclass
+class UploadResult:
+    file_path: str
+    uploaded: bool
+    sha256: str
+    size: int
+    reason: str
+
+
+class DedupUploader:
+    """Uploads files to a volume, skipping the ones that are already there unchanged.
+
+    A file is skipped when its digest and size match the manifest and the
+    remote size and `last_modified` from `w.files.get_metadata` still match
+    what was recorded after the previous upload.
+    """
+
+    def __init__(self, w: WorkspaceClient, manifest: UploadManifest = None):
+        self.w = w
+        self.manifest = manifest or UploadManifest()
+
+    def remote_metadata(self, file_path: str):
+        try:
+            return self.w.files.get_metadata(file_path)
+        except NotFound:
+            return None
+
+    def is_unchanged(self, file_path: str, sha256: str, size: int) -> bool:
+        entry = self.manifest.get(file_path)
+        if entry is None or entry.sha256 != sha256 or entry.size != size:
+            return False
+        metadata = self.remote_metadata(file_path)
+        return (
+            metadata is not None
+            and metadata.content_length == size
+            and metadata.last_modified == entry.last_modified
+        )
+
+    def _record(self, file_path: str, sha256: str, size: int):
+        metadata = self.remote_metadata(file_path)
+        self.manifest.record(
+            file_path,
+            ManifestEntry(
+                sha256=sha256,
+                size=size,
+                last_modified=metadata.last_modified if metadata else None,
+            ),
+        )
+
+    def upload(
+        self,
+        file_path: str,
+        contents: BinaryIO,
+        wrap: Callable[[BinaryIO], BinaryIO] = None,
+    ) -> UploadResult:
+        """Upload `contents` unless the volume already holds the same bytes.
+
+        `wrap`, e.g. `transfer.wrap`, is applied to the stream only when it
+        is uploaded, so hashing a seekable stream doesn't count as progress.
+        """
+        wrap = wrap or (lambda stream: stream)
+        seekable = getattr(contents, "seekable", lambda: False)()
+        if seekable:
+            sha256, size = file_digest(contents)
+            if self.is_unchanged(file_path, sha256, size):
+                return UploadResult(file_path, False, sha256, size, "unchanged")
+            self.w.files.upload(file_path, wrap(contents), overwrite=True)
+        else:
+            # The digest of a one-shot stream is only known once it has been sent.
+            reader = HashingReader(contents)
+            self.w.files.upload(file_path, wrap(reader), overwrite=True)
+            sha256, size = reader.hexdigest(), reader.bytes_read
+
+        self._record(file_path, sha256, size)
+        return UploadResult(file_path, True, sha256, size, "uploaded")
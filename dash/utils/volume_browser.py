@@ -0,0 +1,125 @@
+import posixpath
+import threading
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterator, List, Optional
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.files import DirectoryEntry
+
+from utils.ttl_cache import TTLCache
+
+
+@dataclass
+class DirectoryListing:
+    """Entries of a volume directory loaded so far, plus the open page cursor."""
+
+    path: str
+    entries: List[DirectoryEntry] = field(default_factory=list)
+    cursor: Optional[Iterator[DirectoryEntry]] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def complete(self) -> bool:
+        return self.cursor is None
+
+    @property
+    def directories(self) -> List[DirectoryEntry]:
+        return [entry for entry in self.entries if entry.is_directory]
+
+    @property
+    def files(self) -> List[DirectoryEntry]:
+        return [entry for entry in self.entries if not entry.is_directory]
+
+
+def normalize_directory(path: str) -> str:
+    """Turn `/Volumes/a/b/c/` or `a.b.c` into `/Volumes/a/b/c`."""
+    path = path.strip()
+    if path and not path.startswith("/"):
+        path = "/Volumes/" + "/".join(path.split("."))
+    return posixpath.normpath(path) if path else path
+
+
+class VolumeBrowser:
+    """Lazily lists volume directories one page at a time.
+
+    `w.files.list_directory_contents` only requests the next page from the
+    API when its iterator runs dry, so each listing keeps its iterator open
+    and pulls `page_size` entries per `load_more` call. Listings expire after
+    `ttl` seconds; directories are only listed once they are opened.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        page_size: int = 200,
+        ttl: float = 30,
+        maxsize: int = 256,
+    ):
+        self.w = w
+        self.page_size = page_size
+        self._listings = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _listing(self, directory_path: str) -> DirectoryListing:
+        with self._lock:
+            listing = self._listings.get(directory_path)
+            if listing is None:
+                listing = DirectoryListing(
+                    path=directory_path,
+                    cursor=self.w.files.list_directory_contents(
+                        directory_path, page_size=self.page_size
+                    ),
+                )
+                self._listings.set(directory_path, listing)
+            return listing
+
+    def _pull(self, listing: DirectoryListing):
+        if listing.cursor is None:
+            return
+        page = list(islice(listing.cursor, self.page_size))
+        listing.entries.extend(page)
+        if len(page) < self.page_size:
+            listing.cursor = None
+
+    def list(self, directory_path: str, min_entries: int = None) -> DirectoryListing:
+        """Return the listing for `directory_path`, loading the first page if needed."""
+        directory_path = normalize_directory(directory_path)
+        min_entries = min_entries or self.page_size
+        listing = self._listing(directory_path)
+        with listing.lock:
+            while not listing.complete and len(listing.entries) < min_entries:
+                self._pull(listing)
+        return listing
+
+    def load_more(self, directory_path: str) -> DirectoryListing:
+        """Load the next page of `directory_path`."""
+        directory_path = normalize_directory(directory_path)
+        listing = self._listing(directory_path)
+        with listing.lock:
+            self._pull(listing)
+        return listing
+
+    def search(
+        self, prefix: str, under: str = None, limit: int = 100
+    ) -> List[DirectoryEntry]:
+        """Find cached entries whose name starts with `prefix` (case-insensitive).
+
+        Only directories that have been opened are searched; nothing is listed
+        remotely.
+        """
+        prefix = prefix.strip().lower()
+        under = normalize_directory(under) if under else None
+        matches = []
+        for path, listing in self._listings.items():
+            if under and not (path == under or path.startswith(under + "/")):
+                continue
+            for entry in list(listing.entries):
+                if entry.name.lower().startswith(prefix):
+                    matches.append(entry)
+                    if len(matches) >= limit:
+                        return matches
+        return matches
+
+    def invalidate(self, directory_path: str):
+        self._listings.invalidate(normalize_directory(directory_path))
@@ -0,0 +1,150 @@
+import posixpath
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from databricks.sdk import WorkspaceClient
+
+CHUNK_SIZE = 1024 * 1024
+_END = object()
+
+
+class _ChunkSink:
+    """Unseekable file object that collects what `zipfile` writes so it can be yielded."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _Prefetch:
+    """Downloads one volume file into a bounded queue of chunks."""
+
+    def __init__(self, max_chunks: int):
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.error: Optional[Exception] = None
+
+
+class ZipExporter:
+    """Streams several volume files as one zip archive, built on the fly.
+
+    Up to `max_workers` files are downloaded concurrently with
+    `w.files.download`; each download can only run `max_chunks` chunks ahead
+    of the zip writer, so memory stays bounded by
+    `max_workers * max_chunks * chunk_size` regardless of the archive size.
+    Files that fail to download are listed in `_export_errors.txt` at the end
+    of the archive instead of aborting the stream.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        max_workers: int = 8,
+        chunk_size: int = CHUNK_SIZE,
+        max_chunks: int = 4,
+        compression: int = zipfile.ZIP_DEFLATED,
+    ):
+        self.w = w
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.compression = compression
+
+    def _download(self, file_path: str, prefetch: _Prefetch, stop: threading.Event):
+        def put(item):
+            while not stop.is_set():
+                try:
+                    prefetch.chunks.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            contents = self.w.files.download(file_path).contents
+            try:
+                while True:
+                    chunk = contents.read(self.chunk_size)
+                    if not chunk or not put(chunk):
+                        break
+            finally:
+                contents.close()
+        except Exception as e:
+            prefetch.error = e
+        put(_END)
+
+    def stream(
+        self, file_paths: Iterable[str], base_dir: str = None
+    ) -> Iterator[bytes]:
+        """Yield the bytes of a zip archive containing `file_paths`.
+
+        Entry names are relative to `base_dir`, or just the file names if it
+        is not given.
+        """
+        file_paths = list(file_paths)
+        stop = threading.Event()
+        pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="zip-export"
+        )
+        prefetches = []
+        for file_path in file_paths:
+            prefetch = _Prefetch(self.max_chunks)
+            pool.submit(self._download, file_path, prefetch, stop)
+            prefetches.append(prefetch)
+
+        sink = _ChunkSink()
+        errors: List[str] = []
+        try:
+            with zipfile.ZipFile(
+                sink, mode="w", compression=self.compression
+            ) as archive:
+                for file_path, prefetch in zip(file_paths, prefetches):
+                    name = (
+                        posixpath.relpath(file_path, base_dir)
+                        if base_dir
+                        else posixpath.basename(file_path)
+                    )
+                    first = prefetch.chunks.get()
+                    if first is _END and prefetch.error is not None:
+                        errors.append(f"{file_path}: {prefetch.error}")
+                        continue
+                    info = zipfile.ZipInfo(name, time.localtime()[:6])
+                    info.compress_type = self.compression
+                    with archive.open(info, mode="w", force_zip64=True) as entry:
+                        chunk = first
+                        while chunk is not _END:
+                            entry.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+                            chunk = prefetch.chunks.get()
+                    if prefetch.error is not None:
+                        errors.append(f"{file_path}: {prefetch.error}")
+                    data = sink.drain()
+                    if data:
+                        yield data
+                if errors:
+                    archive.writestr("_export_errors.txt", "\n".join(errors) + "\n")
+            yield sink.drain()
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import PermissionDenied
+from databricks.sdk.service.catalog import SecurableType
+
+from utils.ttl_cache import TTLCache
+
+PERMISSIONS_VALIDATED = "Volume and permissions validated"
+WRITE_PRIVILEGES = ["ALL_PRIVILEGES", "WRITE_VOLUME"]
+
+
+def is_permission_error(error: Exception) -> bool:
+    """Whether `error` means the principal is not allowed to write to the volume."""
+    return isinstance(error, PermissionDenied) or "PERMISSION_DENIED" in str(error)
+
+
+class VolumePermissionCache:
+    """Caches successful upload permission checks per (principal, volume full name).
+
+    On a miss the volume lookup and the grants lookup for the typed name run
+    concurrently. If the volume's canonical `full_name` differs from the
+    typed name (case or quoting), grants are looked up again for the full
+    name. Denials are not cached: a grant added after a failed check is
+    picked up by the next check. The current principal is resolved once per
+    client, since it does not change for the lifetime of a `WorkspaceClient`.
+    """
+
+    def __init__(self, w: WorkspaceClient, ttl: float = 60, max_workers: int = 8):
+        self.w = w
+        self._cache = TTLCache(ttl=ttl)
+        # Typed volume names and the full names they resolved to.
+        self._full_names = TTLCache(ttl=ttl)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="volume-permissions"
+        )
+        self._principal = None
+        self._principal_lock = threading.Lock()
+
+    def _current_principal(self) -> str:
+        with self._principal_lock:
+            if self._principal is None:
+                self._principal = self.w.current_user.me().user_name
+            return self._principal
+
+    def _grants(self, principal: str, full_name: str):
+        return self.w.grants.get_effective(
+            securable_type=SecurableType.VOLUME,
+            full_name=full_name,
+            principal=principal,
+        )
+
+    def _lookup(self, principal: str, volume_name: str) -> Tuple[str, str]:
+        volume_future = self._pool.submit(self.w.volumes.read, name=volume_name)
+        grants_future = self._pool.submit(self._grants, principal, volume_name)
+        full_name = volume_future.result().full_name
+        if full_name == volume_name:
+            grants = grants_future.result()
+        else:
+            # The typed name isn't canonical: its grants (or error) don't apply.
+            grants_future.cancel()
+            grants = self._grants(principal, full_name)
+
+        if not grants or not grants.privilege_assignments:
+            return full_name, "Insufficient permissions: No grants found."
+
+        for assignment in grants.privilege_assignments:
+            for privilege in assignment.privileges or []:
+                if privilege.privilege.value in WRITE_PRIVILEGES:
+                    return full_name, PERMISSIONS_VALIDATED
+
+        return full_name, "Insufficient permissions: Required privileges not found."
+
+    def check(self, volume_name: str) -> str:
+        """Return the permission check result for `volume_name`; a success is cached for `ttl` seconds."""
+        try:
+            principal = self._current_principal()
+            full_name = self._full_names.get(volume_name)
+            result = self._cache.get((principal, full_name)) if full_name else None
+            if result is None:
+                full_name, result = self._lookup(principal, volume_name)
+                if result == PERMISSIONS_VALIDATED:
+                    self._full_names.set(volume_name, full_name)
+                    self._cache.set((principal, full_name), result)
+            return result
+        except Exception as e:
+            return f"Error: {e}"
+
+    def invalidate(self, volume_name: str):
+        """Forget the cached result for `volume_name`, e.g. after a failed upload."""
+        full_name = self._full_names.get(volume_name) or volume_name
+        self._full_names.invalidate(volume_name)
+        self._cache.invalidate_where(lambda key: key[1] == full_name)
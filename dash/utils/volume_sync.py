@@ -0,0 +1,384 @@
+import os
+import posixpath
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import NotFound
+
+from utils.transfer_progress import DOWNLOAD, UPLOAD, TransferTracker
+from utils.upload_manifest import (
+    CHUNK_SIZE,
+    HashingReader,
+    ManifestEntry,
+    UploadManifest,
+    epoch_seconds,
+    file_digest,
+)
+
+# Local folders the app may sync are confined to this directory; the
+# recipes only offer local sync when it is set.
+LOCAL_SYNC_ROOT = os.getenv("VOLUME_SYNC_LOCAL_ROOT")
+
+
+def resolve_local_dir(local_dir: str, root: str) -> str:
+    """`local_dir` resolved against `root`, refusing paths that lead outside it.
+
+    Relative paths are taken relative to `root`; symlinks and `..` are
+    resolved before the check.
+    """
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, local_dir))
+    if os.path.commonpath([root, path]) != root:
+        raise PermissionError(f"{local_dir} is outside the sync root {root}")
+    return path
+
+
+@dataclass
+class FileState:
+    size: int
+    mtime: Optional[int]
+
+
+@dataclass
+class SyncAction:
+    action: str
+    relative_path: str
+    size: int
+    reason: str
+    status: str = "pending"
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+@dataclass
+class SyncReport:
+    direction: str
+    local_dir: str
+    volume_dir: str
+    dry_run: bool = False
+    actions: List[SyncAction] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def transfers(self) -> List[SyncAction]:
+        return [a for a in self.actions if a.action in (UPLOAD, DOWNLOAD)]
+
+    @property
+    def failed(self) -> List[SyncAction]:
+        return [a for a in self.actions if a.status == "failed"]
+
+    def summary(self) -> dict:
+        done = [a for a in self.transfers if a.status == "done"]
+        transferred = sum(a.size for a in done)
+        return {
+            "direction": self.direction,
+            "dry_run": self.dry_run,
+            "files_transferred": len(done),
+            "bytes_transferred": transferred,
+            "files_deleted": sum(
+                1
+                for a in self.actions
+                if a.action.startswith("delete") and a.status == "done"
+            ),
+            "files_unchanged": sum(1 for a in self.actions if a.action == "skip"),
+            "failures": len(self.failed),
+            "elapsed_seconds": round(self.elapsed, 2),
+            "throughput_mb_s": (
+                round(transferred / self.elapsed / 1e6, 2) if self.elapsed else None
+            ),
+        }
+
+    def to_records(self) -> List[dict]:
+        return [asdict(action) for action in self.actions]
+
+
+class VolumeSync:
+    """rsync-style sync between a local directory tree and a volume directory.
+
+    Files are compared by size and modification time first. When both sides
+    have the same size but the timestamps are inconclusive, the checksum
+    manifest from `upload_manifest` decides, hashing the local file only if
+    it changed since the manifest was written. Transfers run on
+    `max_workers` threads using the same `w.files` calls as the recipes and
+    are measured by `tracker` (in memory only if none is given). With
+    `local_root`, local folders must lie under that directory.
+
+    The source directory must exist. With `delete`, an empty source would
+    delete everything on the target, so that needs `confirm_empty_source`.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        manifest: UploadManifest = None,
+        max_workers: int = 8,
+        checksum: bool = True,
+        tracker: TransferTracker = None,
+        local_root: str = None,
+    ):
+        self.w = w
+        self.manifest = manifest or UploadManifest()
+        self.max_workers = max_workers
+        self.checksum = checksum
+        self.tracker = tracker or TransferTracker(metrics_file=None)
+        self.local_root = local_root
+
+    def scan_local(self, local_dir: str) -> Dict[str, FileState]:
+        files = {}
+        for root, _, names in os.walk(local_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                relative = os.path.relpath(path, local_dir).replace(os.sep, "/")
+                files[relative] = FileState(size=stat.st_size, mtime=int(stat.st_mtime))
+        return files
+
+    def _list(self, directory: str):
+        try:
+            return list(self.w.files.list_directory_contents(directory))
+        except NotFound:
+            return []
+
+    def scan_remote(self, volume_dir: str) -> Dict[str, FileState]:
+        """List `volume_dir` recursively, one directory level at a time in parallel."""
+        files = {}
+        pending = [volume_dir]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending:
+                listings = list(pool.map(self._list, pending))
+                pending = []
+                for entries in listings:
+                    for entry in entries:
+                        path = entry.path.rstrip("/")
+                        if entry.is_directory:
+                            pending.append(path)
+                        else:
+                            files[posixpath.relpath(path, volume_dir)] = FileState(
+                                size=entry.file_size or 0,
+                                mtime=epoch_seconds(entry.last_modified),
+                            )
+        return files
+
+    def _matches_manifest(
+        self, local_path: str, remote_path: str, local: FileState, remote: FileState
+    ):
+        """Return True/False if the manifest can tell whether both sides hold the same bytes, else None."""
+        entry = self.manifest.get(remote_path)
+        if (
+            entry is None
+            or entry.size != local.size
+            or epoch_seconds(entry.last_modified) != remote.mtime
+        ):
+            return None
+        if entry.local_mtime == local.mtime:
+            return True
+        if not self.checksum:
+            return None
+        with open(local_path, "rb") as f:
+            sha256, _ = file_digest(f)
+        if sha256 == entry.sha256:
+            entry.local_mtime = local.mtime
+            self.manifest.record(remote_path, entry, save=False)
+            return True
+        return False
+
+    def _decide(self, direction, relative, local_dir, volume_dir, local, remote):
+        local_path = os.path.join(local_dir, *relative.split("/"))
+        remote_path = posixpath.join(volume_dir, relative)
+        source, target = (local, remote) if direction == UPLOAD else (remote, local)
+
+        if target is None:
+            return SyncAction(direction, relative, source.size, "missing on target")
+        if source.size != target.size:
+            return SyncAction(direction, relative, source.size, "size differs")
+
+        same = self._matches_manifest(local_path, remote_path, local, remote)
+        if same is True:
+            return SyncAction(
+                "skip", relative, source.size, "checksum matches manifest"
+            )
+        if same is False:
+            return SyncAction(direction, relative, source.size, "checksum differs")
+        if (
+            source.mtime is not None
+            and target.mtime is not None
+            and source.mtime > target.mtime
+        ):
+            return SyncAction(direction, relative, source.size, "newer on source")
+        return SyncAction("skip", relative, source.size, "same size, not newer")
+
+    def _check_source(self, local_dir: str, volume_dir: str, direction: str):
+        """Raise FileNotFoundError if the source directory doesn't exist.
+
+        A missing source would otherwise look like an empty one.
+        """
+        if direction == UPLOAD:
+            if not os.path.isdir(local_dir):
+                raise FileNotFoundError(f"Local folder {local_dir} does not exist")
+        else:
+            try:
+                self.w.files.get_directory_metadata(volume_dir)
+            except NotFound:
+                raise FileNotFoundError(f"Volume directory {volume_dir} does not exist")
+
+    def plan(
+        self,
+        local_dir: str,
+        volume_dir: str,
+        direction: str = UPLOAD,
+        delete: bool = False,
+        confirm_empty_source: bool = False,
+    ) -> SyncReport:
+        """Diff both trees and return the actions a sync would take."""
+        volume_dir = volume_dir.rstrip("/")
+        if self.local_root:
+            local_dir = resolve_local_dir(local_dir, self.local_root)
+        self._check_source(local_dir, volume_dir, direction)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            local_future = pool.submit(self.scan_local, local_dir)
+            remote_future = pool.submit(self.scan_remote, volume_dir)
+            local_files, remote_files = local_future.result(), remote_future.result()
+
+        source, target = (
+            (local_files, remote_files)
+            if direction == UPLOAD
+            else (remote_files, local_files)
+        )
+        if delete and not source and target and not confirm_empty_source:
+            raise ValueError(
+                f"The source is empty: deleting all {len(target)} files on the "
+                "target needs confirm_empty_source"
+            )
+        report = SyncReport(
+            direction=direction, local_dir=local_dir, volume_dir=volume_dir
+        )
+        for relative in sorted(source):
+            report.actions.append(
+                self._decide(
+                    direction,
+                    relative,
+                    local_dir,
+                    volume_dir,
+                    local_files.get(relative),
+                    remote_files.get(relative),
+                )
+            )
+        if delete:
+            delete_action = "delete_remote" if direction == UPLOAD else "delete_local"
+            for relative in sorted(set(target) - set(source)):
+                report.actions.append(
+                    SyncAction(
+                        delete_action, relative, target[relative].size, "not on source"
+                    )
+                )
+        self.manifest.flush()
+        return report
+
+    def _upload(self, local_path: str, remote_path: str):
+        with open(local_path, "rb") as f:
+            # Hash up front so the file stays seekable and the SDK can retry the upload.
+            sha256, size = file_digest(f)
+            with self.tracker.track(UPLOAD, remote_path, size) as transfer:
+                self.w.files.upload(remote_path, transfer.wrap(f), overwrite=True)
+        metadata = self.w.files.get_metadata(remote_path)
+        self.manifest.record(
+            remote_path,
+            ManifestEntry(
+                sha256=sha256,
+                size=size,
+                last_modified=metadata.last_modified,
+                local_mtime=int(os.stat(local_path).st_mtime),
+            ),
+            save=False,
+        )
+
+    def _download(self, remote_path: str, local_path: str):
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        response = self.w.files.download(remote_path)
+        tmp_path = f"{local_path}.part"
+        with self.tracker.track(
+            DOWNLOAD, remote_path, response.content_length
+        ) as transfer:
+            reader = HashingReader(transfer.wrap(response.contents))
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(reader, f, CHUNK_SIZE)
+        os.replace(tmp_path, local_path)
+        self.manifest.record(
+            remote_path,
+            ManifestEntry(
+                sha256=reader.hexdigest(),
+                size=reader.bytes_read,
+                last_modified=response.last_modified,
+                local_mtime=int(os.stat(local_path).st_mtime),
+            ),
+            save=False,
+        )
+
+    def _apply(self, report: SyncReport, action: SyncAction):
+        local_path = os.path.join(report.local_dir, *action.relative_path.split("/"))
+        remote_path = posixpath.join(report.volume_dir, action.relative_path)
+        start = time.perf_counter()
+        try:
+            if action.action == UPLOAD:
+                self._upload(local_path, remote_path)
+            elif action.action == DOWNLOAD:
+                self._download(remote_path, local_path)
+            elif action.action == "delete_remote":
+                self.w.files.delete(remote_path)
+                self.manifest.forget(remote_path)
+            elif action.action == "delete_local":
+                os.remove(local_path)
+            action.status = "done"
+        except Exception as e:
+            action.status = "failed"
+            action.error = str(e)
+        action.seconds = round(time.perf_counter() - start, 3)
+        return action
+
+    def run(
+        self,
+        local_dir: str,
+        volume_dir: str,
+        direction: str = UPLOAD,
+        delete: bool = False,
+        dry_run: bool = False,
+        on_progress: Callable[[int, int, SyncAction], None] = None,
+        confirm_empty_source: bool = False,
+    ) -> SyncReport:
+        """Sync `local_dir` and `volume_dir` and return a transfer report.
+
+        `on_progress(done, total, action)` is called after each completed action.
+        """
+        start = time.perf_counter()
+        report = self.plan(
+            local_dir,
+            volume_dir,
+            direction=direction,
+            delete=delete,
+            confirm_empty_source=confirm_empty_source,
+        )
+        report.dry_run = dry_run
+        pending = [a for a in report.actions if a.action != "skip"]
+
+        for action in report.actions:
+            if action.action == "skip":
+                action.status = "unchanged"
+            elif dry_run:
+                action.status = "planned"
+
+        if not dry_run and pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [
+                    pool.submit(self._apply, report, action) for action in pending
+                ]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    if on_progress:
+                        on_progress(done, len(pending), future.result())
+            self.manifest.flush()
+
+        report.elapsed = time.perf_counter() - start
+        return report
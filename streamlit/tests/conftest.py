@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The utils package is imported as `utils`, as the app does when run from this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from utils.batch_eval import read_prompts
+
+
+def prompts(records):
+    return [(record.id, record.prompt) for record in records]
+
+
+def test_json_array_of_objects():
+    data = json.dumps([{"id": "a", "prompt": "Hi"}, {"prompt": " Bye "}]).encode()
+
+    assert prompts(read_prompts(data, "prompts.json")) == [("a", "Hi"), ("2", "Bye")]
+
+
+def test_json_array_of_strings():
+    data = json.dumps(["Hi", "", "Bye"]).encode()
+
+    assert prompts(read_prompts(data, "prompts.json")) == [("1", "Hi"), ("3", "Bye")]
+
+
+def test_json_object_is_rejected():
+    with pytest.raises(ValueError):
+        read_prompts(b'{"prompt": "Hi"}', "prompts.json")
+
+
+def test_jsonl_one_object_per_line():
+    data = b'{"prompt": "Hi"}\n\n{"id": "x", "prompt": "Bye"}\n'
+
+    assert prompts(read_prompts(data, "prompts.jsonl")) == [("1", "Hi"), ("x", "Bye")]
+
+
+def test_id_zero_is_kept():
+    data = json.dumps([{"id": 0, "prompt": "Hi"}]).encode()
+
+    assert prompts(read_prompts(data, "prompts.json")) == [("0", "Hi")]
+
+
+def test_bad_rows_are_reported():
+    data = b'{"prompt": 42}\n["not", "an", "object"]\n{"prompt": "Fine"}\n'
+
+    with pytest.raises(
+        ValueError, match="row 1 .*not a string; row 2 is not an object"
+    ):
+        read_prompts(data, "prompts.jsonl")
+
+
+def test_invalid_jsonl_line_is_reported():
+    with pytest.raises(ValueError, match="Line 2"):
+        read_prompts(b'{"prompt": "Hi"}\n{oops\n', "prompts.jsonl")
@@ -0,0 +1,48 @@
+import io
+from types import SimpleNamespace
+
+import pandas as pd
+
+from utils.batch_scoring import BatchScorer, write_parquet
+
+
+class FakeEndpoints:
+    def __init__(self):
+        self.batches = []
+
+    def query(self, name, dataframe_split):
+        self.batches.append(len(dataframe_split.data))
+        return SimpleNamespace(predictions=[row[0] * 2 for row in dataframe_split.data])
+
+
+def test_chunks_are_scored_and_written_one_at_a_time():
+    endpoints = FakeEndpoints()
+    scorer = BatchScorer(SimpleNamespace(serving_endpoints=endpoints))
+    chunks = (pd.DataFrame({"x": range(start, start + 5)}) for start in (0, 5, 10))
+    progress = []
+    output = io.BytesIO()
+
+    rows, preview = write_parquet(
+        scorer.score_chunks(
+            "endpoint", chunks, batch_rows=2, on_progress=progress.append
+        ),
+        output,
+        preview_rows=3,
+    )
+
+    assert rows == 15
+    assert preview["prediction"].tolist() == [0, 2, 4]
+    assert endpoints.batches == [2, 2, 1] * 3
+    assert progress[-1] == 15
+    output.seek(0)
+    written = pd.read_parquet(output)
+    assert written["prediction"].tolist() == [x * 2 for x in range(15)]
+
+
+def test_later_chunks_are_cast_to_the_first_schema():
+    output = io.BytesIO()
+    chunks = [pd.DataFrame({"x": [1.5]}), pd.DataFrame({"x": [2]})]
+
+    assert write_parquet(chunks, output)[0] == 2
+    output.seek(0)
+    assert pd.read_parquet(output)["x"].tolist() == [1.5, 2.0]
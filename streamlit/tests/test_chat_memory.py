@@ -0,0 +1,74 @@
+from utils.chat_memory import Conversation, TokenCounter
+
+
+def chat(conversation, turns):
+    for i in range(turns):
+        conversation.prepare(f"question {i} " + "x" * 40)
+        conversation.record(f"answer {i} " + "y" * 40)
+
+
+def test_compaction_folds_the_oldest_turns_into_the_summary():
+    summarized = []
+
+    def summarizer(summary, turns):
+        summarized.append([turn.content.split()[:2] for turn in turns])
+        return f"{summary} {len(turns)} turns".strip()
+
+    conversation = Conversation(
+        system_prompt="Be brief.", max_prompt_tokens=120, summarizer=summarizer
+    )
+    chat(conversation, 6)
+
+    assert conversation.compactions >= 1
+    assert summarized[0][:2] == [["question", "0"], ["answer", "0"]]
+    assert conversation.summary in conversation.messages()[0]["content"]
+    # Whole user/assistant pairs are dropped, and the transcript keeps everything.
+    assert conversation.turns[0].role == "user"
+    assert len(conversation.transcript) == 12
+    assert conversation.prompt_tokens() <= conversation.max_prompt_tokens
+
+
+def test_compaction_shrinks_the_prompt_to_the_target_in_one_step():
+    conversation = Conversation(max_prompt_tokens=200, compact_to=0.5)
+    chat(conversation, 20)
+
+    # Each compaction drops several pairs at once, not one pair per turn.
+    assert conversation.compactions < conversation.compacted_turns / 2
+    assert conversation.summary == ""
+    assert conversation.prompt_tokens() <= conversation.max_prompt_tokens
+
+
+def test_failed_summarizer_keeps_the_previous_summary():
+    calls = []
+
+    def summarizer(summary, turns):
+        calls.append(summary)
+        if len(calls) > 1:
+            raise RuntimeError("endpoint down")
+        return "first summary"
+
+    conversation = Conversation(max_prompt_tokens=100, summarizer=summarizer)
+    chat(conversation, 12)
+
+    assert len(calls) > 1
+    assert conversation.summary == "first summary"
+
+
+def test_unanswered_prompt_is_replaced():
+    conversation = Conversation()
+    conversation.prepare("first try")
+    messages = conversation.prepare("second try")
+
+    assert [m["content"] for m in messages[1:]] == ["second try"]
+    assert len(conversation.transcript) == 1
+
+
+def test_counter_calibrates_toward_reported_usage():
+    counter = TokenCounter(chars_per_token=4.0, smoothing=0.5)
+    messages = [{"role": "user", "content": "x" * 200}]
+
+    # 200 characters reported as 100 tokens (plus the message overhead): 2 per token.
+    counter.calibrate(messages, 100 + 4)
+
+    assert counter.chars_per_token == 3.0
+    assert counter.count("x" * 30) == 10
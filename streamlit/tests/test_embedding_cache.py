@@ -0,0 +1,82 @@
+import threading
+from types import SimpleNamespace
+
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_service import EmbeddingService, pack_batches
+
+
+def test_memory_tier_evicts_the_least_recently_used_vector():
+    cache = EmbeddingCache(maxsize=2)
+    cache.put("model", "a", [1.0])
+    cache.put("model", "b", [2.0])
+    cache.get("model", "a")
+    cache.put("model", "c", [3.0])
+
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == [1.0]
+    assert cache.get("model", "c") == [3.0]
+    assert (cache.memory_hits, cache.misses) == (3, 1)
+
+
+def test_lookups_use_the_normalized_text_and_the_model():
+    cache = EmbeddingCache()
+    cache.put("model", "  hello\n world ", [0.5, 0.25])
+
+    assert cache.get("model", "hello world") == [0.5, 0.25]
+    assert cache.get("model", "Hello world") is None
+    assert cache.get("other-model", "hello world") is None
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(db_path=path).put("model", "hello", [0.5, 0.25])
+
+    cache = EmbeddingCache(db_path=path)
+    assert cache.get("model", "hello") == [0.5, 0.25]
+    assert cache.get("model", "hello") == [0.5, 0.25]
+    assert (cache.disk_hits, cache.memory_hits) == (1, 1)
+    assert cache.stats()["disk_entries"] == 1
+
+
+class FakeClient:
+    """An embedding endpoint that returns `[len(text), i]` in reverse order."""
+
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+        self.embeddings = SimpleNamespace(create=self.create)
+
+    def create(self, model, input):
+        with self.lock:
+            self.requests.append(list(input))
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text)), float(i)])
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=data[::-1])
+
+
+def test_pack_batches_limits_size_and_characters():
+    assert pack_batches(["aa", "bb", "cc"], 2, 100) == [[0, 1], [2]]
+    assert pack_batches(["aaaa", "b", "c", "dddddd"], 10, 5) == [[0, 1], [2], [3]]
+
+
+def test_service_sends_each_text_once_and_fills_the_cache():
+    client = FakeClient()
+    cache = EmbeddingCache()
+    service = EmbeddingService(client, "model", cache=cache, max_batch_size=2)
+
+    matrix = service.embed(["one", "three", " one ", "fifteen"])
+
+    assert matrix.shape == (4, 2)
+    assert list(matrix[:, 0]) == [3, 5, 3, 7]
+    assert sorted(text for request in client.requests for text in request) == [
+        "fifteen",
+        "one",
+        "three",
+    ]
+    assert all(len(request) <= 2 for request in client.requests)
+
+    client.requests.clear()
+    assert list(service.embed_one("three")) == list(matrix[1])
+    assert client.requests == []
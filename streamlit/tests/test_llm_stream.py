@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.llm_stream import ChatStream, chat_messages
+
+
+class FakeStream(list):
+    def close(self):
+        pass
+
+
+class Rejected(Exception):
+    status_code = 400
+
+
+class FakeClient:
+    """Streams two deltas, then a usage chunk if `stream_options` asks for it."""
+
+    def __init__(self, accepts_stream_options=True):
+        self.accepts_stream_options = accepts_stream_options
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.requests.append(request)
+        if "stream_options" in request and not self.accepts_stream_options:
+            raise Rejected("stream_options is not supported")
+        chunks = [
+            SimpleNamespace(
+                usage=None,
+                choices=[
+                    SimpleNamespace(
+                        delta=SimpleNamespace(content=text), finish_reason=reason
+                    )
+                ],
+            )
+            for text, reason in (("Hello", None), (" there", "stop"))
+        ]
+        if "stream_options" in request:
+            usage = SimpleNamespace(prompt_tokens=7, completion_tokens=2)
+            chunks.append(SimpleNamespace(usage=usage, choices=[]))
+        return FakeStream(chunks)
+
+
+def test_usage_is_requested_and_recorded():
+    client = FakeClient()
+    stream = ChatStream(client, "usage-endpoint", chat_messages("Hi"))
+
+    assert "".join(stream) == "Hello there"
+    assert client.requests[0]["stream_options"] == {"include_usage": True}
+    assert stream.stats()["completion_tokens"] == 2
+    assert stream.finish_reason == "stop"
+
+
+def test_endpoint_rejecting_stream_options_is_streamed_without_usage():
+    client = FakeClient(accepts_stream_options=False)
+
+    stream = ChatStream(client, "no-usage-endpoint", chat_messages("Hi"))
+    assert "".join(stream) == "Hello there"
+    assert stream.usage is None
+
+    # The rejection is remembered: the next stream doesn't try again.
+    assert "".join(ChatStream(client, "no-usage-endpoint", chat_messages("Hi")))
+    assert [("stream_options" in r) for r in client.requests] == [True, False, False]
+
+
+def test_other_errors_are_raised():
+    def create(**request):
+        raise RuntimeError("down")
+
+    client = FakeClient()
+    client.chat.completions.create = create
+
+    with pytest.raises(RuntimeError):
+        list(ChatStream(client, "broken-endpoint", chat_messages("Hi")))
@@ -0,0 +1,135 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.local_vector_index import LocalVectorIndex, LocalVectorIndexes, filter_mask
+
+
+def clustered(n=2000, dimension=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)) * 5
+    vectors = centers[rng.integers(clusters, size=n)] + rng.normal(size=(n, dimension))
+    rows = pd.DataFrame({"id": np.arange(n), "group": np.arange(n) % 3})
+    return vectors.astype(np.float32), rows
+
+
+def exact_top(vectors, query, k):
+    scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return list(np.argsort(-scores, kind="stable")[:k])
+
+
+ROWS = pd.DataFrame({"category": ["a", "b", "c", "a"], "price": [5, 10, 15, 20]})
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"category": "a"}, [True, False, False, True]),
+        ({"category": ["a", "c"]}, [True, False, True, True]),
+        ({"category NOT": "a"}, [False, True, True, False]),
+        ({"category NOT": ["a", "b"]}, [False, False, True, False]),
+        ({"price <": 10}, [True, False, False, False]),
+        ({"price <=": 10}, [True, True, False, False]),
+        ({"price >": 10}, [False, False, True, True]),
+        ({"price >=": 10}, [False, True, True, True]),
+        ({"category": "a", "price >": 10}, [False, False, False, True]),
+    ],
+)
+def test_filter_mask_operators(filters, expected):
+    assert list(filter_mask(ROWS, json.dumps(filters))) == expected
+
+
+def test_filter_mask_rejects_unknown_columns_and_operators():
+    assert filter_mask(ROWS, None) is None
+    with pytest.raises(ValueError, match="Unknown filter column"):
+        filter_mask(ROWS, json.dumps({"colour": "red"}))
+    with pytest.raises(ValueError, match="Unsupported filter operator"):
+        filter_mask(ROWS, json.dumps({"price LIKE": 10}))
+
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "l2"])
+def test_exact_search_ranks_by_metric(metric):
+    vectors = np.array([[1, 0], [0, 1], [2, 2], [-1, 0]], dtype=np.float32)
+    index = LocalVectorIndex(vectors, ROWS, metric=metric)
+
+    positions, scores = index.search([1, 0.1], num_results=4)
+
+    expected = {"cosine": [0, 2, 1, 3], "dot": [2, 0, 1, 3], "l2": [0, 1, 3, 2]}
+    assert list(positions) == expected[metric]
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_ivf_search_matches_exact_search_closely():
+    vectors, rows = clustered()
+    exact = LocalVectorIndex(vectors, rows)
+    ivf = LocalVectorIndex(vectors, rows, ann_threshold=0, nlist=20, nprobe=3)
+    assert ivf._centroids is not None and exact._centroids is None
+
+    queries = vectors[:50] + np.random.default_rng(1).normal(size=(50, 16)) * 0.1
+    recall = np.mean(
+        [
+            len(set(ivf.search(q, 10)[0]) & set(exact_top(vectors, q, 10))) / 10
+            for q in queries
+        ]
+    )
+    # Three of twenty lists are probed, so far fewer vectors are scored.
+    assert len(ivf._candidates(queries[0])) < len(vectors) / 2
+    assert recall >= 0.9
+
+    # Probing every list is exact.
+    ivf.nprobe = 20
+    assert list(ivf.search(queries[0], 10)[0]) == exact_top(vectors, queries[0], 10)
+
+
+def test_filtered_query_is_exact_over_the_matching_rows():
+    vectors, rows = clustered()
+    index = LocalVectorIndex(vectors, rows, ann_threshold=0, nlist=20, nprobe=1)
+
+    response = index.query_index(
+        "local",
+        ["id", "group"],
+        query_vector=vectors[0],
+        num_results=5,
+        filters_json=json.dumps({"group": 1}),
+    )
+
+    matching = np.flatnonzero(rows["group"] == 1)
+    best = matching[exact_top(vectors[matching], vectors[0], 5)]
+    assert [row[0] for row in response.result.data_array] == list(best)
+    assert all(row[1] == 1 for row in response.result.data_array)
+    assert [c.name for c in response.manifest.columns] == ["id", "group", "score"]
+
+
+def test_save_and_load_round_trip_keeps_the_ivf_lists(tmp_path):
+    vectors, rows = clustered()
+    index = LocalVectorIndex(vectors, rows, ann_threshold=0, nlist=20, nprobe=4)
+    index.save(str(tmp_path / "docs"))
+
+    loaded = LocalVectorIndexes(str(tmp_path)).get("docs")
+
+    assert isinstance(loaded.vectors, np.memmap)
+    np.testing.assert_array_equal(loaded._centroids, index._centroids)
+    np.testing.assert_array_equal(loaded._lists, index._lists)
+    loaded.nprobe = 4
+    for query in vectors[:10]:
+        assert list(loaded.search(query, 5)[0]) == list(index.search(query, 5)[0])
+    response = loaded.query_index(
+        "docs", ["id", "vector"], query_vector=vectors[7], num_results=1
+    )
+    assert response.result.data_array[0][:2] == [7, vectors[7].tolist()]
+
+
+def test_query_score_threshold_and_errors():
+    vectors = np.array([[1, 0], [0, 1]], dtype=np.float32)
+    index = LocalVectorIndex(vectors, ROWS.iloc[:2])
+
+    response = index.query_index(
+        "local", ["category"], query_vector=[1, 0], score_threshold=0.5
+    )
+    assert response.result.data_array == [["a", 1.0]]
+    with pytest.raises(ValueError, match="dimensions"):
+        index.search([1, 0, 0])
+    with pytest.raises(ValueError, match="Unknown columns"):
+        index.query_index("local", ["colour"], query_vector=[1, 0])
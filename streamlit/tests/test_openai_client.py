@@ -0,0 +1,94 @@
+import httpx
+import pytest
+
+from utils.openai_client import OpenAIClientProvider, _DatabricksAuth
+
+
+class FakeConfig:
+    """A workspace config whose token changes every time it is read."""
+
+    host = "https://example.cloud.databricks.com"
+
+    def __init__(self):
+        self.tokens = 0
+
+    def authenticate(self):
+        self.tokens += 1
+        return {"Authorization": f"Bearer token-{self.tokens}"}
+
+
+def test_client_is_created_on_first_use_and_shared():
+    configs = []
+
+    def config_factory():
+        configs.append(FakeConfig())
+        return configs[-1]
+
+    provider = OpenAIClientProvider(config_factory=config_factory)
+    assert configs == []
+    assert provider.health()["status"] == "not started"
+
+    client = provider.get()
+    assert provider.get() is client
+    assert provider.embeddings is client.embeddings
+    assert str(client.base_url).startswith(FakeConfig.host + "/serving-endpoints")
+    assert len(configs) == 1
+    assert provider.health()["status"] == "ok"
+
+    provider.reset()
+    assert provider.health()["status"] == "not started"
+    assert provider.get() is not client
+    assert len(configs) == 2
+
+
+def test_creation_failure_is_reported_and_retried():
+    attempts = []
+
+    def config_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("no host configured")
+        return FakeConfig()
+
+    provider = OpenAIClientProvider(config_factory=config_factory)
+
+    with pytest.raises(ValueError):
+        provider.get()
+    health = provider.health()
+    assert health["status"] == "error"
+    assert "no host configured" in health["last_error"]
+
+    assert provider.get() is not None
+    assert provider.health()["status"] == "ok"
+
+
+def test_unauthorized_request_is_retried_once_with_a_fresh_token():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(401 if len(seen) == 1 else 200)
+
+    provider = OpenAIClientProvider(config_factory=FakeConfig)
+    http = httpx.Client(
+        auth=_DatabricksAuth(FakeConfig(), provider),
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert http.get("https://example.cloud.databricks.com/").status_code == 200
+    assert seen == ["Bearer token-1", "Bearer token-2"]
+    health = provider.health()
+    assert (health["requests"], health["auth_retries"]) == (1, 1)
+    assert health["last_error"] is None
+
+
+def test_repeated_unauthorized_response_is_recorded():
+    provider = OpenAIClientProvider(config_factory=FakeConfig)
+    http = httpx.Client(
+        auth=_DatabricksAuth(FakeConfig(), provider),
+        transport=httpx.MockTransport(lambda request: httpx.Response(401)),
+    )
+
+    assert http.get("https://example.cloud.databricks.com/").status_code == 401
+    assert provider.health()["last_error"] == "HTTP 401"
+    assert provider.health()["auth_retries"] == 1
@@ -0,0 +1,93 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from databricks.sdk.errors import BadRequest, TemporarilyUnavailable
+
+from utils.request_batcher import RequestBatcher
+
+
+class FakeEndpoints:
+    """Answers each row with its `x` value."""
+
+    def __init__(self, error=None, bad_value=None):
+        self.error = error
+        self.bad_value = bad_value
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def query(self, name, dataframe_split):
+        with self.lock:
+            self.calls.append(dataframe_split.as_dict())
+        values = [
+            row[dataframe_split.columns.index("x")] for row in dataframe_split.data
+        ]
+        if self.error:
+            raise self.error
+        if self.bad_value in values:
+            raise BadRequest(f"bad value {self.bad_value}")
+        return SimpleNamespace(predictions=values, served_model_name="model")
+
+
+def batcher_for(endpoints):
+    # A long wait so that every submitted request lands in one batch.
+    return RequestBatcher(SimpleNamespace(serving_endpoints=endpoints), max_wait=0.2)
+
+
+def submit_all(batcher, values):
+    return [batcher.submit("endpoint", [{"x": value}]) for value in values]
+
+
+def test_batches_records_without_changing_types():
+    endpoints = FakeEndpoints()
+    futures = submit_all(batcher_for(endpoints), [1, 2, 3])
+
+    assert [f.result(timeout=5).predictions for f in futures] == [[1], [2], [3]]
+    assert endpoints.calls == [{"columns": ["x"], "data": [[1], [2], [3]]}]
+    assert all(type(row[0]) is int for row in endpoints.calls[0]["data"])
+
+
+def test_missing_columns_are_sent_as_null():
+    endpoints = FakeEndpoints()
+    batcher = batcher_for(endpoints)
+
+    future = batcher.submit("endpoint", [{"x": 1, "y": "a"}, {"x": 2}])
+
+    assert future.result(timeout=5).predictions == [1, 2]
+    assert endpoints.calls == [{"columns": ["x", "y"], "data": [[1, "a"], [2, None]]}]
+
+
+def test_bad_input_is_retried_one_by_one():
+    endpoints = FakeEndpoints(bad_value=2)
+    futures = submit_all(batcher_for(endpoints), [1, 2, 3])
+
+    assert futures[0].result(timeout=5).predictions == [1]
+    with pytest.raises(BadRequest):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5).predictions == [3]
+    assert len(endpoints.calls) == 4
+
+
+def test_unavailable_is_passed_to_every_caller_without_splitting():
+    endpoints = FakeEndpoints(error=TemporarilyUnavailable("overloaded"))
+    futures = submit_all(batcher_for(endpoints), [1, 2, 3])
+
+    for future in futures:
+        with pytest.raises(TemporarilyUnavailable):
+            future.result(timeout=5)
+    assert len(endpoints.calls) == 1
+
+
+def test_unexpected_failure_resolves_every_future():
+    class Malformed:
+        @property
+        def predictions(self):
+            raise RuntimeError("malformed response")
+
+    endpoints = FakeEndpoints()
+    endpoints.query = lambda name, dataframe_split: Malformed()
+    futures = submit_all(batcher_for(endpoints), [1, 2])
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="malformed"):
+            future.result(timeout=5)
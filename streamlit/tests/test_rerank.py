@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from databricks.sdk.service.vectorsearch import (
+    ColumnInfo,
+    QueryVectorIndexResponse,
+    ResultData,
+    ResultManifest,
+)
+
+from utils.rerank import (
+    keyword_scores,
+    mmr,
+    reciprocal_rank_fusion,
+    rerank,
+    response_frame,
+)
+
+
+def test_keyword_scores_favour_rare_matching_terms():
+    texts = ["the cat sat", "the dog sat", "the the the", None]
+
+    scores = keyword_scores("Cat!", texts)
+
+    assert scores[0] > 0
+    assert list(scores[1:]) == [0, 0, 0]
+    assert keyword_scores("", texts).tolist() == [0, 0, 0, 0]
+    # "the" is in most texts, so it counts for less than "dog".
+    both = keyword_scores("the dog", texts)
+    assert both.argmax() == 1
+
+
+def test_reciprocal_rank_fusion_sums_inverse_ranks():
+    fused = reciprocal_rank_fusion([np.array([3, 2, 1]), np.array([1, 2, 3])], k=1)
+
+    assert np.allclose(fused, [1 / 2 + 1 / 4, 2 / 3, 1 / 4 + 1 / 2])
+
+
+def test_mmr_skips_near_duplicates():
+    relevance = np.array([1.0, 0.99, 0.5])
+    vectors = np.array([[1, 0], [1, 0.01], [0, 1]])
+
+    assert mmr(relevance, vectors, 3, lambda_=1.0) == [0, 1, 2]
+    assert mmr(relevance, vectors, 2, lambda_=0.5) == [0, 2]
+    assert mmr(relevance, vectors, 0) == []
+
+
+def test_rerank_fuses_keywords_and_pages_the_results():
+    candidates = pd.DataFrame(
+        {"id": [1, 2, 3, 4], "text": ["apples", "pears", "pears and plums", "tarts"]}
+    )
+    scores = [0.9, 0.8, 0.7, 0.6]
+
+    page = rerank(candidates, scores, query_text="pears", text_column="text", limit=2)
+    assert page["id"].tolist() == [2, 1]
+
+    page = rerank(candidates, scores, offset=2, limit=2)
+    assert page["id"].tolist() == [3, 4]
+    assert page["score"].tolist() == [0.7, 0.6]
+
+
+def test_rerank_with_diversity_uses_the_vectors():
+    candidates = pd.DataFrame({"id": [1, 2, 3]})
+    vectors = np.array([[1, 0], [1, 0.01], [0, 1]])
+
+    page = rerank(candidates, [1.0, 0.99, 0.5], vectors=vectors, diversity=0.5)
+    assert page["id"].tolist() == [1, 3, 2]
+    assert rerank(candidates, [1.0, 0.99, 0.5], vectors=vectors)["id"].tolist() == [
+        1,
+        2,
+        3,
+    ]
+
+
+def test_response_frame_keeps_the_score_column():
+    response = QueryVectorIndexResponse(
+        manifest=ResultManifest(
+            columns=[ColumnInfo(name="id"), ColumnInfo(name="score")]
+        ),
+        result=ResultData(data_array=[[1, 0.5]]),
+    )
+
+    assert response_frame(response).to_dict("records") == [{"id": 1, "score": 0.5}]
@@ -0,0 +1,100 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from databricks.sdk.errors import BadRequest, TooManyRequests
+
+from utils.resilient_invoke import ResilientInvoker
+from utils.stats import percentile
+
+
+class FakeEndpoints:
+    """Runs each query through the next of `behaviours`: a delay or an exception."""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        raise RuntimeError("not probed in tests")
+
+    def query(self, name, **request):
+        with self.lock:
+            behaviour = self.behaviours[min(self.calls, len(self.behaviours) - 1)]
+            self.calls += 1
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        time.sleep(behaviour)
+        return SimpleNamespace(predictions=[behaviour])
+
+
+def invoker_for(endpoints, **kwargs):
+    return ResilientInvoker(
+        SimpleNamespace(serving_endpoints=endpoints), base_backoff=0, **kwargs
+    )
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert percentile([3, 1, 2, 4], 99) == 4
+
+
+def test_throttled_requests_are_retried():
+    endpoints = FakeEndpoints(TooManyRequests("slow down"), 0)
+    invoker = invoker_for(endpoints)
+
+    assert invoker.query("endpoint", inputs=[1]).predictions == [0]
+    metrics = invoker.metrics("endpoint")
+    assert (metrics["retries"], metrics["throttled"], metrics["errors"]) == (1, 1, 0)
+
+
+def test_input_errors_are_not_retried():
+    endpoints = FakeEndpoints(BadRequest("bad input"), 0)
+    invoker = invoker_for(endpoints)
+
+    with pytest.raises(BadRequest):
+        invoker.query("endpoint", idempotent=True, inputs=[1])
+    assert endpoints.calls == 1
+
+
+def test_slow_idempotent_request_is_hedged():
+    endpoints = FakeEndpoints(1.0, 0)
+    invoker = invoker_for(endpoints, min_samples=1)
+    invoker._endpoint("endpoint").latencies.append(0.05)
+
+    assert invoker.query("endpoint", idempotent=True, inputs=[1]).predictions == [0]
+    metrics = invoker.metrics("endpoint")
+    assert (metrics["hedges"], metrics["hedge_wins"]) == (1, 1)
+
+
+def test_timeout_starts_when_the_call_starts():
+    endpoints = FakeEndpoints(0.2)
+    invoker = invoker_for(endpoints, default_timeout=0.4, max_workers=1)
+    # Occupy the only worker for a while before the request is sent.
+    invoker._pool.submit(time.sleep, 0.3)
+
+    assert invoker.query("endpoint", inputs=[1]).predictions == [0.2]
+    assert invoker.metrics("endpoint")["timeouts"] == 0
+
+
+def test_queued_call_is_cancelled_when_no_worker_frees_up():
+    endpoints = FakeEndpoints(0)
+    invoker = invoker_for(endpoints, default_timeout=0.1, max_workers=1)
+    invoker._pool.submit(time.sleep, 0.5)
+
+    with pytest.raises(TimeoutError, match="No worker free"):
+        invoker.query("endpoint", inputs=[1])
+    invoker._pool.shutdown(wait=True)
+    assert endpoints.calls == 0
+
+
+def test_generation_ignores_the_adaptive_timeout():
+    invoker = invoker_for(FakeEndpoints(0.3), min_samples=1, min_timeout=0.01)
+    invoker._endpoint("endpoint").latencies.append(0.01)
+
+    assert invoker.timeout("endpoint") < 0.3
+    response = invoker.query("endpoint", messages=[{"role": "user", "content": "hi"}])
+    assert response.predictions == [0.3]
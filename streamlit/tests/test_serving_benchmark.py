@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from utils.serving_benchmark import ServingBenchmark, StubServingServer, main
+
+
+@pytest.mark.parametrize("mode", ["dataframe", "chat", "stream"])
+def test_one_level_against_the_stub(mode):
+    with StubServingServer(latency=0.001, tokens=4, token_interval=0) as stub:
+        benchmark = ServingBenchmark(
+            stub.workspace_client(), "stub-model", mode=mode, requests=6, warmup=1
+        )
+        result = benchmark.run_level(concurrency=2, payload_size=3)
+
+    assert (result.requests, result.errors) == (6, 0), result.first_error
+    assert result.latency_p50 > 0
+    assert (result.ttft_p50 is not None) == (mode == "stream")
+
+
+def test_injected_errors_are_counted():
+    with StubServingServer(latency=0.001, error_rate=1.0) as stub:
+        result = ServingBenchmark(
+            stub.workspace_client(), "stub-model", requests=3, warmup=0
+        ).run_level(concurrency=1, payload_size=1)
+
+    assert result.errors == 3
+    assert result.first_error
+
+
+def test_cli_writes_results(tmp_path, capsys):
+    output = tmp_path / "results.jsonl"
+    main(
+        [
+            "--stub",
+            "--stub-latency=0.001",
+            "--concurrency=1,2",
+            "--sizes=1",
+            "--requests=4",
+            f"--output={output}",
+        ]
+    )
+
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["concurrency"] for r in results] == [1, 2]
+    assert all(r["errors"] == 0 for r in results)
@@ -0,0 +1,81 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from utils.transfer_progress import UPLOAD, TransferTracker
+from utils.upload_manifest import DedupUploader, UploadManifest
+
+
+class FakeFiles:
+    def __init__(self):
+        self.files = {}
+        self.uploads = 0
+
+    def upload(self, file_path, contents, overwrite=False):
+        self.uploads += 1
+        self.files[file_path] = contents.read()
+
+    def get_metadata(self, file_path):
+        return SimpleNamespace(
+            content_length=len(self.files[file_path]),
+            last_modified=f"v{self.uploads}",
+        )
+
+
+@pytest.fixture
+def uploader(tmp_path):
+    return DedupUploader(
+        SimpleNamespace(files=FakeFiles()), UploadManifest(str(tmp_path))
+    )
+
+
+def upload(uploader, tracker, data):
+    path = "/Volumes/a/b/c/file.csv"
+    progress = []
+    with tracker.track(
+        UPLOAD, path, len(data), on_progress=progress.append
+    ) as transfer:
+        result = uploader.upload(path, io.BytesIO(data), wrap=transfer.wrap)
+        if not result.uploaded:
+            transfer.skip()
+    return result, tracker.recent(1)[0]
+
+
+def test_unchanged_file_is_skipped_and_recorded_as_skipped(uploader):
+    tracker = TransferTracker(metrics_file=None)
+
+    first, first_stats = upload(uploader, tracker, b"a,b\n1,2\n")
+    second, second_stats = upload(uploader, tracker, b"a,b\n1,2\n")
+
+    assert first.uploaded and not second.uploaded
+    assert uploader.w.files.uploads == 1
+    assert (first_stats.status, first_stats.bytes_transferred) == ("done", 8)
+    assert (second_stats.status, second_stats.bytes_transferred) == ("skipped", 0)
+
+
+def test_changed_file_is_uploaded_again(uploader):
+    tracker = TransferTracker(metrics_file=None)
+
+    upload(uploader, tracker, b"a,b\n1,2\n")
+    result, stats = upload(uploader, tracker, b"a,b\n3,4\n")
+
+    assert result.uploaded and uploader.w.files.uploads == 2
+    assert uploader.w.files.files["/Volumes/a/b/c/file.csv"] == b"a,b\n3,4\n"
+    assert stats.status == "done"
+
+
+def test_hashing_is_not_counted_as_progress(uploader):
+    data = b"x" * 1000
+    stats_seen = []
+    tracker = TransferTracker(metrics_file=None)
+    with tracker.track(UPLOAD, "/Volumes/a/b/c/f", len(data)) as transfer:
+        uploader.upload(
+            "/Volumes/a/b/c/f",
+            io.BytesIO(data),
+            wrap=lambda stream: stats_seen.append(transfer.stats.bytes_transferred)
+            or transfer.wrap(stream),
+        )
+
+    assert stats_seen == [0]
+    assert transfer.stats.bytes_transferred == len(data)
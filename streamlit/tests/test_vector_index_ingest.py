@@ -0,0 +1,179 @@
+import datetime
+import json
+from types import SimpleNamespace
+
+import pytest
+from databricks.sdk.service.vectorsearch import (
+    DirectAccessVectorIndexSpec,
+    EmbeddingVectorColumn,
+    UpsertDataResult,
+    UpsertDataStatus,
+    UpsertDataVectorIndexResponse,
+    VectorIndex,
+    VectorIndexType,
+)
+
+from utils.vector_index_ingest import (
+    TableSource,
+    VectorIndexIngest,
+    VolumeFileSource,
+    encode_key,
+)
+
+
+class FakeIndexes:
+    """A direct-access index whose upserts fail for the keys in `failing`.
+
+    `failing` maps a key to the number of upserts that still fail for it;
+    None fails every time.
+    """
+
+    def __init__(self, failing=None):
+        self.failing = dict(failing or {})
+        self.upserted = []
+
+    def get_index(self, index_name):
+        return VectorIndex(
+            name=index_name,
+            primary_key="id",
+            index_type=VectorIndexType.DIRECT_ACCESS,
+            direct_access_index_spec=DirectAccessVectorIndexSpec(
+                embedding_vector_columns=[
+                    EmbeddingVectorColumn(name="vector", embedding_dimension=2)
+                ],
+                schema_json=json.dumps(
+                    {"id": "string", "text": "string", "vector": "array<float>"}
+                ),
+            ),
+        )
+
+    def upsert_data_vector_index(self, index_name, inputs_json):
+        failed = []
+        for row in json.loads(inputs_json):
+            key = str(row["id"])
+            remaining = self.failing.get(key, 0)
+            if remaining is None or remaining > 0:
+                failed.append(key)
+                if remaining:
+                    self.failing[key] = remaining - 1
+            else:
+                self.upserted.append(key)
+        return UpsertDataVectorIndexResponse(
+            status=(
+                UpsertDataStatus.PARTIAL_SUCCESS if failed else UpsertDataStatus.SUCCESS
+            ),
+            result=UpsertDataResult(failed_primary_keys=failed),
+        )
+
+
+def volume_file(tmp_path, rows):
+    path = tmp_path / "rows.jsonl"
+    path.write_text(
+        "".join(
+            json.dumps({"id": str(i), "text": f"row {i}", "vector": [1.0, float(i)]})
+            + "\n"
+            for i in rows
+        )
+    )
+    w = SimpleNamespace(
+        files=SimpleNamespace(
+            download=lambda file_path: SimpleNamespace(contents=open(path, "rb"))
+        )
+    )
+    return VolumeFileSource(w, "/Volumes/main/docs/raw/rows.jsonl")
+
+
+def ingest(indexes, tmp_path):
+    return VectorIndexIngest(
+        indexes,
+        chunk_rows=2,
+        max_batch_rows=2,
+        max_workers=1,
+        max_retries=2,
+        base_backoff=0,
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+    )
+
+
+def test_a_second_run_resumes_after_the_checkpoint(tmp_path):
+    indexes = FakeIndexes()
+    ingest(indexes, tmp_path).run("main.docs.chunks", volume_file(tmp_path, range(4)))
+
+    source = volume_file(tmp_path, range(6))
+    progress = ingest(indexes, tmp_path).run("main.docs.chunks", source)
+
+    assert progress.rows_resumed == 4
+    assert indexes.upserted == ["0", "1", "2", "3", "4", "5"]
+
+
+def test_failed_rows_are_retried_alone(tmp_path):
+    indexes = FakeIndexes(failing={"1": 1})
+
+    progress = ingest(indexes, tmp_path).run(
+        "main.docs.chunks", volume_file(tmp_path, range(4))
+    )
+
+    assert (progress.rows_upserted, progress.rows_failed) == (4, 0)
+    assert progress.retries == 1
+    assert indexes.upserted == ["0", "1", "2", "3"]
+
+
+def test_checkpoint_stops_before_a_chunk_with_failed_rows(tmp_path):
+    indexes = FakeIndexes(failing={"2": None})
+    source = volume_file(tmp_path, range(6))
+
+    progress = ingest(indexes, tmp_path).run("main.docs.chunks", source)
+
+    assert progress.failed_keys == ["2"]
+    assert progress.rows_upserted == 5
+    runner = ingest(indexes, tmp_path)
+    path = runner.checkpoint_path("main.docs.chunks", source, None)
+    # Later chunks succeeded, but the checkpoint stays before the failed one.
+    assert runner.load_checkpoint(path)["rows"] == 2
+
+    indexes.failing.clear()
+    progress = runner.run("main.docs.chunks", source)
+    assert progress.rows_resumed == 2
+    assert indexes.upserted[-4:] == ["2", "3", "4", "5"]
+
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, query, parameters=None):
+        self.executed.append((query, parameters))
+
+    def fetchmany_arrow(self, size):
+        return SimpleNamespace(num_rows=0)
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        7,
+        "doc-7",
+        datetime.date(2024, 5, 1),
+        datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+    ],
+)
+def test_checkpoint_keeps_the_key_type(tmp_path, key):
+    path = str(tmp_path / "checkpoint.json")
+    VectorIndexIngest._save_checkpoint(path, {"rows": 1, "last_key": encode_key(key)})
+    executed = []
+    connection = SimpleNamespace(cursor=lambda: FakeCursor(executed))
+
+    list(
+        TableSource(connection, "main.docs.source").batches(
+            "id", 10, VectorIndexIngest.load_checkpoint(path)
+        )
+    )
+
+    after = executed[0][1]["after"]
+    assert after == key and type(after) is type(key)
@@ -0,0 +1,47 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.local_vector_index import LocalVectorIndex, LocalVectorIndexes
+from utils.vector_search_benchmark import VectorSearchBenchmark, load_queries
+
+VECTORS = {"apple": [1.0, 0.0], "banana": [0.0, 1.0], "cherry": [0.7, 0.7]}
+
+
+def slow_embed(text):
+    time.sleep(0.05)
+    return VECTORS[text]
+
+
+def load_queries_from(tmp_path, lines):
+    path = tmp_path / "queries.jsonl"
+    path.write_text("\n".join(lines))
+    return load_queries(str(path))
+
+
+def test_local_embedding_is_timed_separately_from_search(tmp_path):
+    LocalVectorIndex(
+        np.array(list(VECTORS.values()), dtype=np.float32),
+        pd.DataFrame({"id": list(VECTORS)}),
+    ).save(str(tmp_path / "fruit"))
+    indexes = LocalVectorIndexes(str(tmp_path), embed=slow_embed)
+    queries = load_queries_from(tmp_path, ['{"query": "apple", "relevant": ["apple"]}'])
+
+    result = VectorSearchBenchmark(
+        indexes, "fruit", "id", embed=slow_embed, target="local", warmup=0
+    ).run_level(queries, num_results=1, concurrency=1)
+
+    assert result.errors == 0, result.first_error
+    assert result.recall == 1.0
+    assert result.embed_p50 >= 0.04
+    assert result.search_p50 < 0.04
+
+
+def test_blank_lines_in_the_query_set_are_skipped(tmp_path):
+    queries = load_queries_from(
+        tmp_path,
+        ['{"query": "apple"}', "", "   ", '{"query": "pear", "relevant": [2]}'],
+    )
+
+    assert [(q.query, q.relevant) for q in queries] == [("apple", []), ("pear", [2])]
@@ -0,0 +1,47 @@
+import io
+import zipfile
+from types import SimpleNamespace
+
+from utils.volume_export import ZipExporter
+
+
+class FakeFiles:
+    def __init__(self, files):
+        self.files = files
+
+    def download(self, file_path):
+        if file_path not in self.files:
+            raise FileNotFoundError(file_path)
+        return SimpleNamespace(contents=io.BytesIO(self.files[file_path]))
+
+
+def export(files, paths):
+    exporter = ZipExporter(
+        SimpleNamespace(files=FakeFiles(files)), chunk_size=4, max_chunks=2
+    )
+    chunks = exporter.stream(paths, base_dir="/Volumes/a/b/c")
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def test_archive_holds_every_file_under_its_relative_name():
+    files = {
+        "/Volumes/a/b/c/x.txt": b"hello world",
+        "/Volumes/a/b/c/sub/y.bin": bytes(range(256)) * 10,
+        "/Volumes/a/b/c/empty": b"",
+    }
+
+    archive = export(files, list(files))
+
+    assert archive.testzip() is None
+    assert {name: archive.read(name) for name in archive.namelist()} == {
+        path[len("/Volumes/a/b/c/") :]: data for path, data in files.items()
+    }
+
+
+def test_failed_downloads_are_listed_instead_of_aborting():
+    files = {"/Volumes/a/b/c/x.txt": b"hello"}
+
+    archive = export(files, ["/Volumes/a/b/c/x.txt", "/Volumes/a/b/c/missing.txt"])
+
+    assert archive.read("x.txt") == b"hello"
+    assert "missing.txt" in archive.read("_export_errors.txt").decode()
@@ -0,0 +1,68 @@
+import threading
+from types import SimpleNamespace
+
+from utils.volume_permissions import PERMISSIONS_VALIDATED, VolumePermissionCache
+
+
+class FakeClient:
+    """A workspace where `volumes.read` waits until the grants lookup has started."""
+
+    def __init__(self, full_name, privileges=("WRITE_VOLUME",)):
+        self.full_name = full_name
+        self.privileges = list(privileges)
+        self.grant_lookups = []
+        self.reads = 0
+        self.grants_started = threading.Event()
+        self.current_user = SimpleNamespace(
+            me=lambda: SimpleNamespace(user_name="someone@example.com")
+        )
+        self.volumes = SimpleNamespace(read=self.read)
+        self.grants = SimpleNamespace(get_effective=self.get_effective)
+
+    def read(self, name):
+        self.reads += 1
+        # Fails the test by timing out if the lookups run one after the other.
+        assert self.grants_started.wait(timeout=2)
+        return SimpleNamespace(full_name=self.full_name)
+
+    def get_effective(self, securable_type, full_name, principal):
+        self.grant_lookups.append(full_name)
+        self.grants_started.set()
+        privileges = [
+            SimpleNamespace(privilege=SimpleNamespace(value=privilege))
+            for privilege in self.privileges
+        ]
+        return SimpleNamespace(
+            privilege_assignments=[SimpleNamespace(privileges=privileges)]
+        )
+
+
+def test_lookups_run_concurrently_and_success_is_cached():
+    w = FakeClient("main.default.files")
+    cache = VolumePermissionCache(w)
+
+    assert cache.check("main.default.files") == PERMISSIONS_VALIDATED
+    assert cache.check("main.default.files") == PERMISSIONS_VALIDATED
+    assert w.grant_lookups == ["main.default.files"]
+    assert w.reads == 1
+
+
+def test_grants_are_checked_again_for_the_full_name():
+    w = FakeClient("main.default.files")
+    cache = VolumePermissionCache(w)
+
+    assert cache.check("Main.Default.Files") == PERMISSIONS_VALIDATED
+    assert w.grant_lookups[-1] == "main.default.files"
+    assert cache._cache.get(("someone@example.com", "main.default.files"))
+
+    cache.invalidate("Main.Default.Files")
+    assert cache._cache.get(("someone@example.com", "main.default.files")) is None
+
+
+def test_denials_are_not_cached():
+    w = FakeClient("main.default.files", privileges=["READ_VOLUME"])
+    cache = VolumePermissionCache(w)
+
+    assert cache.check("main.default.files").startswith("Insufficient permissions")
+    w.privileges = ["WRITE_VOLUME"]
+    assert cache.check("main.default.files") == PERMISSIONS_VALIDATED
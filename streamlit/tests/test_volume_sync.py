@@ -0,0 +1,136 @@
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from databricks.sdk.errors import NotFound
+
+from utils.upload_manifest import UploadManifest
+from utils.volume_sync import DOWNLOAD, UPLOAD, VolumeSync, resolve_local_dir
+
+VOLUME = "/Volumes/main/default/files"
+
+
+class FakeFiles:
+    """`w.files` over a dict of volume paths to sizes."""
+
+    def __init__(self, files):
+        self.files = files
+
+    def _directories(self):
+        directories = {VOLUME}
+        for path in self.files:
+            while path != VOLUME:
+                path = os.path.dirname(path)
+                directories.add(path)
+        return directories
+
+    def get_directory_metadata(self, directory):
+        if directory not in self._directories():
+            raise NotFound(f"{directory} not found")
+
+    def list_directory_contents(self, directory):
+        if directory not in self._directories():
+            raise NotFound(f"{directory} not found")
+        children = set()
+        for path in list(self.files) + list(self._directories()):
+            if os.path.dirname(path) == directory and path != directory:
+                children.add(path)
+        for path in sorted(children):
+            yield SimpleNamespace(
+                path=path,
+                is_directory=path not in self.files,
+                file_size=self.files.get(path),
+                last_modified=int(
+                    datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp() * 1000
+                ),
+            )
+
+
+@pytest.fixture
+def make_sync(tmp_path_factory):
+    def make(files, **kwargs):
+        w = SimpleNamespace(files=FakeFiles(files))
+        manifest = UploadManifest(str(tmp_path_factory.mktemp("manifest")))
+        return VolumeSync(w, manifest=manifest, **kwargs)
+
+    return make
+
+
+def write(path, content=b"data"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def actions(report):
+    return {(a.action, a.relative_path) for a in report.actions}
+
+
+def test_upload_plans_missing_and_changed_files(tmp_path, make_sync):
+    write(tmp_path / "a.txt")
+    write(tmp_path / "sub" / "b.txt", b"longer data")
+    sync = make_sync({f"{VOLUME}/sub/b.txt": 3})
+
+    report = sync.plan(str(tmp_path), VOLUME)
+
+    assert actions(report) == {(UPLOAD, "a.txt"), (UPLOAD, "sub/b.txt")}
+
+
+def test_delete_plans_only_files_missing_on_source(tmp_path, make_sync):
+    write(tmp_path / "a.txt")
+    sync = make_sync({f"{VOLUME}/a.txt": 4, f"{VOLUME}/old.txt": 1})
+
+    report = sync.plan(str(tmp_path), VOLUME, delete=True)
+
+    assert ("delete_remote", "old.txt") in actions(report)
+    assert ("delete_remote", "a.txt") not in actions(report)
+
+
+def test_missing_local_source_raises_instead_of_deleting(tmp_path, make_sync):
+    sync = make_sync({f"{VOLUME}/a.txt": 4})
+
+    with pytest.raises(FileNotFoundError):
+        sync.plan(str(tmp_path / "typo"), VOLUME, delete=True)
+
+
+def test_missing_volume_source_raises_instead_of_deleting(tmp_path, make_sync):
+    write(tmp_path / "a.txt")
+    sync = make_sync({f"{VOLUME}/a.txt": 4})
+
+    with pytest.raises(FileNotFoundError):
+        sync.plan(str(tmp_path), f"{VOLUME}/typo", direction=DOWNLOAD, delete=True)
+    assert os.path.exists(tmp_path / "a.txt")
+
+
+def test_empty_source_delete_needs_confirmation(tmp_path, make_sync):
+    sync = make_sync({f"{VOLUME}/a.txt": 4})
+
+    with pytest.raises(ValueError):
+        sync.plan(str(tmp_path), VOLUME, delete=True)
+    report = sync.plan(str(tmp_path), VOLUME, delete=True, confirm_empty_source=True)
+
+    assert actions(report) == {("delete_remote", "a.txt")}
+
+
+def test_empty_source_without_delete_is_a_no_op(tmp_path, make_sync):
+    sync = make_sync({f"{VOLUME}/a.txt": 4})
+
+    assert sync.plan(str(tmp_path), VOLUME).actions == []
+
+
+def test_local_root_rejects_paths_outside_it(tmp_path, make_sync):
+    root = tmp_path / "root"
+    write(root / "drop" / "a.txt")
+    write(tmp_path / "secret" / "key.pem")
+    os.symlink(tmp_path / "secret", root / "link")
+    sync = make_sync({}, local_root=str(root))
+
+    assert sync.plan("drop", VOLUME).local_dir == str(root / "drop")
+    for path in ["../secret", str(tmp_path / "secret"), "link"]:
+        with pytest.raises(PermissionError):
+            sync.plan(path, VOLUME)
+
+
+def test_resolve_local_dir_accepts_the_root_itself(tmp_path):
+    assert resolve_local_dir(".", str(tmp_path)) == os.path.realpath(tmp_path)
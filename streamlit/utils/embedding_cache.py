@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from typing import List, Optional, Sequence
+
+from utils.ttl_cache import TTLCache
+
+DEFAULT_EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFKC with runs of whitespace collapsed and the ends stripped.
+
+    Case is kept: embedding models are case-sensitive, so lowercasing would
+    return a vector the endpoint never produced for that text.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier cache of embedding vectors keyed by model and normalized text hash.
+
+    Lookups go to an in-process LRU of `maxsize` vectors first, then, if
+    `db_path` is set, to a SQLite file that survives restarts. Vectors are
+    stored as float32, which is what the embedding models produce, so a
+    1024-dimensional vector takes 4 KB. The file keeps the `max_rows` most
+    recently written vectors.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        maxsize: int = 1024,
+        max_rows: int = 100_000,
+    ):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self._memory = TTLCache(ttl=float("inf"), maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.db_path:
+            db = sqlite3.connect(self.db_path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT, digest TEXT, vector BLOB, written REAL, "
+                "PRIMARY KEY (model, digest))"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_written ON embeddings (written)"
+            )
+            self._db = db
+        return self._db
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, text_hash(text))
+        vector = self._memory.get(key)
+        if vector is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return vector.tolist()
+        with self._lock:
+            db = self._connection()
+            row = (
+                db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND digest = ?", key
+                ).fetchone()
+                if db
+                else None
+            )
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        vector = array("f")
+        vector.frombytes(row[0])
+        self._memory.set(key, vector)
+        return vector.tolist()
+
+    def put(self, model: str, text: str, embedding: Sequence[float]):
+        key = (model, text_hash(text))
+        vector = array("f", embedding)
+        self._memory.set(key, vector)
+        with self._lock:
+            db = self._connection()
+            if db is None:
+                return
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                    (*key, vector.tobytes(), time.time()),
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    db.execute(
+                        "DELETE FROM embeddings WHERE written <= ("
+                        "SELECT written FROM embeddings ORDER BY written DESC "
+                        "LIMIT 1 OFFSET ?)",
+                        (self.max_rows,),
+                    )
+
+    def stats(self) -> dict:
+        with self._lock:
+            db = self._connection()
+            rows = (
+                db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] if db else 0
+            )
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": rows,
+            }
+
+    def clear(self):
+        self._memory.clear()
+        with self._lock:
+            db = self._connection()
+            if db:
+                with db:
+                    db.execute("DELETE FROM embeddings")
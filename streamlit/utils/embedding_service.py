@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from utils.embedding_cache import EmbeddingCache, normalize_text
+
+DEFAULT_EMBEDDING_MODEL = "databricks-gte-large-en"
+
+
+def pack_batches(
+    texts: Sequence[str], max_batch_size: int, max_batch_chars: int
+) -> List[List[int]]:
+    """Group text positions into batches of at most `max_batch_size` texts and `max_batch_chars` characters.
+
+    A text longer than `max_batch_chars` gets a batch of its own; the
+    endpoint truncates or rejects it as it would on its own.
+    """
+    batches, batch, chars = [], [], 0
+    for i, text in enumerate(texts):
+        if batch and (
+            len(batch) == max_batch_size or chars + len(text) > max_batch_chars
+        ):
+            batches.append(batch)
+            batch, chars = [], 0
+        batch.append(i)
+        chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingService:
+    """Embeds many texts with batched, concurrent requests to an embedding endpoint.
+
+    `embed(texts)` returns a float32 matrix with one row per text, in input
+    order. Texts are looked up in the optional `EmbeddingCache` first;
+    repeated texts are sent once, and the rest are packed into requests of
+    at most `max_batch_size` inputs and `max_batch_chars` characters that
+    run `max_workers` at a time on `client`, an OpenAI client from
+    `w.serving_endpoints.get_open_ai_client()`.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        cache: EmbeddingCache = None,
+        max_batch_size: int = 64,
+        max_batch_chars: int = 100_000,
+        max_workers: int = 4,
+    ):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="embedding-service"
+        )
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        data = sorted(response.data, key=lambda item: item.index)
+        if len(data) != len(texts):
+            raise ValueError(
+                f"{self.model} returned {len(data)} embeddings for {len(texts)} inputs"
+            )
+        return [item.embedding for item in data]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """A `(len(texts), dimension)` float32 matrix of the texts' embeddings."""
+        rows: List[np.ndarray] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            cached = self.cache.get(self.model, text) if self.cache else None
+            if cached is not None:
+                rows[i] = np.asarray(cached, dtype=np.float32)
+            else:
+                missing.setdefault(normalize_text(text), []).append(i)
+
+        unique = list(missing)
+        batches = pack_batches(unique, self.max_batch_size, self.max_batch_chars)
+        futures = [
+            self._pool.submit(self._request, [unique[j] for j in batch])
+            for batch in batches
+        ]
+        for batch, future in zip(batches, futures):
+            for j, embedding in zip(batch, future.result()):
+                if self.cache:
+                    self.cache.put(self.model, unique[j], embedding)
+                vector = np.asarray(embedding, dtype=np.float32)
+                for i in missing[unique[j]]:
+                    rows[i] = vector
+
+        if not rows:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(rows)
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
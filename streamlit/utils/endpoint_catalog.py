@@ -0,0 +1,291 @@
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.service.serving import (
+    ChatMessage,
+    ChatMessageRole,
+    EndpointStateConfigUpdate,
+    EndpointStateReady,
+    ServingEndpoint,
+)
+
+from utils.ttl_cache import TTLCache
+
+# Request field expected by each Model Serving task type.
+TASK_REQUEST_FORMATS = {
+    "llm/v1/chat": "messages",
+    "llm/v1/completions": "prompt",
+    "llm/v1/embeddings": "input",
+}
+LLM_REQUEST_FORMATS = ("messages", "prompt", "input")
+TABULAR_REQUEST_FORMATS = (
+    "dataframe_records",
+    "dataframe_split",
+    "instances",
+    "inputs",
+)
+
+# Python types accepted for each JSON schema type of a signature column.
+JSON_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    type: Optional[str] = None
+    required: bool = True
+
+
+@dataclass
+class ServedEntity:
+    name: str
+    entity_name: Optional[str] = None
+    entity_version: Optional[str] = None
+    model: Optional[str] = None
+
+    def describe(self) -> str:
+        if self.model:
+            return f"{self.name} ({self.model})"
+        if self.entity_name:
+            return f"{self.name} ({self.entity_name} v{self.entity_version})"
+        return self.name
+
+
+@dataclass
+class EndpointSchema:
+    """Request fields and, for tabular models, the columns of the model signature."""
+
+    formats: List[str] = field(default_factory=list)
+    columns: Optional[List[ColumnSpec]] = None
+
+    def example(self) -> str:
+        """Placeholder `dataframe_records` input built from the signature."""
+        samples = {"string": "a", "integer": 1, "boolean": True, "number": 1.5}
+        return json.dumps(
+            {c.name: [samples.get(c.type, 1.5)] for c in self.columns or []}
+        )
+
+
+@dataclass
+class EndpointInfo:
+    name: str
+    task: Optional[str] = None
+    ready: bool = False
+    state: str = "UNKNOWN"
+    served_entities: List[ServedEntity] = field(default_factory=list)
+
+    @property
+    def is_llm(self) -> bool:
+        return self.request_format() in LLM_REQUEST_FORMATS
+
+    def request_format(self, schema: EndpointSchema = None) -> str:
+        """The request field to send: by task type, then by the endpoint's schema."""
+        if self.task in TASK_REQUEST_FORMATS:
+            return TASK_REQUEST_FORMATS[self.task]
+        if any(entity.model for entity in self.served_entities):
+            return "messages"
+        for request_format in TABULAR_REQUEST_FORMATS:
+            if schema and request_format in schema.formats:
+                return request_format
+        return "dataframe_records"
+
+
+def endpoint_info(endpoint: ServingEndpoint) -> EndpointInfo:
+    state = endpoint.state
+    ready = bool(state and state.ready == EndpointStateReady.READY)
+    state_text = state.ready.value if state and state.ready else "UNKNOWN"
+    if state and state.config_update not in (
+        None,
+        EndpointStateConfigUpdate.NOT_UPDATING,
+    ):
+        state_text += f" ({state.config_update.value})"
+
+    entities = []
+    for entity in (endpoint.config.served_entities if endpoint.config else None) or []:
+        model = entity.foundation_model or entity.external_model
+        entities.append(
+            ServedEntity(
+                name=entity.name,
+                entity_name=entity.entity_name,
+                entity_version=entity.entity_version,
+                model=model.name if model else None,
+            )
+        )
+    return EndpointInfo(
+        name=endpoint.name,
+        task=endpoint.task,
+        ready=ready,
+        state=state_text,
+        served_entities=entities,
+    )
+
+
+def _resolve(spec: dict, node: Any) -> dict:
+    """Follow a local `$ref` (`#/components/schemas/...`) in an OpenAPI document."""
+    while isinstance(node, dict) and "$ref" in node:
+        target = spec
+        for part in node["$ref"].lstrip("#/").split("/"):
+            target = target.get(part, {})
+        node = target
+    return node if isinstance(node, dict) else {}
+
+
+def parse_openapi(spec: dict) -> EndpointSchema:
+    """Extract request fields and signature columns from an endpoint's OpenAPI schema."""
+    schema = EndpointSchema()
+    for path in (spec.get("paths") or {}).values():
+        body = _resolve(spec, (path.get("post") or {}).get("requestBody"))
+        content = (body.get("content") or {}).get("application/json") or {}
+        request = _resolve(spec, content.get("schema"))
+        for option in request.get("oneOf") or request.get("anyOf") or [request]:
+            option = _resolve(spec, option)
+            for name, prop in (option.get("properties") or {}).items():
+                if name not in schema.formats:
+                    schema.formats.append(name)
+                if name == "dataframe_records" and schema.columns is None:
+                    items = _resolve(spec, _resolve(spec, prop).get("items"))
+                    required = set(items.get("required") or [])
+                    schema.columns = [
+                        ColumnSpec(
+                            name=column,
+                            type=_resolve(spec, column_schema).get("type"),
+                            required=column in required,
+                        )
+                        for column, column_schema in (
+                            items.get("properties") or {}
+                        ).items()
+                    ]
+    return schema
+
+
+def records_to_rows(value: Any) -> List[Dict[str, Any]]:
+    """Rows of a `dataframe_records` input given as row objects or column lists."""
+    if isinstance(value, dict):
+        columns = list(value.values())
+        if not all(isinstance(column, list) for column in columns):
+            raise ValueError("Every column must be a list of values")
+        if len({len(column) for column in columns}) > 1:
+            raise ValueError("All columns must have the same number of values")
+        return [dict(zip(value.keys(), row)) for row in zip(*columns)]
+    if isinstance(value, list) and all(isinstance(row, dict) for row in value):
+        return value
+    raise ValueError("Input must be a list of records or an object of column lists")
+
+
+def validate_records(value: Any, schema: EndpointSchema = None) -> List[str]:
+    """Problems with a `dataframe_records` input, checked locally before sending.
+
+    `value` may be a list of row objects or an object of column lists. Column
+    names and JSON types are checked against the model signature if known.
+    """
+    try:
+        rows = records_to_rows(value)
+    except ValueError as e:
+        return [str(e)]
+    if not rows:
+        return ["Input contains no rows"]
+    if not schema or schema.columns is None:
+        return []
+
+    problems = []
+    expected = {column.name: column for column in schema.columns}
+    present = set().union(*(row.keys() for row in rows))
+    for column in schema.columns:
+        if column.required and column.name not in present:
+            problems.append(f"Missing required column `{column.name}`")
+    for name in sorted(present - expected.keys()):
+        problems.append(f"Unknown column `{name}`")
+    for i, row in enumerate(rows, start=1):
+        for name, item in row.items():
+            column = expected.get(name)
+            types = JSON_TYPES.get(column.type) if column else None
+            if item is None or types is None:
+                continue
+            if not isinstance(item, types) or (
+                isinstance(item, bool) and bool not in types
+            ):
+                problems.append(
+                    f"Row {i}: `{name}` should be {column.type}, got {type(item).__name__}"
+                )
+    return problems[:20]
+
+
+def llm_request(
+    request_format: str,
+    prompt: str,
+    temperature: float = None,
+    system_prompt: str = "You are a helpful assistant.",
+) -> Dict[str, Any]:
+    """`w.serving_endpoints.query` arguments for a prompt in the endpoint's format."""
+    if request_format == "input":
+        return {"input": prompt}
+    if request_format == "prompt":
+        return {"prompt": prompt, "temperature": temperature}
+    return {
+        "messages": [
+            ChatMessage(role=ChatMessageRole.SYSTEM, content=system_prompt),
+            ChatMessage(role=ChatMessageRole.USER, content=prompt),
+        ],
+        "temperature": temperature,
+    }
+
+
+class EndpointCatalog:
+    """Serving endpoints of the workspace, refreshed every `ttl` seconds.
+
+    One `w.serving_endpoints.list()` call describes every endpoint's task,
+    state and served entities. The OpenAPI schema with the model signature
+    costs one request per endpoint, so it is only loaded when an endpoint is
+    selected, and cached for `ttl` seconds as well.
+    """
+
+    def __init__(self, w: WorkspaceClient, ttl: float = 300):
+        self.w = w
+        self._endpoints = TTLCache(ttl=ttl, maxsize=1)
+        self._schemas = TTLCache(ttl=ttl)
+        self._lock = threading.Lock()
+
+    def endpoints(self) -> Dict[str, EndpointInfo]:
+        with self._lock:
+            endpoints = self._endpoints.get("endpoints")
+            if endpoints is None:
+                endpoints = {
+                    endpoint.name: endpoint_info(endpoint)
+                    for endpoint in self.w.serving_endpoints.list()
+                }
+                self._endpoints.set("endpoints", endpoints)
+            return endpoints
+
+    def names(self) -> List[str]:
+        return list(self.endpoints())
+
+    def get(self, name: str) -> Optional[EndpointInfo]:
+        return self.endpoints().get(name)
+
+    def schema(self, name: str) -> EndpointSchema:
+        """The endpoint's request schema; empty if it can't be read."""
+        schema = self._schemas.get(name)
+        if schema is None:
+            try:
+                response = self.w.serving_endpoints.get_open_api(name)
+                schema = parse_openapi(json.loads(response.contents.read()))
+                self._schemas.set(name, schema)
+            except Exception:
+                # Don't retry on every rerun, but don't hide a fixed endpoint for long.
+                schema = EndpointSchema()
+                self._schemas.set(name, schema, ttl=30)
+        return schema
+
+    def refresh(self):
+        self._endpoints.clear()
+        self._schemas.clear()
@@ -0,0 +1,98 @@
+import time
+from typing import Dict, Iterator, List, Optional, Set
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+# Endpoints that rejected `stream_options`; they are streamed without usage.
+_NO_STREAM_OPTIONS: Set[str] = set()
+
+
+def chat_messages(
+    prompt: str, system_prompt: str = SYSTEM_PROMPT
+) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+
+class ChatStream:
+    """Streams a chat completion from a serving endpoint, one content delta at a time.
+
+    `client` is the OpenAI-compatible client returned by
+    `w.serving_endpoints.get_open_ai_client()`. Iterating yields text as soon
+    as the endpoint produces it; afterwards `text`, `time_to_first_token`,
+    `elapsed`, `finish_reason` and `usage` describe the whole response.
+    Usage is requested with `stream_options`; an endpoint that rejects the
+    option is streamed without it, and `usage` then stays None.
+    """
+
+    def __init__(
+        self,
+        client,
+        endpoint_name: str,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+    ):
+        self.client = client
+        self.endpoint_name = endpoint_name
+        self.messages = messages
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.text = ""
+        self.time_to_first_token: Optional[float] = None
+        self.elapsed: Optional[float] = None
+        self.finish_reason: Optional[str] = None
+        self.usage = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        kwargs = {"temperature": self.temperature, "max_tokens": self.max_tokens}
+        kwargs = {key: value for key, value in kwargs.items() if value is not None}
+        if self.endpoint_name in _NO_STREAM_OPTIONS:
+            stream = self._create(**kwargs)
+        else:
+            try:
+                stream = self._create(stream_options={"include_usage": True}, **kwargs)
+            except Exception as e:
+                if getattr(e, "status_code", None) not in (400, 422):
+                    raise
+                # Remembered only once the request succeeds without the option.
+                stream = self._create(**kwargs)
+                _NO_STREAM_OPTIONS.add(self.endpoint_name)
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    self.usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    self.finish_reason = choice.finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if delta:
+                    if self.time_to_first_token is None:
+                        self.time_to_first_token = time.perf_counter() - start
+                    self.text += delta
+                    yield delta
+        finally:
+            stream.close()
+            self.elapsed = time.perf_counter() - start
+
+    def _create(self, **kwargs):
+        return self.client.chat.completions.create(
+            model=self.endpoint_name, messages=self.messages, stream=True, **kwargs
+        )
+
+    def stats(self) -> dict:
+        return {
+            "time_to_first_token": (
+                None
+                if self.time_to_first_token is None
+                else round(self.time_to_first_token, 3)
+            ),
+            "elapsed": None if self.elapsed is None else round(self.elapsed, 3),
+            "finish_reason": self.finish_reason,
+            "completion_tokens": self.usage.completion_tokens if self.usage else None,
+        }
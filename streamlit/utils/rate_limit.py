@@ -0,0 +1,48 @@
+import threading
+import time
+from typing import Dict
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` calls per second with bursts of up to `burst`.
+
+    `acquire()` blocks until a token is available, so worker threads sharing a
+    limiter are spread out evenly instead of hitting the endpoint at once.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def endpoint_rate_limiter(endpoint_name: str, rate: float) -> RateLimiter:
+    """Process-wide limiter for `endpoint_name`, shared by every caller of that endpoint.
+
+    The limiter is recreated if a different `rate` is requested.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(endpoint_name)
+        if limiter is None or limiter.rate != rate:
+            limiter = _limiters[endpoint_name] = RateLimiter(rate)
+        return limiter
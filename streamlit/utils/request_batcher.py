@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import BadRequest
+from databricks.sdk.service.serving import DataframeSplitInput, QueryEndpointResponse
+
+from utils.batch_scoring import is_payload_too_large
+from utils.endpoint_catalog import records_to_rows
+
+
+def is_input_error(e: Exception) -> bool:
+    """True for errors caused by the request body: 400s and payloads that are too large."""
+    return isinstance(e, BadRequest) or is_payload_too_large(e)
+
+
+@dataclass
+class _Pending:
+    rows: List[Dict[str, Any]]
+    future: Future
+
+
+class RequestBatcher:
+    """Coalesces concurrent scoring requests to an endpoint into `dataframe_split` calls.
+
+    Each endpoint gets a collector thread. The first queued request opens a
+    batch and every request for the same endpoint that arrives within
+    `max_wait` seconds joins it, up to `max_batch_rows` rows. Requests with
+    the same columns are sent as one call, built directly from the records
+    so that values keep their types, and the predictions are sliced back to
+    their callers. If a combined call is rejected as bad input or returns an
+    unexpected number of predictions, its requests are retried one by one so
+    a single bad input can't fail the others; any other error (throttling,
+    5xx, timeouts) is passed to every caller in the call. Calls go through the optional
+    `ResilientInvoker` for timeouts, hedging and retries.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        max_wait: float = 0.005,
+        max_batch_rows: int = 1000,
+        max_workers: int = 8,
+        invoker=None,
+    ):
+        self.w = w
+        self.invoker = invoker
+        self.max_wait = max_wait
+        self.max_batch_rows = max_batch_rows
+        self._queues: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="request-batcher"
+        )
+        self.requests = 0
+        self.calls = 0
+
+    def submit(self, endpoint_name: str, records: Any) -> Future:
+        """Queue `dataframe_records` input; the future resolves to the caller's response."""
+        pending = _Pending(rows=records_to_rows(records), future=Future())
+        if not pending.rows:
+            raise ValueError("Input contains no rows")
+        with self._lock:
+            self.requests += 1
+        self._queue(endpoint_name).put(pending)
+        return pending.future
+
+    def predict(
+        self, endpoint_name: str, records: Any, timeout: float = None
+    ) -> QueryEndpointResponse:
+        return self.submit(endpoint_name, records).result(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "calls": self.calls}
+
+    def _queue(self, endpoint_name: str) -> queue.Queue:
+        with self._lock:
+            pending = self._queues.get(endpoint_name)
+            if pending is None:
+                pending = self._queues[endpoint_name] = queue.Queue()
+                threading.Thread(
+                    target=self._collect,
+                    args=(endpoint_name, pending),
+                    name=f"request-batcher-{endpoint_name}",
+                    daemon=True,
+                ).start()
+            return pending
+
+    def _collect(self, endpoint_name: str, pending: queue.Queue):
+        while True:
+            batch = [pending.get()]
+            rows = len(batch[0].rows)
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item.rows)
+
+            groups: Dict[tuple, List[_Pending]] = {}
+            for item in batch:
+                columns = tuple(sorted(set().union(*(row.keys() for row in item.rows))))
+                groups.setdefault(columns, []).append(item)
+            for group in groups.values():
+                self._pool.submit(self._send, endpoint_name, group)
+
+    def _send(self, endpoint_name: str, group: List[_Pending]):
+        try:
+            self._call(endpoint_name, group)
+        except BaseException as e:
+            for item in group:
+                if not item.future.done():
+                    item.future.set_exception(e)
+
+    def _call(self, endpoint_name: str, group: List[_Pending]):
+        rows = [row for item in group for row in item.rows]
+        with self._lock:
+            self.calls += 1
+        columns = sorted(set().union(*(row.keys() for row in rows)))
+        request = {
+            "dataframe_split": DataframeSplitInput(
+                columns=columns,
+                data=[[row.get(column) for column in columns] for row in rows],
+            )
+        }
+        try:
+            if self.invoker:
+                response = self.invoker.query(endpoint_name, idempotent=True, **request)
+            else:
+                response = self.w.serving_endpoints.query(name=endpoint_name, **request)
+        except Exception as e:
+            if len(group) == 1 or not is_input_error(e):
+                raise
+            response = None
+
+        if len(group) == 1:
+            group[0].future.set_result(response)
+            return
+        predictions = response.predictions if response else None
+        if not isinstance(predictions, list) or len(predictions) != len(rows):
+            for item in group:
+                self._send(endpoint_name, [item])
+            return
+
+        offset = 0
+        for item in group:
+            item.future.set_result(
+                QueryEndpointResponse(
+                    predictions=predictions[offset : offset + len(item.rows)],
+                    served_model_name=response.served_model_name,
+                )
+            )
+            offset += len(item.rows)
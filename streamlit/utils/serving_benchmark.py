@@ -0,0 +1,393 @@
+"""Latency and throughput benchmark for Model Serving endpoints.
+
+Sweeps concurrency levels and payload sizes through the same
+`w.serving_endpoints.query` call the invoke recipe uses (or the streaming
+chat client for `--mode stream`) and reports latency percentiles,
+throughput, error rate and time to first token. `--stub` runs against a
+local stand-in server instead of a workspace, e.g. in CI:
+
+    python -m utils.serving_benchmark --endpoint my-model --concurrency 1,8,32 --sizes 1,100,1000
+    python -m utils.serving_benchmark --stub --mode stream --concurrency 1,4 --sizes 16,256
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from databricks.sdk import WorkspaceClient
+
+from utils.endpoint_catalog import llm_request
+from utils.llm_stream import ChatStream, chat_messages
+from utils.stats import percentile
+
+MODES = ("dataframe", "chat", "stream")
+DEFAULT_RECORD = {"feature1": 1.5, "feature2": 2.5}
+
+
+@dataclass
+class BenchmarkResult:
+    mode: str
+    concurrency: int
+    payload_size: int
+    requests: int
+    errors: int
+    elapsed: float
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    latency_p99: Optional[float] = None
+    ttft_p50: Optional[float] = None
+    ttft_p95: Optional[float] = None
+    first_error: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second."""
+        return (self.requests - self.errors) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "throughput": round(self.throughput, 2),
+            "error_rate": round(self.error_rate, 4),
+        }
+
+
+class ServingBenchmark:
+    """Measures an endpoint under increasing load.
+
+    `payload_size` means rows per request in `dataframe` mode (copies of
+    `record`) and prompt length in words in `chat` and `stream` mode. Each
+    level sends `requests` calls from `concurrency` threads after `warmup`
+    unmeasured calls.
+    """
+
+    def __init__(
+        self,
+        w: WorkspaceClient,
+        endpoint_name: str,
+        mode: str = "dataframe",
+        requests: int = 50,
+        warmup: int = 2,
+        record: Dict = None,
+        max_tokens: int = 64,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.w = w
+        self.endpoint_name = endpoint_name
+        self.mode = mode
+        self.requests = requests
+        self.warmup = warmup
+        self.record = record or DEFAULT_RECORD
+        self.max_tokens = max_tokens
+        self._openai_client = None
+
+    def _prompt(self, words: int) -> str:
+        return "Summarize the following words: " + " ".join(["databricks"] * words)
+
+    def _call(self, payload_size: int) -> Optional[float]:
+        """Send one request; return its time to first token when streaming."""
+        if self.mode == "stream":
+            if self._openai_client is None:
+                self._openai_client = self.w.serving_endpoints.get_open_ai_client()
+            stream = ChatStream(
+                self._openai_client,
+                self.endpoint_name,
+                chat_messages(self._prompt(payload_size)),
+                temperature=0.0,
+                max_tokens=self.max_tokens,
+            )
+            for _ in stream:
+                pass
+            return stream.time_to_first_token
+        if self.mode == "chat":
+            request = llm_request("messages", self._prompt(payload_size), 0.0)
+            request["max_tokens"] = self.max_tokens
+        else:
+            request = {"dataframe_records": [self.record] * payload_size}
+        self.w.serving_endpoints.query(name=self.endpoint_name, **request)
+        return None
+
+    def _timed_call(self, payload_size: int):
+        start = time.perf_counter()
+        try:
+            ttft = self._call(payload_size)
+            return time.perf_counter() - start, ttft, None
+        except Exception as e:
+            return time.perf_counter() - start, None, str(e)
+
+    def run_level(self, concurrency: int, payload_size: int) -> BenchmarkResult:
+        for _ in range(self.warmup):
+            self._timed_call(payload_size)
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="serving-benchmark"
+        ) as pool:
+            start = time.perf_counter()
+            outcomes = list(pool.map(self._timed_call, [payload_size] * self.requests))
+            elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, _, error in outcomes if error is None]
+        ttfts = [ttft for _, ttft, error in outcomes if error is None and ttft]
+        errors = [error for _, _, error in outcomes if error is not None]
+
+        def rounded(value):
+            return None if value is None else round(value, 4)
+
+        return BenchmarkResult(
+            mode=self.mode,
+            concurrency=concurrency,
+            payload_size=payload_size,
+            requests=len(outcomes),
+            errors=len(errors),
+            elapsed=round(elapsed, 3),
+            latency_p50=rounded(percentile(latencies, 50)),
+            latency_p95=rounded(percentile(latencies, 95)),
+            latency_p99=rounded(percentile(latencies, 99)),
+            ttft_p50=rounded(percentile(ttfts, 50)),
+            ttft_p95=rounded(percentile(ttfts, 95)),
+            first_error=errors[0] if errors else None,
+        )
+
+    def sweep(
+        self,
+        concurrency_levels: List[int],
+        payload_sizes: List[int],
+        on_result: Callable[[BenchmarkResult], None] = None,
+    ) -> List[BenchmarkResult]:
+        """Run every combination of payload size and concurrency level."""
+        results = []
+        for payload_size in payload_sizes:
+            for concurrency in concurrency_levels:
+                result = self.run_level(concurrency, payload_size)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        return results
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _completion(self, request: dict) -> dict:
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "stub " * self._tokens},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(json.dumps(request)) // 4,
+                "completion_tokens": self._tokens,
+                "total_tokens": len(json.dumps(request)) // 4 + self._tokens,
+            },
+        }
+
+    def _stream(self, request: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = {
+            "id": "stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+        }
+        for i in range(self._tokens):
+            time.sleep(self.server.token_interval)
+            delta = {"index": 0, "delta": {"content": "stub "}, "finish_reason": None}
+            if i == self._tokens - 1:
+                delta["finish_reason"] = "stop"
+            self.wfile.write(
+                f"data: {json.dumps({**chunk, 'choices': [delta]})}\n\n".encode()
+            )
+            self.wfile.flush()
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage = self._completion(request)["usage"]
+            self.wfile.write(
+                f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage})}\n\n".encode()
+            )
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        request = json.loads(body or b"{}")
+        server = self.server
+        self._tokens = min(request.get("max_tokens") or server.tokens, server.tokens)
+
+        time.sleep(server.latency + len(body) * server.seconds_per_byte)
+        if random.random() < server.error_rate:
+            return self._send_json(
+                500, {"error_code": "INTERNAL_ERROR", "message": "Injected failure"}
+            )
+
+        if self.path == "/serving-endpoints/chat/completions":
+            if request.get("stream"):
+                return self._stream(request)
+            return self._send_json(200, self._completion(request))
+        if re.fullmatch(r"/serving-endpoints/[^/]+/invocations", self.path):
+            if "messages" in request or "prompt" in request:
+                return self._send_json(200, self._completion(request))
+            records = request.get("dataframe_records") or []
+            if isinstance(records, dict):
+                records = list(zip(*records.values()))
+            rows = len(records) or len(
+                (request.get("dataframe_split") or {}).get("data") or []
+            )
+            return self._send_json(200, {"predictions": [0.5] * rows})
+        self._send_json(
+            404, {"error_code": "NOT_FOUND", "message": f"No route {self.path}"}
+        )
+
+
+class StubServingServer:
+    """Local stand-in for Model Serving, for benchmarking without a workspace.
+
+    Answers `/serving-endpoints/<name>/invocations` and the OpenAI-compatible
+    `/serving-endpoints/chat/completions` (including streaming) after a fixed
+    `latency` plus `seconds_per_byte` of request body, emits `tokens` chunks
+    `token_interval` apart when streaming, and fails `error_rate` of requests.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        seconds_per_byte: float = 1e-8,
+        tokens: int = 32,
+        token_interval: float = 0.002,
+        error_rate: float = 0.0,
+    ):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.latency = latency
+        self._server.seconds_per_byte = seconds_per_byte
+        self._server.tokens = tokens
+        self._server.token_interval = token_interval
+        self._server.error_rate = error_rate
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="serving-stub", daemon=True
+        )
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def workspace_client(self) -> WorkspaceClient:
+        return WorkspaceClient(host=self.host, token="stub", auth_type="pat")
+
+    def __enter__(self) -> "StubServingServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoint", default="stub-model")
+    parser.add_argument("--mode", choices=MODES, default="dataframe")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    parser.add_argument(
+        "--sizes",
+        type=_int_list,
+        default=[1, 100],
+        help="Rows per request (dataframe) or prompt words (chat, stream)",
+    )
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument(
+        "--record", type=json.loads, help="JSON object used as every input row"
+    )
+    parser.add_argument(
+        "--stub", action="store_true", help="Benchmark a local stand-in server"
+    )
+    parser.add_argument("--stub-latency", type=float, default=0.02)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Append results to this JSONL file")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        stub = (
+            stack.enter_context(
+                StubServingServer(
+                    latency=args.stub_latency, error_rate=args.stub_error_rate
+                )
+            )
+            if args.stub
+            else None
+        )
+        benchmark = ServingBenchmark(
+            stub.workspace_client() if stub else WorkspaceClient(),
+            args.endpoint,
+            mode=args.mode,
+            requests=args.requests,
+            warmup=args.warmup,
+            record=args.record,
+            max_tokens=args.max_tokens,
+        )
+        print(
+            f"{'size':>6} {'conc':>5} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} "
+            f"{'req/s':>8} {'errors':>7} {'ttft p50':>9}"
+        )
+
+        def report(result: BenchmarkResult):
+            def fmt(value):
+                return "-" if value is None else f"{value:.3f}"
+
+            print(
+                f"{result.payload_size:>6} {result.concurrency:>5} "
+                f"{fmt(result.latency_p50):>8} {fmt(result.latency_p95):>8} "
+                f"{fmt(result.latency_p99):>8} {result.throughput:>8.1f} "
+                f"{result.error_rate:>7.1%} {fmt(result.ttft_p50):>9}",
+                flush=True,
+            )
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps(result.to_dict()) + "\n")
+
+        results = benchmark.sweep(args.concurrency, args.sizes, on_result=report)
+    errors = [r.first_error for r in results if r.first_error]
+    if errors:
+        print(f"First error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Callable, Iterator, List, Optional
+
+UPLOAD = "upload"
+DOWNLOAD = "download"
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_METRICS_FILE = os.getenv("TRANSFER_METRICS_FILE", ".transfer_metrics.jsonl")
+
+
+@dataclass
+class TransferStats:
+    direction: str
+    path: str
+    total_bytes: Optional[int] = None
+    bytes_transferred: int = 0
+    status: str = "running"
+    error: Optional[str] = None
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    transfer_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Bytes per second since the transfer started."""
+        elapsed = self.elapsed
+        return self.bytes_transferred / elapsed if elapsed > 0 else None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total_bytes:
+            return None
+        return min(self.bytes_transferred / self.total_bytes, 1.0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the current throughput, if the total size is known."""
+        throughput = self.throughput
+        if self.total_bytes is None or not throughput:
+            return None
+        return max(self.total_bytes - self.bytes_transferred, 0) / throughput
+
+    def describe(self) -> str:
+        """Short progress line, e.g. `12.0 / 48.0 MB at 9.6 MB/s, 4 s left`."""
+        text = f"{self.bytes_transferred / 1e6:.1f}"
+        if self.total_bytes is not None:
+            text += f" / {self.total_bytes / 1e6:.1f}"
+        text += " MB"
+        if self.throughput:
+            text += f" at {self.throughput / 1e6:.1f} MB/s"
+        if self.status == "running" and self.eta is not None:
+            text += f", {self.eta:.0f} s left"
+        return text
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        record.update(
+            elapsed=round(self.elapsed, 3),
+            throughput=round(self.throughput or 0.0),
+            fraction=self.fraction,
+            eta=None if self.eta is None else round(self.eta, 1),
+        )
+        return record
+
+
+class ProgressReader:
+    """Wraps a binary stream and counts the bytes read through it.
+
+    Seeking is passed through when the wrapped stream supports it, so the SDK
+    can still rewind and retry an upload; the byte count follows the stream
+    position. `on_progress(stats)` is called at most every `min_interval`
+    seconds and once more at EOF.
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        stats: TransferStats,
+        on_progress: Callable[[TransferStats], None] = None,
+        min_interval: float = 0.25,
+    ):
+        self._stream = stream
+        self.stats = stats
+        self._on_progress = on_progress
+        self._min_interval = min_interval
+        self._last_report = 0.0
+
+    def _report(self, force: bool = False):
+        now = time.monotonic()
+        if self._on_progress and (
+            force or now - self._last_report >= self._min_interval
+        ):
+            self._last_report = now
+            self._on_progress(self.stats)
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self.stats.bytes_transferred += len(chunk)
+        self._report(force=not chunk or size is None or size < 0)
+        return chunk
+
+    def seekable(self) -> bool:
+        return getattr(self._stream, "seekable", lambda: False)()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        position = self._stream.seek(offset, whence)
+        self.stats.bytes_transferred = self._stream.tell()
+        return position
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+    def close(self):
+        self._stream.close()
+
+
+@dataclass
+class Transfer:
+    """Handle yielded by `TransferTracker.track`."""
+
+    stats: TransferStats
+    on_progress: Optional[Callable[[TransferStats], None]] = None
+    skipped: bool = False
+
+    def wrap(self, stream: BinaryIO) -> ProgressReader:
+        return ProgressReader(stream, self.stats, self.on_progress)
+
+    def skip(self):
+        """Record the transfer as skipped, e.g. because the target is unchanged."""
+        self.skipped = True
+
+
+class TransferTracker:
+    """Keeps live and recent transfer stats and appends finished ones to a metrics log.
+
+    Each finished transfer is written as one JSON line to `metrics_file`, so
+    throughput can be analysed later; pass `metrics_file=None` to keep the
+    stats in memory only. The last `history` transfers stay queryable for
+    UIs that poll for progress.
+    """
+
+    def __init__(
+        self, metrics_file: Optional[str] = DEFAULT_METRICS_FILE, history: int = 200
+    ):
+        self.metrics_file = metrics_file
+        self.history = history
+        self._transfers: "OrderedDict[str, TransferStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(
+        self, direction: str, path: str, total_bytes: int = None
+    ) -> TransferStats:
+        stats = TransferStats(direction=direction, path=path, total_bytes=total_bytes)
+        with self._lock:
+            self._transfers[stats.transfer_id] = stats
+            while len(self._transfers) > self.history:
+                oldest = next(iter(self._transfers))
+                if self._transfers[oldest].status == "running":
+                    break
+                self._transfers.popitem(last=False)
+        return stats
+
+    def finish(
+        self, stats: TransferStats, error: BaseException = None, skipped: bool = False
+    ):
+        stats.finished = time.time()
+        if error is not None:
+            stats.status = "failed"
+        elif skipped:
+            stats.status = "skipped"
+            stats.bytes_transferred = 0
+        else:
+            stats.status = "done"
+        stats.error = None if error is None else str(error)
+        if self.metrics_file:
+            line = json.dumps(stats.to_dict()) + "\n"
+            with self._lock:
+                with open(self.metrics_file, "a") as f:
+                    f.write(line)
+
+    @contextmanager
+    def track(
+        self,
+        direction: str,
+        path: str,
+        total_bytes: int = None,
+        on_progress: Callable[[TransferStats], None] = None,
+    ) -> Iterator[Transfer]:
+        """Track one transfer; wrap the stream handed to `w.files` with `transfer.wrap`.
+
+        with tracker.track(UPLOAD, path, size) as transfer:
+            w.files.upload(path, transfer.wrap(stream), overwrite=True)
+        """
+        stats = self.start(direction, path, total_bytes)
+        transfer = Transfer(stats, on_progress)
+        try:
+            yield transfer
+        except BaseException as e:
+            self.finish(stats, e)
+            raise
+        self.finish(stats, skipped=transfer.skipped)
+        if on_progress:
+            on_progress(stats)
+
+    def get(self, transfer_id: str) -> Optional[TransferStats]:
+        with self._lock:
+            return self._transfers.get(transfer_id)
+
+    def active(self) -> List[TransferStats]:
+        with self._lock:
+            return [s for s in self._transfers.values() if s.status == "running"]
+
+    def recent(self, limit: int = 20) -> List[TransferStats]:
+        with self._lock:
+            return list(self._transfers.values())[-limit:][::-1]
+
+
+def stream_size(stream: BinaryIO) -> Optional[int]:
+    """Remaining bytes of a seekable stream, without moving it; None otherwise."""
+    if not getattr(stream, "seekable", lambda: False)():
+        return None
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END) - position
+    stream.seek(position)
+    return size
@@ -0,0 +1,60 @@
+from typing import Optional
+
+from databricks.sdk.service.vectorsearch import VectorIndex
+
+from utils.ttl_cache import TTLCache
+
+
+def _spec(index: VectorIndex):
+    return index.delta_sync_index_spec or index.direct_access_index_spec
+
+
+def computes_embeddings(index: VectorIndex) -> bool:
+    """Whether the index embeds `query_text` itself (managed embeddings)."""
+    spec = _spec(index)
+    return bool(spec and spec.embedding_source_columns)
+
+
+class VectorIndexCatalog:
+    """Vector search index descriptions from `get_index`, cached for `ttl` seconds.
+
+    `indexes` is `w.vector_search_indexes` or a stand-in with the same
+    `get_index` method. An index that can't be read is remembered for 30
+    seconds so every search doesn't pay for the failed lookup.
+    """
+
+    def __init__(self, indexes, ttl: float = 300):
+        self.indexes = indexes
+        self._indexes = TTLCache(ttl=ttl)
+
+    def get(self, index_name: str) -> Optional[VectorIndex]:
+        entry = self._indexes.get(index_name)
+        if entry is None:
+            try:
+                entry = (self.indexes.get_index(index_name),)
+                self._indexes.set(index_name, entry)
+            except Exception:
+                entry = (None,)
+                self._indexes.set(index_name, entry, ttl=30)
+        return entry[0]
+
+    def computes_embeddings(self, index_name: str) -> bool:
+        index = self.get(index_name)
+        return bool(index and computes_embeddings(index))
+
+    def vector_column(self, index_name: str) -> Optional[str]:
+        """The column holding self-managed embedding vectors, if any."""
+        index = self.get(index_name)
+        spec = _spec(index) if index else None
+        columns = spec.embedding_vector_columns if spec else None
+        return columns[0].name if columns else None
+
+    def source_column(self, index_name: str) -> Optional[str]:
+        """The text column a managed-embeddings index embeds, if any."""
+        index = self.get(index_name)
+        spec = _spec(index) if index else None
+        columns = spec.embedding_source_columns if spec else None
+        return columns[0].name if columns else None
+
+    def refresh(self):
+        self._indexes.clear()
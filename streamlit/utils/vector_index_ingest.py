@@ -0,0 +1,440 @@
+"""Embed rows and upsert them to a direct-access vector search index.
+
+Streams a Unity Catalog table (through a SQL warehouse) or a Parquet, CSV
+or JSON file in a volume, embeds the text column with batched requests and
+upserts the rows in size-bounded, concurrent, retried batches. Progress is
+checkpointed, so re-running the same command resumes where it stopped:
+
+    python -m utils.vector_index_ingest --index main.docs.chunks --table main.docs.source --http-path /sql/1.0/warehouses/abc --text-column text
+    python -m utils.vector_index_ingest --index main.docs.chunks --file /Volumes/main/docs/raw/chunks.parquet --text-column text
+"""
+
+import argparse
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import posixpath
+import random
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from databricks import sql
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.core import Config
+from databricks.sdk.service.vectorsearch import UpsertDataStatus, VectorIndexType
+
+from utils.embedding_service import (
+    DEFAULT_EMBEDDING_MODEL,
+    EmbeddingService,
+    pack_batches,
+)
+from utils.parquet_ingest import json_batches
+from utils.resilient_invoke import retry_reason
+from utils.vector_index_catalog import VectorIndexCatalog
+
+DEFAULT_INGEST_DIR = os.getenv("VECTOR_INGEST_DIR", ".vector_ingest")
+
+
+def _native(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def encode_key(value: Any) -> Any:
+    """A JSON form of a primary key that `decode_key` turns back into the same type."""
+    value = _native(value)
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"decimal": str(value)}
+    return value
+
+
+def decode_key(value: Any) -> Any:
+    if isinstance(value, dict):
+        kind, text = next(iter(value.items()))
+        return {
+            "datetime": datetime.datetime.fromisoformat,
+            "date": datetime.date.fromisoformat,
+            "decimal": decimal.Decimal,
+        }[kind](text)
+    return value
+
+
+class TableSource:
+    """Rows of a Unity Catalog table, read through a SQL warehouse in key order.
+
+    `connection` is a `databricks.sql` connection. Rows are read ordered by
+    the index's primary key, so a resumed run starts after the last key of
+    the checkpoint instead of re-reading the table.
+    """
+
+    def __init__(self, connection, table_name: str):
+        self.connection = connection
+        self.table_name = table_name
+        self.key = f"table:{table_name}"
+
+    def batches(
+        self, key_column: str, batch_rows: int, checkpoint: dict
+    ) -> Iterator[pd.DataFrame]:
+        after = decode_key(checkpoint.get("last_key"))
+        where = f" WHERE {key_column} > :after" if after is not None else ""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT * FROM {self.table_name}{where} ORDER BY {key_column}",
+                {"after": after} if after is not None else None,
+            )
+            while True:
+                batch = cursor.fetchmany_arrow(batch_rows)
+                if batch.num_rows == 0:
+                    return
+                yield batch.to_pandas()
+
+
+class VolumeFileSource:
+    """Rows of a Parquet, CSV or JSON file in a Unity Catalog volume.
+
+    The file is downloaded to a temporary file, since Parquet needs random
+    access, and read `batch_rows` at a time; newline-delimited JSON is
+    parsed in blocks, like CSV, so the file is never loaded as a whole. A
+    resumed run skips the rows counted in the checkpoint.
+    """
+
+    def __init__(self, w: WorkspaceClient, file_path: str):
+        self.w = w
+        self.file_path = file_path
+        self.key = f"file:{file_path}"
+
+    def batches(
+        self, key_column: str, batch_rows: int, checkpoint: dict
+    ) -> Iterator[pd.DataFrame]:
+        extension = posixpath.splitext(self.file_path)[1].lower()
+        with tempfile.TemporaryFile() as local:
+            with self.w.files.download(self.file_path).contents as remote:
+                shutil.copyfileobj(remote, local, 1024 * 1024)
+            local.seek(0)
+            if extension == ".parquet":
+                batches = pq.ParquetFile(local).iter_batches(batch_size=batch_rows)
+            elif extension in (".csv", ".tsv"):
+                batches = pa_csv.open_csv(
+                    local,
+                    parse_options=pa_csv.ParseOptions(
+                        delimiter="\t" if extension == ".tsv" else ","
+                    ),
+                )
+            elif extension in (".json", ".jsonl", ".ndjson"):
+                batches = json_batches(local, 4 * 1024 * 1024)
+            else:
+                raise ValueError(f"Unsupported file type `{extension}`")
+            skip = checkpoint.get("rows", 0)
+            for batch in batches:
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                for offset in range(skip, batch.num_rows, batch_rows):
+                    yield batch.slice(offset, batch_rows).to_pandas()
+                skip = 0
+
+
+@dataclass
+class IngestProgress:
+    rows_resumed: int = 0
+    rows_read: int = 0
+    rows_upserted: int = 0
+    rows_failed: int = 0
+    requests: int = 0
+    retries: int = 0
+    embed_seconds: float = 0.0
+    elapsed: float = 0.0
+    failed_keys: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_upserted / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class _Chunk:
+    rows_read: int
+    rows: int
+    last_key: Any
+    futures: list
+
+
+class VectorIndexIngest:
+    """Embeds rows from a table or volume file and upserts them to a direct-access index.
+
+    Rows are read `chunk_rows` at a time and embedded from `text_column`
+    with the batched `EmbeddingService`, unless the source already has the
+    index's vector column. They are upserted with
+    `upsert_data_vector_index` in requests of at most `max_batch_rows` rows
+    and `max_batch_bytes` of JSON, `max_workers` at a time. Throttled or
+    unavailable responses, and rows the index reports as failed, are
+    retried with full-jitter backoff.
+
+    Upserts are idempotent by primary key, so progress is checkpointed as
+    the number of leading rows (and their last key) that were all upserted.
+    Running the same source into the same index again resumes from there.
+    """
+
+    def __init__(
+        self,
+        indexes,
+        embedding_service: EmbeddingService = None,
+        chunk_rows: int = 1000,
+        max_batch_rows: int = 500,
+        max_batch_bytes: int = 4 * 1024 * 1024,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30,
+        checkpoint_dir: str = DEFAULT_INGEST_DIR,
+    ):
+        self.indexes = indexes
+        self.embedding_service = embedding_service
+        self.chunk_rows = chunk_rows
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_bytes = max_batch_bytes
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.checkpoint_dir = checkpoint_dir
+        self.catalog = VectorIndexCatalog(indexes)
+
+    def checkpoint_path(self, index_name: str, source, text_column: str) -> str:
+        key = json.dumps([index_name, source.key, text_column])
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(self.checkpoint_dir, f"{index_name}-{digest}.json")
+
+    @staticmethod
+    def load_checkpoint(path: str) -> dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_checkpoint(path: str, checkpoint: dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _upsert(
+        self, index_name: str, parts: List[str], keys: List[str]
+    ) -> Tuple[List[str], int]:
+        """Upsert JSON rows, retrying throttling and failed rows.
+
+        Returns the keys that still failed and the number of requests sent.
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(
+                    random.uniform(
+                        0, min(self.max_backoff, self.base_backoff * 2**attempt)
+                    )
+                )
+            try:
+                response = self.indexes.upsert_data_vector_index(
+                    index_name, "[" + ",".join(parts) + "]"
+                )
+            except Exception as e:
+                if retry_reason(e) is None or attempt == self.max_retries:
+                    raise
+                continue
+            failed = set(
+                (response.result.failed_primary_keys if response.result else None) or []
+            )
+            if not failed and response.status == UpsertDataStatus.FAILURE:
+                failed = set(keys)
+            if not failed:
+                return [], attempt + 1
+            retry = [(p, k) for p, k in zip(parts, keys) if k in failed]
+            parts, keys = [p for p, _ in retry], [k for _, k in retry]
+        return keys, self.max_retries + 1
+
+    def run(
+        self,
+        index_name: str,
+        source,
+        text_column: str = None,
+        restart: bool = False,
+        on_progress: Callable[[IngestProgress], None] = None,
+    ) -> IngestProgress:
+        index = self.catalog.get(index_name)
+        if index is None:
+            raise ValueError(f"Index {index_name} not found")
+        if index.index_type != VectorIndexType.DIRECT_ACCESS:
+            raise ValueError("Only direct-access indexes accept upserts")
+        spec = index.direct_access_index_spec
+        key_column = index.primary_key
+        vector_column = self.catalog.vector_column(index_name)
+        schema = json.loads(spec.schema_json) if spec and spec.schema_json else None
+
+        path = self.checkpoint_path(index_name, source, text_column)
+        checkpoint = {} if restart else self.load_checkpoint(path)
+        progress = IngestProgress(rows_resumed=checkpoint.get("rows", 0))
+        start = time.perf_counter()
+        pending: deque = deque()
+        frozen = False  # a chunk had failed rows; later chunks must not advance the checkpoint
+
+        def settle(limit: int):
+            """Record finished chunks in order, waiting while more than `limit` are pending."""
+            nonlocal frozen
+            while pending and (
+                len(pending) > limit or all(f.done() for f in pending[0].futures)
+            ):
+                chunk = pending.popleft()
+                failed = []
+                for future in chunk.futures:
+                    keys, requests = future.result()
+                    failed += keys
+                    progress.requests += requests
+                    progress.retries += requests - 1
+                progress.rows_failed += len(failed)
+                progress.rows_upserted += chunk.rows - len(failed)
+                progress.failed_keys = (progress.failed_keys + failed)[:100]
+                frozen = frozen or bool(failed)
+                if not frozen:
+                    checkpoint["rows"] = checkpoint.get("rows", 0) + chunk.rows_read
+                    if chunk.last_key is not None:
+                        checkpoint["last_key"] = encode_key(chunk.last_key)
+                    self._save_checkpoint(path, checkpoint)
+                progress.elapsed = time.perf_counter() - start
+                if on_progress:
+                    on_progress(progress)
+
+        pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="vector-ingest"
+        )
+        try:
+            for rows in source.batches(key_column, self.chunk_rows, checkpoint):
+                rows_read = len(rows)
+                progress.rows_read += rows_read
+                rows = rows[rows[key_column].notna()].reset_index(drop=True)
+                if rows.empty:
+                    pending.append(_Chunk(rows_read, 0, None, []))
+                    continue
+                embed_start = time.perf_counter()
+                if vector_column in rows.columns:
+                    vectors = np.vstack(rows.pop(vector_column).to_numpy())
+                else:
+                    if not text_column or self.embedding_service is None:
+                        raise ValueError(
+                            f"Source has no `{vector_column}` column to upsert; set a text column to embed"
+                        )
+                    vectors = self.embedding_service.embed(
+                        rows[text_column].fillna("").astype(str).tolist()
+                    )
+                progress.embed_seconds += time.perf_counter() - embed_start
+
+                if schema:
+                    rows = rows[[c for c in rows.columns if c in schema]]
+                rows = rows.astype(object).where(rows.notna(), None)
+                parts = [
+                    json.dumps({**record, vector_column: vector.tolist()}, default=str)
+                    for record, vector in zip(rows.to_dict("records"), vectors)
+                ]
+                keys = [str(_native(key)) for key in rows[key_column]]
+                futures = [
+                    pool.submit(
+                        self._upsert,
+                        index_name,
+                        [parts[i] for i in batch],
+                        [keys[i] for i in batch],
+                    )
+                    for batch in pack_batches(
+                        parts, self.max_batch_rows, self.max_batch_bytes
+                    )
+                ]
+                last_key = _native(rows[key_column].iloc[-1])
+                pending.append(_Chunk(rows_read, len(rows), last_key, futures))
+                settle(self.max_workers)
+            settle(0)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        progress.elapsed = time.perf_counter() - start
+        return progress
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", required=True, help="Direct-access index name")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table", help="Unity Catalog table to read")
+    source.add_argument("--file", help="Volume file to read (.parquet, .csv, .json)")
+    parser.add_argument("--http-path", help="SQL warehouse HTTP path (with --table)")
+    parser.add_argument("--text-column", help="Column to embed")
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--chunk-rows", type=int, default=1000)
+    parser.add_argument("--batch-rows", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and start over"
+    )
+    args = parser.parse_args(argv)
+    if args.table and not args.http_path:
+        parser.error("--table needs --http-path")
+
+    w = WorkspaceClient()
+    if args.table:
+        cfg = Config()
+        connection = sql.connect(
+            server_hostname=cfg.host,
+            http_path=args.http_path,
+            credentials_provider=lambda: cfg.authenticate,
+        )
+        source = TableSource(connection, args.table)
+    else:
+        source = VolumeFileSource(w, args.file)
+    ingest = VectorIndexIngest(
+        w.vector_search_indexes,
+        EmbeddingService(
+            w.serving_endpoints.get_open_ai_client(), args.embedding_model
+        ),
+        chunk_rows=args.chunk_rows,
+        max_batch_rows=args.batch_rows,
+        max_workers=args.workers,
+    )
+
+    def report(progress: IngestProgress):
+        print(
+            f"{progress.rows_resumed + progress.rows_read:>10,} rows read · "
+            f"{progress.rows_upserted:>10,} upserted · {progress.rows_failed:,} failed · "
+            f"{progress.rows_per_second:,.0f} rows/s",
+            flush=True,
+        )
+
+    progress = ingest.run(
+        args.index,
+        source,
+        text_column=args.text_column,
+        restart=args.restart,
+        on_progress=report,
+    )
+    print(
+        f"Done in {progress.elapsed:.1f} s ({progress.embed_seconds:.1f} s embedding), "
+        f"{progress.requests} upsert requests, {progress.retries} retries"
+    )
+    if progress.failed_keys:
+        print(f"Failed keys: {', '.join(progress.failed_keys[:20])}")
+
+
+if __name__ == "__main__":
+    main()
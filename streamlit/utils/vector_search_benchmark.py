@@ -0,0 +1,327 @@
+"""Recall and latency benchmark for vector search indexes.
+
+Runs a labeled query set through the same embed-then-`query_index` path
+the vector search recipe uses, against a Vector Search index and/or a
+local index saved under `--local` (see `utils.local_vector_index`), and
+reports recall@k, MRR, latency percentiles and queries per second for
+every `num_results` and concurrency setting. Time spent embedding the
+query is reported separately from time spent searching.
+
+The query set is JSONL with one object per query: `query` (the text),
+`relevant` (ids of the relevant rows in `--id-column`) and optionally
+`vector`, a precomputed query embedding that skips the embedding call:
+
+    python -m utils.vector_search_benchmark --index main.docs.chunks --queries queries.jsonl --k 5,10,50
+    python -m utils.vector_search_benchmark --local indexes --index main.docs.chunks --queries queries.jsonl --concurrency 1,8
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+
+from databricks.sdk import WorkspaceClient
+
+from utils.embedding_cache import DEFAULT_EMBEDDING_CACHE, EmbeddingCache
+from utils.embedding_service import DEFAULT_EMBEDDING_MODEL, EmbeddingService
+from utils.local_vector_index import LocalVectorIndexes
+from utils.stats import percentile
+from utils.vector_index_catalog import VectorIndexCatalog
+
+
+@dataclass
+class LabeledQuery:
+    query: str
+    relevant: List[Any]
+    vector: Optional[List[float]] = None
+
+
+def load_queries(path: str) -> List[LabeledQuery]:
+    with open(path) as f:
+        return [
+            LabeledQuery(
+                query=item["query"],
+                relevant=item.get("relevant") or [],
+                vector=item.get("vector"),
+            )
+            for item in (json.loads(line) for line in f if line.strip())
+            if item
+        ]
+
+
+def recall_at_k(retrieved: Sequence[Any], relevant: Sequence[Any]) -> Optional[float]:
+    """Share of the relevant ids among the retrieved ones; None without labels."""
+    if not relevant:
+        return None
+    return len(set(retrieved) & set(relevant)) / len(set(relevant))
+
+
+def reciprocal_rank(retrieved: Sequence[Any], relevant: Sequence[Any]) -> float:
+    relevant = set(relevant)
+    for rank, item in enumerate(retrieved, start=1):
+        if item in relevant:
+            return 1 / rank
+    return 0.0
+
+
+@dataclass
+class SearchBenchmarkResult:
+    target: str
+    num_results: int
+    concurrency: int
+    queries: int
+    errors: int
+    elapsed: float
+    recall: Optional[float] = None
+    mrr: Optional[float] = None
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    embed_p50: Optional[float] = None
+    embed_p95: Optional[float] = None
+    search_p50: Optional[float] = None
+    search_p95: Optional[float] = None
+    first_error: Optional[str] = None
+
+    @property
+    def qps(self) -> float:
+        """Successful queries per second."""
+        return (self.queries - self.errors) / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "qps": round(self.qps, 2)}
+
+
+@dataclass
+class _Outcome:
+    embed: float = 0.0
+    search: float = 0.0
+    retrieved: List[Any] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class VectorSearchBenchmark:
+    """Measures retrieval quality and latency of one index.
+
+    `indexes` is `w.vector_search_indexes` or a `LocalVectorIndexes`.
+    Queries are embedded with `embed` (text to vector) unless they carry a
+    vector or a Vector Search index computes embeddings itself, in which case
+    `query_text` is sent as the recipe does and the endpoint's embedding
+    time is part of the search time. Local indexes are always sent a vector
+    embedded here, so that embedding is timed separately. Each level runs the query set
+    `repeat` times from `concurrency` threads after `warmup` unmeasured
+    queries.
+    """
+
+    def __init__(
+        self,
+        indexes,
+        index_name: str,
+        id_column: str,
+        embed: Callable[[str], Sequence[float]] = None,
+        target: str = "remote",
+        repeat: int = 1,
+        warmup: int = 2,
+    ):
+        self.indexes = indexes
+        self.index_name = index_name
+        self.id_column = id_column
+        self.embed = embed
+        self.target = target
+        self.repeat = repeat
+        self.warmup = warmup
+        self.catalog = VectorIndexCatalog(indexes)
+
+    def _search(self, query: LabeledQuery, num_results: int) -> _Outcome:
+        outcome = _Outcome()
+        try:
+            if query.vector is not None:
+                request = {"query_vector": query.vector}
+            elif not isinstance(
+                self.indexes, LocalVectorIndexes
+            ) and self.catalog.computes_embeddings(self.index_name):
+                request = {"query_text": query.query}
+            else:
+                start = time.perf_counter()
+                vector = self.embed(query.query)
+                outcome.embed = time.perf_counter() - start
+                request = {"query_vector": list(map(float, vector))}
+            start = time.perf_counter()
+            response = self.indexes.query_index(
+                index_name=self.index_name,
+                columns=[self.id_column],
+                num_results=num_results,
+                **request,
+            )
+            outcome.search = time.perf_counter() - start
+            outcome.retrieved = [row[0] for row in response.result.data_array or []]
+        except Exception as e:
+            outcome.error = str(e)
+        return outcome
+
+    def run_level(
+        self, queries: List[LabeledQuery], num_results: int, concurrency: int
+    ) -> SearchBenchmarkResult:
+        for query in queries[: self.warmup]:
+            self._search(query, num_results)
+        workload = queries * self.repeat
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="vector-search-benchmark"
+        ) as pool:
+            start = time.perf_counter()
+            outcomes = list(
+                pool.map(lambda query: self._search(query, num_results), workload)
+            )
+            elapsed = time.perf_counter() - start
+
+        succeeded = [
+            (query, outcome)
+            for query, outcome in zip(workload, outcomes)
+            if outcome.error is None
+        ]
+        recalls = [
+            recall_at_k(outcome.retrieved, query.relevant)
+            for query, outcome in succeeded
+            if query.relevant
+        ]
+        ranks = [
+            reciprocal_rank(outcome.retrieved, query.relevant)
+            for query, outcome in succeeded
+            if query.relevant
+        ]
+        embeds = [outcome.embed for _, outcome in succeeded]
+        searches = [outcome.search for _, outcome in succeeded]
+        latencies = [e + s for e, s in zip(embeds, searches)]
+        errors = [outcome.error for outcome in outcomes if outcome.error is not None]
+
+        def rounded(value, digits=4):
+            return None if value is None else round(value, digits)
+
+        return SearchBenchmarkResult(
+            target=self.target,
+            num_results=num_results,
+            concurrency=concurrency,
+            queries=len(outcomes),
+            errors=len(errors),
+            elapsed=round(elapsed, 3),
+            recall=rounded(sum(recalls) / len(recalls) if recalls else None),
+            mrr=rounded(sum(ranks) / len(ranks) if ranks else None),
+            latency_p50=rounded(percentile(latencies, 50), 5),
+            latency_p95=rounded(percentile(latencies, 95), 5),
+            embed_p50=rounded(percentile(embeds, 50), 5),
+            embed_p95=rounded(percentile(embeds, 95), 5),
+            search_p50=rounded(percentile(searches, 50), 5),
+            search_p95=rounded(percentile(searches, 95), 5),
+            first_error=errors[0] if errors else None,
+        )
+
+    def sweep(
+        self,
+        queries: List[LabeledQuery],
+        num_results: List[int],
+        concurrency_levels: List[int],
+        on_result: Callable[[SearchBenchmarkResult], None] = None,
+    ) -> List[SearchBenchmarkResult]:
+        """Run every combination of `num_results` and concurrency level."""
+        results = []
+        for k in num_results:
+            for concurrency in concurrency_levels:
+                result = self.run_level(queries, k, concurrency)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        return results
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", required=True, help="Vector search index name")
+    parser.add_argument("--queries", required=True, help="Labeled query set (JSONL)")
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--k", type=_int_list, default=[5, 10])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--local", help="Also benchmark the index saved under this directory"
+    )
+    parser.add_argument(
+        "--local-only", action="store_true", help="Skip the Vector Search index"
+    )
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument(
+        "--embedding-cache",
+        nargs="?",
+        const=DEFAULT_EMBEDDING_CACHE,
+        metavar="PATH",
+        help="Answer repeated queries from the embedding cache (default file: "
+        f"{DEFAULT_EMBEDDING_CACHE}). Off by default, as cache hits hide the "
+        "embedding latency.",
+    )
+    parser.add_argument("--output", help="Append results to this JSONL file")
+    args = parser.parse_args(argv)
+
+    queries = load_queries(args.queries)
+    embed = None
+    if any(query.vector is None for query in queries):
+        w = WorkspaceClient()
+        service = EmbeddingService(
+            w.serving_endpoints.get_open_ai_client(),
+            args.embedding_model,
+            cache=(
+                EmbeddingCache(args.embedding_cache) if args.embedding_cache else None
+            ),
+        )
+        embed = service.embed_one
+
+    targets = []
+    if not args.local_only:
+        targets.append(("remote", WorkspaceClient().vector_search_indexes))
+    if args.local:
+        targets.append(("local", LocalVectorIndexes(args.local, embed=embed)))
+
+    print(
+        f"{'target':>7} {'k':>4} {'conc':>5} {'recall':>7} {'mrr':>6} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'embed p50':>10} {'search p50':>11} {'qps':>8} {'errors':>7}"
+    )
+
+    def report(result: SearchBenchmarkResult):
+        def fmt(value, scale=1.0, digits=3):
+            return "-" if value is None else f"{value * scale:.{digits}f}"
+
+        print(
+            f"{result.target:>7} {result.num_results:>4} {result.concurrency:>5} "
+            f"{fmt(result.recall):>7} {fmt(result.mrr):>6} "
+            f"{fmt(result.latency_p50, 1000, 2):>8} {fmt(result.latency_p95, 1000, 2):>8} "
+            f"{fmt(result.embed_p50, 1000, 2):>10} {fmt(result.search_p50, 1000, 2):>11} "
+            f"{result.qps:>8.1f} {result.errors:>7}",
+            flush=True,
+        )
+        if args.output:
+            with open(args.output, "a") as f:
+                f.write(json.dumps({"index": args.index, **result.to_dict()}) + "\n")
+
+    results = []
+    for target, indexes in targets:
+        benchmark = VectorSearchBenchmark(
+            indexes,
+            args.index,
+            args.id_column,
+            embed=embed,
+            target=target,
+            repeat=args.repeat,
+            warmup=args.warmup,
+        )
+        results += benchmark.sweep(queries, args.k, args.concurrency, on_result=report)
+    errors = [r.first_error for r in results if r.first_error]
+    if errors:
+        print(f"First error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
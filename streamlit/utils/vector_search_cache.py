@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from typing import Any, Hashable, Optional
+
+import numpy as np
+from databricks.sdk.service.vectorsearch import QueryVectorIndexResponse
+
+from utils.ttl_cache import TTLCache
+
+
+def vector_digest(vector) -> str:
+    """A stable hash of a query vector, equal for the same float32 values."""
+    return hashlib.blake2b(
+        np.asarray(vector, dtype=np.float32).tobytes(), digest_size=16
+    ).hexdigest()
+
+
+class CachedVectorSearchIndexes:
+    """`query_index` results cached per index version, in front of `indexes`.
+
+    `indexes` is `w.vector_search_indexes` or a `LocalVectorIndexes`; other
+    methods pass through. Results are keyed by index, columns, filters,
+    number of results, query type and the query text or a hash of the
+    query vector, and kept in an LRU of `maxsize` entries for at most `ttl`
+    seconds.
+
+    The index's version is its `get_index` status (indexed row count,
+    readiness and sync message), polled at most every `version_ttl`
+    seconds per index. When it changes, that index's cached results are
+    dropped. Upserts and deletes through this object drop them at once.
+
+    The version doesn't change when rows are updated in place, e.g. by a
+    Delta Sync pipeline or by writes from another process: until `ttl`
+    expires, results can miss those changes. Keep `ttl` short, or call
+    `invalidate` after writing to the index elsewhere.
+    """
+
+    def __init__(
+        self,
+        indexes,
+        maxsize: int = 1024,
+        ttl: float = 300,
+        version_ttl: float = 10,
+    ):
+        self.indexes = indexes
+        self._results = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._versions = TTLCache(ttl=version_ttl)
+        self._known = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self.indexes, name)
+
+    def _version(self, index_name: str) -> Optional[Hashable]:
+        version = self._versions.get(index_name)
+        if version is None:
+            try:
+                status = self.indexes.get_index(index_name).status
+            except Exception:
+                return None
+            version = (
+                (status.indexed_row_count, status.ready, status.message)
+                if status
+                else ()
+            )
+            self._versions.set(index_name, version)
+            with self._lock:
+                changed = self._known.get(index_name, version) != version
+                self._known[index_name] = version
+            if changed:
+                self._results.invalidate_where(lambda key: key[0] == index_name)
+        return version
+
+    def query_index(
+        self,
+        index_name: str,
+        columns: list,
+        *,
+        query_vector: list = None,
+        query_text: str = None,
+        **kwargs: Any,
+    ) -> QueryVectorIndexResponse:
+        version = self._version(index_name)
+        if version is None:
+            # Without a version a cached result could be stale: don't cache.
+            return self.indexes.query_index(
+                index_name=index_name,
+                columns=columns,
+                query_vector=query_vector,
+                query_text=query_text,
+                **kwargs,
+            )
+        key = (
+            index_name,
+            version,
+            tuple(columns),
+            query_text,
+            None if query_vector is None else vector_digest(query_vector),
+            tuple(sorted((name, repr(value)) for name, value in kwargs.items())),
+        )
+        response = self._results.get(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if response is None:
+            response = self.indexes.query_index(
+                index_name=index_name,
+                columns=columns,
+                query_vector=query_vector,
+                query_text=query_text,
+                **kwargs,
+            )
+            self._results.set(key, response)
+        return response
+
+    def upsert_data_vector_index(self, index_name: str, inputs_json: str):
+        try:
+            return self.indexes.upsert_data_vector_index(index_name, inputs_json)
+        finally:
+            self.invalidate(index_name)
+
+    def delete_data_vector_index(self, index_name: str, primary_keys: list):
+        try:
+            return self.indexes.delete_data_vector_index(index_name, primary_keys)
+        finally:
+            self.invalidate(index_name)
+
+    def invalidate(self, index_name: str = None):
+        """Drop the cached results of one index, or of all indexes."""
+        if index_name is None:
+            self._results.clear()
+            self._versions.clear()
+        else:
+            self._results.invalidate_where(lambda key: key[0] == index_name)
+            self._versions.invalidate(index_name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._results),
+            }
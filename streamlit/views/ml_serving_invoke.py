@@ -1,10 +1,105 @@
+import io
+import itertools
+import time
 from json import loads
+import pandas as pd
 import streamlit as st
+from databricks import sql
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.serving import ChatMessage, ChatMessageRole
+from databricks.sdk.core import Config
+from utils.batch_eval import BatchEvaluator, read_prompts, summarize
+from utils.batch_scoring import BatchScorer, read_scoring_input, write_parquet
+from utils.chat_memory import Conversation, endpoint_summarizer, to_chat_messages
+from utils.endpoint_catalog import EndpointCatalog, llm_request, validate_records
+from utils.llm_stream import ChatStream, chat_messages
+from utils.openai_client import openai_client_provider
+from utils.resilient_invoke import ResilientInvoker
+from utils.response_cache import DEFAULT_CACHE_DIR, ResponseCache
 
+cfg = Config()
 w = WorkspaceClient()
 
+
+def get_openai_client():
+    # Process-wide and created on first use, shared with the vector search page.
+    return openai_client_provider().get()
+
+
+@st.cache_resource
+def get_endpoint_catalog():
+    return EndpointCatalog(w)
+
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(w, disk_dir=DEFAULT_CACHE_DIR)
+
+
+@st.cache_resource
+def get_invoker():
+    # Keep the SDK's own 429/503 retries short so the invoker's backoff applies.
+    return ResilientInvoker(WorkspaceClient(config=Config(retry_timeout_seconds=1)))
+
+
+def query_endpoint(endpoint_name, use_cache, idempotent=False, **request):
+    if use_cache:
+        response = get_response_cache().get(endpoint_name, request)
+        if response is not None:
+            return response, True
+    response = get_invoker().query(endpoint_name, idempotent=idempotent, **request)
+    if use_cache:
+        get_response_cache().put(endpoint_name, request, response)
+    return response, False
+
+
+def show_invoke_status(endpoint_name, hit, use_cache):
+    metrics = get_invoker().metrics(endpoint_name)
+    status = (
+        f"p95 {metrics['latency_p95'] or '-'} s · timeout {metrics['timeout']} s · "
+        f"{metrics['retries']} retries · {metrics['hedges']} hedged"
+        + (" · warming up" if metrics["warming"] else "")
+    )
+    if use_cache:
+        stats = get_response_cache().stats()
+        status = (
+            f"{'Served from cache' if hit else 'Sent to the endpoint'} · "
+            f"{stats['hits']} hits, {stats['misses']} misses, {stats['entries']} cached responses · "
+            + status
+        )
+    st.caption(status)
+
+
+def get_conversation(endpoint_name, max_prompt_tokens):
+    key = f"conversation_{endpoint_name}"
+    if key not in st.session_state:
+        st.session_state[key] = Conversation(
+            summarizer=endpoint_summarizer(w, endpoint_name)
+        )
+    conversation = st.session_state[key]
+    conversation.max_prompt_tokens = max_prompt_tokens
+    return conversation
+
+
+@st.cache_resource
+def get_sql_connection(http_path):
+    return sql.connect(
+        server_hostname=cfg.host,
+        http_path=http_path,
+        credentials_provider=lambda: cfg.authenticate,
+    )
+
+
+def read_table(table_name, http_path, chunk_rows=100_000):
+    # Fetched a chunk at a time, so a large table is never loaded at once.
+    with get_sql_connection(http_path).cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {table_name}")
+        while True:
+            chunk = cursor.fetchmany_arrow(chunk_rows)
+            if chunk.num_rows == 0:
+                return
+            yield chunk.to_pandas()
+
+
 st.header(body="AI / ML", divider=True)
 st.subheader("Invoke a model")
 st.write(
@@ -14,16 +109,37 @@ st.write(
 tab_a, tab_b, tab_c = st.tabs(["**Try it**", "**Code snippets**", "**Requirements**"])
 
 with tab_a:
-    endpoints = w.serving_endpoints.list()
-    endpoint_names = [endpoint.name for endpoint in endpoints]
+    catalog = get_endpoint_catalog()
+    endpoint_names = catalog.names()
 
     col1, col2 = st.columns([2, 1])
     with col1:
         selected_model = st.selectbox(
             "Select a model served by Model Serving", endpoint_names
         )
+        endpoint = catalog.get(selected_model) if selected_model else None
+        if endpoint:
+            st.caption(
+                f"Task: `{endpoint.task or 'custom model'}` · State: `{endpoint.state}` · "
+                f"Serving: {', '.join(e.describe() for e in endpoint.served_entities) or '-'}"
+            )
     with col2:
-        model_type = st.radio("Model type", ["LLM", "Traditional ML"])
+        model_type = st.radio(
+            "Model type",
+            ["LLM", "Traditional ML"],
+            index=0 if endpoint is None or endpoint.is_llm else 1,
+        )
+    with st.expander("Endpoint metrics", icon=":material/monitoring:"):
+        st.json(get_invoker().metrics(selected_model) if selected_model else {})
+    if endpoint and not endpoint.ready:
+        st.warning(
+            f"Endpoint `{endpoint.name}` is not ready ({endpoint.state}), requests will likely fail.",
+            icon="⚠️",
+        )
+    use_cache = st.toggle(
+        "Cache identical requests",
+        help="Reuse the response of an identical earlier request to the same served model version. LLM requests are only cached at temperature 0, and streamed answers are never cached.",
+    )
 
     if model_type == "LLM":
         temperature = st.slider(
@@ -35,36 +151,277 @@ with tab_a:
             help="Controls the randomness of the LLM output. Only applicable for chat/completions queries.",
         )
         prompt = st.text_area("Enter your prompt:", placeholder="Ask something...")
+        request_format = endpoint.request_format() if endpoint else "messages"
+        stream_tokens = st.toggle(
+            "Stream tokens",
+            value=request_format == "messages",
+            disabled=request_format != "messages",
+            help="Render the answer as it is generated, using the OpenAI-compatible client. Only available for chat endpoints.",
+        )
+        col_memory, col_budget = st.columns(2)
+        with col_memory:
+            remember = st.toggle(
+                "Remember conversation",
+                disabled=request_format != "messages",
+                help="Send earlier turns with each prompt. Older turns are summarized once the history exceeds the token budget.",
+            )
+        conversation = None
+        if remember and selected_model:
+            with col_budget:
+                max_prompt_tokens = st.number_input(
+                    "Prompt token budget", min_value=500, max_value=32000, value=4000
+                )
+            conversation = get_conversation(selected_model, max_prompt_tokens)
+            for turn in conversation.transcript:
+                with st.chat_message(turn.role):
+                    st.markdown(turn.content)
+            if conversation.transcript:
+                stats = conversation.stats()
+                st.caption(
+                    f"Prompt ~{stats['prompt_tokens']:,}/{stats['max_prompt_tokens']:,} tokens · "
+                    f"{stats['turns_in_prompt']} of {stats['turns_total']} turns sent · "
+                    f"{stats['compacted_turns']} summarized"
+                )
+                if st.button("Clear conversation", icon=":material/delete:"):
+                    conversation.clear()
+                    st.rerun()
+
         if st.button("Invoke LLM"):
-            response = w.serving_endpoints.query(
-                name=selected_model,
-                messages=[
-                    ChatMessage(
-                        role=ChatMessageRole.SYSTEM,
-                        content="You are a helpful assistant.",
-                    ),
-                    ChatMessage(
-                        role=ChatMessageRole.USER,
-                        content=prompt,
-                    ),
-                ],
-                temperature=temperature,
+            messages = (
+                conversation.prepare(prompt) if conversation else chat_messages(prompt)
             )
-            st.json(response.as_dict())
+            if stream_tokens:
+                try:
+                    chat_stream = ChatStream(
+                        get_openai_client(),
+                        selected_model,
+                        messages,
+                        temperature=temperature,
+                    )
+                    st.write_stream(chat_stream)
+                    if conversation:
+                        conversation.record(
+                            chat_stream.text,
+                            (
+                                chat_stream.usage.prompt_tokens
+                                if chat_stream.usage
+                                else None
+                            ),
+                        )
+                    st.caption(
+                        f"First token after {chat_stream.time_to_first_token or 0:.2f} s, "
+                        f"complete after {chat_stream.elapsed:.2f} s."
+                    )
+                except Exception as e:
+                    st.error(f"Error invoking model: {e}", icon="🚨")
+            else:
+                request = (
+                    {"messages": to_chat_messages(messages), "temperature": temperature}
+                    if conversation
+                    else llm_request(request_format, prompt, temperature)
+                )
+                response, hit = query_endpoint(selected_model, use_cache, **request)
+                if conversation and response.choices:
+                    conversation.record(
+                        response.choices[0].message.content,
+                        response.usage.prompt_tokens if response.usage else None,
+                    )
+                st.json(response.as_dict())
+                show_invoke_status(selected_model, hit, use_cache)
+
+        with st.expander("Batch evaluation", icon=":material/checklist:"):
+            st.write(
+                "Run a file of prompts against the endpoint. Results are checkpointed as they arrive, so running the same file again resumes where it stopped."
+            )
+            prompt_file = st.file_uploader(
+                "Prompt file (`.csv` with a `prompt` column, `.jsonl`, `.json` or `.txt`)",
+                type=["csv", "jsonl", "json", "txt"],
+            )
+            col_workers, col_rate, col_tokens = st.columns(3)
+            with col_workers:
+                batch_workers = st.number_input(
+                    "Concurrent requests", min_value=1, max_value=64, value=16
+                )
+            with col_rate:
+                batch_rate = st.number_input(
+                    "Requests per second", min_value=0.1, max_value=100.0, value=10.0
+                )
+            with col_tokens:
+                batch_max_tokens = st.number_input(
+                    "Max tokens", min_value=1, max_value=8192, value=512
+                )
+
+            if st.button("Run batch", icon=":material/play_arrow:"):
+                if not prompt_file:
+                    st.warning("Please upload a prompt file.", icon="⚠️")
+                else:
+                    try:
+                        prompts = read_prompts(prompt_file.getvalue(), prompt_file.name)
+                        progress = st.progress(0.0, text=f"0/{len(prompts)} prompts")
+                        start = time.perf_counter()
+                        results = BatchEvaluator(
+                            w, max_workers=batch_workers, rate=batch_rate
+                        ).run(
+                            selected_model,
+                            prompts,
+                            temperature=temperature,
+                            max_tokens=batch_max_tokens,
+                            on_progress=lambda done, total, result: progress.progress(
+                                done / total, text=f"{done}/{total} prompts"
+                            ),
+                        )
+                        progress.progress(
+                            1.0, text=f"{len(prompts)}/{len(prompts)} prompts"
+                        )
+                        st.json(summarize(results, time.perf_counter() - start))
+                        results_df = pd.DataFrame(BatchEvaluator.to_records(results))
+                        st.dataframe(results_df, use_container_width=True)
+                        st.download_button(
+                            "Download results",
+                            data=results_df.to_csv(index=False),
+                            file_name=f"{selected_model}_eval.csv",
+                            mime="text/csv",
+                        )
+                    except Exception as e:
+                        st.error(f"Error running batch evaluation: {e}", icon="🚨")
 
     elif model_type == "Traditional ML":
         st.info(
             "The model has to be [deployed](https://docs.databricks.com/en/machine-learning/model-serving/create-manage-serving-endpoints.html#create-an-endpoint) to Mosaic AI Model Serving. Request pattern corresponds to the model signature [registered in Unity Catalog](https://docs.databricks.com/en/machine-learning/manage-model-lifecycle/index.html#train-and-register-unity-catalog-compatible-models)."
         )
+        schema = catalog.schema(selected_model) if selected_model else None
+        if schema and schema.columns:
+            st.caption(
+                "Model signature: "
+                + ", ".join(
+                    f"`{c.name}` ({c.type or 'any'}{'' if c.required else ', optional'})"
+                    for c in schema.columns
+                )
+            )
         input_value = st.text_area(
             "Enter model input",
-            placeholder='{"feature1": [1.5], "feature2": [2.5]}',
+            placeholder=(
+                schema.example()
+                if schema and schema.columns
+                else '{"feature1": [1.5], "feature2": [2.5]}'
+            ),
         )
         if st.button("Invoke Model"):
-            response = w.serving_endpoints.query(
-                name=selected_model, dataframe_records=loads(input_value)
+            try:
+                records = loads(input_value)
+            except ValueError as e:
+                records = None
+                st.error(f"Input is not valid JSON: {e}", icon="🚨")
+            problems = validate_records(records, schema) if records is not None else []
+            if problems:
+                st.error(
+                    "Fix the input before sending it:\n"
+                    + "\n".join(f"- {problem}" for problem in problems),
+                    icon="🚨",
+                )
+            elif records is not None:
+                response, hit = query_endpoint(
+                    selected_model,
+                    use_cache,
+                    idempotent=True,
+                    dataframe_records=records,
+                )
+                st.write(response.as_dict())
+                show_invoke_status(selected_model, hit, use_cache)
+
+        with st.expander("Score a file or table", icon=":material/table_view:"):
+            st.write(
+                "Score many rows at once. Rows are sent as concurrent `dataframe_split` batches sized to the endpoint's payload limit, and predictions are appended to the input in order."
+            )
+            score_source = st.radio(
+                "Input", ["CSV or Parquet file", "Unity Catalog table"], horizontal=True
             )
-            st.write(response.as_dict())
+            if score_source == "CSV or Parquet file":
+                score_file = st.file_uploader(
+                    "Input file", type=["csv", "parquet"], key="score_file"
+                )
+            else:
+                warehouse_paths = {
+                    wh.name: wh.odbc_params.path for wh in w.warehouses.list()
+                }
+                score_warehouse = st.selectbox(
+                    "SQL warehouse", [""] + list(warehouse_paths.keys())
+                )
+                score_table = st.text_input(
+                    "Table", placeholder="main.marketing.leads_features"
+                )
+            score_workers = st.slider("Concurrent requests", 1, 32, 8)
+            score_output_path = st.text_input(
+                "Also write the scored rows to a volume (optional)",
+                placeholder="/Volumes/main/marketing/raw_files/leads_scored.parquet",
+            )
+
+            if st.button("Score rows", icon=":material/play_arrow:"):
+                try:
+                    if score_source == "CSV or Parquet file":
+                        if not score_file:
+                            raise ValueError("Please upload an input file.")
+                        input_df = read_scoring_input(
+                            score_file.getvalue(), score_file.name
+                        )
+                        chunks, total = iter([input_df]), len(input_df)
+                    else:
+                        if not score_warehouse or not score_table:
+                            raise ValueError("Please select a warehouse and a table.")
+                        chunks = read_table(
+                            score_table, warehouse_paths[score_warehouse]
+                        )
+                        total = None
+                    first = next(chunks, None)
+                    if first is None:
+                        raise ValueError("There are no rows to score.")
+
+                    scorer = BatchScorer(
+                        w,
+                        max_workers=score_workers,
+                        cache=get_response_cache() if use_cache else None,
+                        invoker=get_invoker(),
+                    )
+                    batch_rows = scorer.batch_rows(first)
+                    progress = st.progress(0.0, text="0 rows")
+                    start = time.perf_counter()
+                    output = io.BytesIO()
+                    rows, preview = write_parquet(
+                        scorer.score_chunks(
+                            selected_model,
+                            itertools.chain([first], chunks),
+                            batch_rows=batch_rows,
+                            on_progress=lambda done: progress.progress(
+                                done / total if total else 0.0,
+                                text=(
+                                    f"{done:,}/{total:,} rows"
+                                    if total
+                                    else f"{done:,} rows"
+                                ),
+                            ),
+                        ),
+                        output,
+                    )
+                    elapsed = time.perf_counter() - start
+                    st.success(
+                        f"Scored {rows:,} rows in {elapsed:.1f} s "
+                        f"({batch_rows:,} rows per request).",
+                        icon="✅",
+                    )
+                    st.dataframe(preview, use_container_width=True)
+
+                    if score_output_path:
+                        output.seek(0)
+                        w.files.upload(score_output_path, output, overwrite=True)
+                        st.info(f"Written to `{score_output_path}`.", icon="💾")
+                    st.download_button(
+                        "Download scored rows (Parquet)",
+                        data=output.getvalue(),
+                        file_name=f"{selected_model}_scored.parquet",
+                        mime="application/octet-stream",
+                    )
+                except Exception as e:
+                    st.error(f"Error scoring rows: {e}", icon="🚨")
 
 table = [
     {
@@ -203,6 +560,34 @@ table = [
         ```
         """,
     },
+    {
+        "type": "Chat Models (streaming)",
+        "param": "stream",
+        "description": "Stream the answer token by token through the OpenAI-compatible client.",
+        "code": """
+        ```python
+        from databricks.sdk import WorkspaceClient
+        import streamlit as st
+
+        w = WorkspaceClient()
+        client = w.serving_endpoints.get_open_ai_client()
+
+        stream = client.chat.completions.create(
+            model="chat-assistant-model",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": "Provide tips for deploying Databricks Apps."},
+            ],
+            stream=True,
+        )
+        st.write_stream(
+            chunk.choices[0].delta.content or ""
+            for chunk in stream
+            if chunk.choices
+        )
+        ```
+        """,
+    },
     {
         "type": "Embeddings Models",
         "param": "input",
@@ -250,15 +635,21 @@ with tab_c:
         st.markdown("""
                     **Permissions (app service principal)**
                     * `CAN QUERY` on the model serving endpoint
+                    * `CAN USE` on the SQL warehouse and `SELECT` on the table (scoring a Unity Catalog table)
+                    * `WRITE VOLUME` on the volume (writing scored rows to a volume)
                     """)
     with col2:
         st.markdown("""
                     **Databricks resources**
                     * Model serving endpoint
+                    * SQL warehouse (scoring a Unity Catalog table)
                     """)
     with col3:
         st.markdown("""
                     **Dependencies**
                     * [Databricks SDK for Python](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`
+                    * [Databricks SQL Connector for Python](https://pypi.org/project/databricks-sql-connector/) - `databricks-sql-connector`
+                    * [Pandas](https://pypi.org/project/pandas/) - `pandas`
+                    * [PyArrow](https://pypi.org/project/pyarrow/) - `pyarrow`
                     * [Streamlit](https://pypi.org/project/streamlit/) - `streamlit`
                     """)
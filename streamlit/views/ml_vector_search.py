@@ -1,7 +1,20 @@
+import numpy as np
 import streamlit as st
+from databricks import sql
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.core import Config
+
+from utils.embedding_cache import DEFAULT_EMBEDDING_CACHE, EmbeddingCache
+from utils.embedding_service import EmbeddingService
+from utils.local_vector_index import LOCAL_INDEX_DIR, LocalVectorIndexes
+from utils.openai_client import openai_client_provider
+from utils.rerank import rerank, response_frame
+from utils.vector_index_catalog import VectorIndexCatalog
+from utils.vector_index_ingest import TableSource, VectorIndexIngest, VolumeFileSource
+from utils.vector_search_cache import CachedVectorSearchIndexes
 
 w = WorkspaceClient()
+cfg = Config()
 
 st.header(body="AI / ML", divider=True)
 st.subheader("Run vector search")
@@ -11,35 +24,120 @@ st.write(
 
 tab1, tab2, tab3 = st.tabs(["**Try it**", "**Code snippet**", "**Requirements**"])
 
-openai_client = w.serving_endpoints.get_open_ai_client()
+# Created on the first embedding request and shared with the other pages.
+openai_client = openai_client_provider()
 
 EMBEDDING_MODEL_ENDPOINT_NAME = "databricks-gte-large-en"
 
+
+@st.cache_resource
+def get_embedding_cache():
+    return EmbeddingCache(DEFAULT_EMBEDDING_CACHE)
+
+
+@st.cache_resource
+def get_embedding_service():
+    return EmbeddingService(
+        openai_client, EMBEDDING_MODEL_ENDPOINT_NAME, cache=get_embedding_cache()
+    )
+
+
+@st.cache_resource
+def get_document_embedding_service():
+    # Documents are embedded without the query cache, which they would crowd out.
+    return EmbeddingService(openai_client, EMBEDDING_MODEL_ENDPOINT_NAME)
+
+
+@st.cache_resource
+def get_vector_search_indexes():
+    # Offline stand-in: serve indexes saved under LOCAL_VECTOR_INDEX_DIR in-process.
+    if LOCAL_INDEX_DIR:
+        return CachedVectorSearchIndexes(LocalVectorIndexes(LOCAL_INDEX_DIR))
+    return CachedVectorSearchIndexes(w.vector_search_indexes)
+
+
+@st.cache_resource
+def get_index_catalog():
+    return VectorIndexCatalog(get_vector_search_indexes())
+
+
+@st.cache_resource
+def get_vector_index_ingest():
+    return VectorIndexIngest(
+        get_vector_search_indexes(), get_document_embedding_service()
+    )
+
+
+@st.cache_resource
+def get_sql_connection(http_path):
+    return sql.connect(
+        server_hostname=cfg.host,
+        http_path=http_path,
+        credentials_provider=lambda: cfg.authenticate,
+    )
+
+
 def get_embeddings(text):
     try:
-        response = openai_client.embeddings.create(
-            model=EMBEDDING_MODEL_ENDPOINT_NAME, input=text
-        )
-        return response.data[0].embedding
+        return get_embedding_service().embed_one(text).tolist()
     except Exception as e:
         st.text(f"Error generating embeddings: {e}")
 
 
+def candidate_vectors(candidates, vector_column, source_column):
+    """Vectors of the candidates for diversification, or None if unavailable."""
+    if candidates.empty:
+        return None
+    # Self-managed indexes return their stored vectors with the results.
+    if vector_column:
+        return np.vstack(candidates[vector_column].to_numpy()).astype(np.float32)
+    if source_column:
+        # Managed embeddings aren't returned: embed the candidates in one batch.
+        return get_document_embedding_service().embed(
+            candidates[source_column].astype(str).tolist()
+        )
+    return None
+
+
 def run_vector_search(prompt: str) -> str:
-    prompt_vector = get_embeddings(prompt)
-    if prompt_vector is None or isinstance(prompt_vector, str):
-        return f"Failed to generate embeddings: {prompt_vector}"
+    catalog = get_index_catalog()
+    # Indexes with managed embeddings embed the text themselves: one round-trip less.
+    if catalog.computes_embeddings(index_name):
+        query = {"query_text": prompt}
+    else:
+        prompt_vector = get_embeddings(prompt)
+        if prompt_vector is None or isinstance(prompt_vector, str):
+            return f"Failed to generate embeddings: {prompt_vector}"
+        query = {"query_vector": prompt_vector}
 
     columns_to_fetch = [col.strip() for col in columns.split(",") if col.strip()]
+    vector_column = catalog.vector_column(index_name) if diversity > 0 else None
+    source_column = catalog.source_column(index_name) if diversity > 0 else None
+    extra_columns = [keyword_column, vector_column or source_column]
+    fetch = columns_to_fetch + [
+        column for column in extra_columns if column and column not in columns_to_fetch
+    ]
 
     try:
-        query_result = w.vector_search_indexes.query_index(
+        query_result = get_vector_search_indexes().query_index(
             index_name=index_name,
-            columns=columns_to_fetch,
-            query_vector=prompt_vector,
-            num_results=3,
+            columns=fetch,
+            num_results=max(num_candidates, page * num_results),
+            **query,
         )
-        return query_result.result.data_array
+        candidates = response_frame(query_result)
+        vectors = candidate_vectors(candidates, vector_column, source_column)
+        results = rerank(
+            candidates,
+            candidates.pop("score"),
+            vectors=vectors,
+            query_text=prompt,
+            text_column=keyword_column or None,
+            diversity=diversity,
+            offset=(page - 1) * num_results,
+            limit=num_results,
+        )
+        return results[columns_to_fetch + ["score"]]
     except Exception as e:
         return f"Error during vector search: {e}"
 
@@ -62,10 +160,123 @@ with tab1:
         key="search_query_key",
     )
 
+    with st.expander("Reranking"):
+        col1, col2, col3 = st.columns(3)
+        num_results = col1.number_input("Results per page", 1, 100, value=3)
+        page = col2.number_input("Page", 1, 100, value=1)
+        num_candidates = col3.number_input(
+            "Candidates to rerank",
+            1,
+            1000,
+            value=30,
+            help="Results fetched from the index in one query and reranked locally.",
+        )
+        diversity = st.slider(
+            "Diversity",
+            0.0,
+            1.0,
+            value=0.0,
+            help="0 ranks by relevance only. Higher values use maximal marginal relevance to skip results similar to ones already shown.",
+        )
+        keyword_column = st.text_input(
+            "Keyword column for hybrid ranking (optional):",
+            placeholder="text",
+            help="Fuse the vector ranking with a keyword (BM25) ranking of this column by reciprocal rank fusion.",
+        )
+
     if st.button("Run vector search"):
         result = run_vector_search(text_input)
         st.write("Search results:")
-        st.write(result)
+        if isinstance(result, str):
+            st.write(result)
+        else:
+            st.dataframe(result, hide_index=True)
+        if get_index_catalog().computes_embeddings(index_name):
+            embedded = "Query embedded by the index (managed embeddings)"
+        else:
+            stats = get_embedding_cache().stats()
+            embedded = (
+                f"Query embedded with {EMBEDDING_MODEL_ENDPOINT_NAME} · embedding cache: "
+                f"{stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+                f"{stats['misses']} misses"
+            )
+        results = get_vector_search_indexes().stats()
+        st.caption(
+            f"{embedded} · result cache: {results['hits']} hits, {results['misses']} misses"
+        )
+
+    with st.expander("Load data into a direct-access index"):
+        st.caption(
+            "Embeds rows from a table or a volume file and upserts them to the index above. "
+            "Progress is checkpointed, so loading the same source again resumes where it stopped."
+        )
+        source_type = st.radio(
+            "Source", ["Unity Catalog table", "Volume file"], horizontal=True
+        )
+        if source_type == "Unity Catalog table":
+            warehouse_paths = {
+                wh.name: wh.odbc_params.path for wh in w.warehouses.list()
+            }
+            ingest_warehouse = st.selectbox(
+                "SQL warehouse", [""] + list(warehouse_paths.keys())
+            )
+            ingest_table = st.text_input(
+                "Source table:", placeholder="catalog.schema.table"
+            )
+        else:
+            ingest_file = st.text_input(
+                "Source file:",
+                placeholder="/Volumes/catalog/schema/volume/rows.parquet",
+                help="A Parquet, CSV or JSON file.",
+            )
+        ingest_text_column = st.text_input(
+            "Text column to embed:",
+            placeholder="text",
+            help="Leave empty if the source already has the index's vector column.",
+        )
+        restart = st.checkbox("Start over instead of resuming")
+
+        if st.button("Load data"):
+            status = st.empty()
+            try:
+                if source_type == "Unity Catalog table":
+                    if not ingest_warehouse or not ingest_table:
+                        raise ValueError("Please select a warehouse and a table.")
+                    source = TableSource(
+                        get_sql_connection(warehouse_paths[ingest_warehouse]),
+                        ingest_table,
+                    )
+                else:
+                    if not ingest_file:
+                        raise ValueError("Please enter a file path.")
+                    source = VolumeFileSource(w, ingest_file)
+                progress = get_vector_index_ingest().run(
+                    index_name,
+                    source,
+                    text_column=ingest_text_column or None,
+                    restart=restart,
+                    on_progress=lambda p: status.info(
+                        f"{p.rows_resumed + p.rows_read:,} rows read · {p.rows_upserted:,} upserted · "
+                        f"{p.rows_failed:,} failed · {p.rows_per_second:,.0f} rows/s"
+                    ),
+                )
+                status.success(
+                    f"Upserted {progress.rows_upserted:,} rows in {progress.elapsed:.1f} s "
+                    f"({progress.embed_seconds:.1f} s embedding, {progress.requests} requests, "
+                    f"{progress.retries} retries)"
+                    + (
+                        f" after resuming at row {progress.rows_resumed:,}"
+                        if progress.rows_resumed
+                        else ""
+                    )
+                )
+                if progress.failed_keys:
+                    st.warning(
+                        f"{progress.rows_failed:,} rows failed, e.g. keys {', '.join(progress.failed_keys[:10])}. "
+                        "Load again to retry them."
+                    )
+            except Exception as e:
+                status.error(f"Error loading data: {e}")
 
 
 with tab2:
@@ -141,16 +352,20 @@ with tab3:
                     * `USE CATALOG` on the Catalog that contains the Vector Search index
                     * `USE SCHEMA` on the Schema that contains the Vector Search index
                     * `SELECT` on the Vector Search index
+                    * `CAN USE` on the SQL warehouse and `SELECT` on the source table, or `READ VOLUME` on the source volume (loading data)
+                    * `MODIFY` on a direct-access index (loading data)
                     """)
     with col2:
         st.markdown("""
                     **Databricks resources**
                     * Vector Search endpoint
                     * Vector Search index
+                    * SQL warehouse (loading data from a table)
                     """)
     with col3:
         st.markdown("""
                     **Dependencies**
                     * [Databricks SDK for Python](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`
+                    * [Databricks SQL Connector for Python](https://pypi.org/project/databricks-sql-connector/) - `databricks-sql-connector`
                     * [Streamlit](https://pypi.org/project/streamlit/) - `streamlit`
                     """)
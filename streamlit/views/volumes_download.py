@@ -1,9 +1,70 @@
+import io
 import os
+import posixpath
+import shutil
+import tempfile
+import pandas as pd
 import streamlit as st
 from databricks.sdk import WorkspaceClient
+from utils.volume_browser import VolumeBrowser, normalize_directory
+from utils.volume_export import ZipExporter
+from utils.transfer_progress import CHUNK_SIZE, DOWNLOAD, TransferTracker
+from utils.volume_sync import VolumeSync
 
 w = WorkspaceClient()
 
+# st.download_button reads the whole archive into memory before sending it,
+# so exports are capped by the size of the files going into them.
+MAX_EXPORT_BYTES = 512 * 1024 * 1024
+
+
+@st.cache_resource
+def get_volume_browser():
+    return VolumeBrowser(w, page_size=200, ttl=30)
+
+
+def get_transfer_tracker():
+    # Per browser session, so users only see their own transfers.
+    if "transfer_tracker" not in st.session_state:
+        st.session_state.transfer_tracker = TransferTracker()
+    return st.session_state.transfer_tracker
+
+
+@st.cache_resource
+def get_zip_exporter():
+    return ZipExporter(w, max_workers=8)
+
+
+def export_zip(file_paths, base_dir):
+    # Spooled to disk while the archive is built; the download button then
+    # loads it in full, which MAX_EXPORT_BYTES keeps in check.
+    archive = tempfile.TemporaryFile()
+    for chunk in get_zip_exporter().stream(file_paths, base_dir=base_dir):
+        archive.write(chunk)
+    archive.seek(0)
+    return archive
+
+
+def entries_to_frame(entries):
+    return pd.DataFrame(
+        [
+            {
+                "name": entry.name + ("/" if entry.is_directory else ""),
+                "size": entry.file_size,
+                "last_modified": entry.last_modified,
+                "path": entry.path,
+                "is_directory": bool(entry.is_directory),
+            }
+            for entry in entries
+        ],
+        columns=["name", "size", "last_modified", "path", "is_directory"],
+    )
+
+
+def open_browse_root():
+    st.session_state.browse_dir = normalize_directory(st.session_state.browse_root)
+
+
 st.header(body="Volumes", divider=True)
 st.subheader("Download a file")
 
@@ -14,16 +75,152 @@ st.write(
 tab1, tab2, tab3 = st.tabs(["**Try it**", "**Code snippet**", "**Requirements**"])
 
 with tab1:
+    with st.expander("Browse a volume", icon=":material/folder_open:"):
+        browser = get_volume_browser()
+        browse_root = st.text_input(
+            label="Volume or directory to browse:",
+            placeholder="/Volumes/main/marketing/raw_files",
+            key="browse_root",
+            on_change=open_browse_root,
+        )
+        browse_dir = st.session_state.get("browse_dir")
+
+        if browse_dir:
+            root_dir = normalize_directory(browse_root)
+            st.caption(f"`{browse_dir}`")
+            try:
+                listing = browser.list(browse_dir)
+                col_up, col_more, col_refresh = st.columns(3)
+                if col_up.button(
+                    "Up one level",
+                    icon=":material/arrow_upward:",
+                    disabled=browse_dir == root_dir,
+                ):
+                    st.session_state.browse_dir = posixpath.dirname(browse_dir)
+                    st.rerun()
+                if col_more.button(
+                    "Load more",
+                    icon=":material/expand_more:",
+                    disabled=listing.complete,
+                ):
+                    listing = browser.load_more(browse_dir)
+                if col_refresh.button("Refresh", icon=":material/refresh:"):
+                    browser.invalidate(browse_dir)
+                    listing = browser.list(browse_dir)
+
+                selection = st.dataframe(
+                    entries_to_frame(listing.entries),
+                    column_order=["name", "size", "last_modified"],
+                    hide_index=True,
+                    use_container_width=True,
+                    on_select="rerun",
+                    selection_mode="single-row",
+                    key=f"browser_{browse_dir}",
+                )
+                st.caption(
+                    f"{len(listing.entries)} entries loaded"
+                    + ("" if listing.complete else " (more available)")
+                )
+                if selection.selection.rows:
+                    entry = listing.entries[selection.selection.rows[0]]
+                    if entry.is_directory:
+                        st.session_state.browse_dir = normalize_directory(entry.path)
+                    else:
+                        st.session_state.download_file_path = entry.path
+                    # Clear the selection, or it fires again on the next run.
+                    st.session_state.pop(f"browser_{browse_dir}", None)
+                    st.rerun()
+            except Exception as e:
+                st.error(f"Error listing directory: {e}", icon="🚨")
+
+            prefix = st.text_input(
+                label="Search opened folders by name prefix:",
+                placeholder="leads_2025",
+            )
+            if prefix:
+                st.dataframe(
+                    entries_to_frame(browser.search(prefix, under=root_dir)),
+                    column_order=["path", "size", "last_modified"],
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
+            st.markdown("**Export several files as a zip archive**")
+            try:
+                loaded_sizes = {
+                    entry.path: entry.file_size or 0
+                    for entry in browser.list(browse_dir).files
+                }
+            except Exception:
+                loaded_sizes = {}
+            loaded_files = list(loaded_sizes)
+            export_folder = st.checkbox(
+                f"Export everything under `{browse_dir}` (recursive)"
+            )
+            export_paths = st.multiselect(
+                "Files to export:",
+                loaded_files,
+                format_func=posixpath.basename,
+                disabled=export_folder,
+            )
+            if st.button("Export as zip", icon=":material/folder_zip:"):
+                try:
+                    with st.spinner("Building archive..."):
+                        if export_folder:
+                            export_sizes = {
+                                posixpath.join(browse_dir, relative): state.size
+                                for relative, state in VolumeSync(w)
+                                .scan_remote(browse_dir)
+                                .items()
+                            }
+                            export_paths = list(export_sizes)
+                        else:
+                            export_sizes = loaded_sizes
+                        export_bytes = sum(export_sizes[path] for path in export_paths)
+                        if export_bytes > MAX_EXPORT_BYTES:
+                            raise ValueError(
+                                f"{export_bytes / 1e6:,.0f} MB selected, the limit is "
+                                f"{MAX_EXPORT_BYTES / 1e6:,.0f} MB. Export fewer files."
+                            )
+                        archive = (
+                            export_zip(export_paths, browse_dir)
+                            if export_paths
+                            else None
+                        )
+                    if archive:
+                        st.download_button(
+                            label=f"Download {len(export_paths)} files as zip",
+                            data=archive,
+                            file_name=f"{posixpath.basename(browse_dir)}.zip",
+                            mime="application/zip",
+                        )
+                    else:
+                        st.warning("Please select files to export.", icon="⚠️")
+                except Exception as e:
+                    st.error(f"Error exporting files: {e}", icon="🚨")
+
     download_file_path = st.text_input(
         label="Specify a path to a file in a Unity Catalog volume:",
         placeholder="/Volumes/main/marketing/raw_files/leads.csv",
+        key="download_file_path",
     )
 
     if st.button("Get file"):
         if download_file_path:
             try:
                 resp = w.files.download(download_file_path)
-                file_data = resp.contents.read()
+                buffer = io.BytesIO()
+                progress = st.progress(0.0, text="Downloading...")
+                with get_transfer_tracker().track(
+                    DOWNLOAD,
+                    download_file_path,
+                    resp.content_length,
+                    on_progress=lambda stats: progress.progress(
+                        stats.fraction or 0.0, text=stats.describe()
+                    ),
+                ) as transfer:
+                    shutil.copyfileobj(transfer.wrap(resp.contents), buffer, CHUNK_SIZE)
+                file_data = buffer.getvalue()
 
                 file_name = os.path.basename(download_file_path)
 
@@ -80,5 +277,6 @@ with tab3:
         st.markdown("""
                     **Dependencies**
                     * [Databricks SDK for Python](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`
+                    * [Pandas](https://pypi.org/project/pandas/) - `pandas`
                     * [Streamlit](https://pypi.org/project/streamlit/) - `streamlit`
                     """)
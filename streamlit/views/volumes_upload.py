@@ -1,8 +1,18 @@
 import os
 import io
+import posixpath
 import streamlit as st
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.catalog import SecurableType
+from utils.volume_browser import VolumeBrowser, normalize_directory
+from utils.volume_permissions import (
+    PERMISSIONS_VALIDATED,
+    VolumePermissionCache,
+    is_permission_error,
+)
+from utils.upload_manifest import DedupUploader, UploadManifest
+from utils.parquet_ingest import COMPRESSION_CODECS, ParquetIngest, detect_format
+from utils.transfer_progress import TransferTracker
+from utils.volume_sync import DOWNLOAD, LOCAL_SYNC_ROOT, UPLOAD, VolumeSync
 
 databricks_host = os.getenv("DATABRICKS_HOST") or os.getenv("DATABRICKS_HOSTNAME")
 w = WorkspaceClient()
@@ -17,27 +27,57 @@ st.write(
 tab1, tab2, tab3 = st.tabs(["**Try it**", "**Code snippet**", "**Requirements**"])
 
 
+@st.cache_resource
+def get_permission_cache():
+    return VolumePermissionCache(w, ttl=60)
+
+
 def check_upload_permissions(volume_name: str):
-    try:
-        volume = w.volumes.read(name=volume_name)
-        current_user = w.current_user.me()
-        grants = w.grants.get_effective(
-            securable_type=SecurableType.VOLUME,
-            full_name=volume.full_name,
-            principal=current_user.user_name,
-        )
+    return get_permission_cache().check(volume_name)
+
+
+@st.cache_resource
+def get_volume_browser():
+    return VolumeBrowser(w, page_size=200, ttl=30)
+
 
-        if not grants or not grants.privilege_assignments:
-            return "Insufficient permissions: No grants found."
+def get_transfer_tracker():
+    # Per browser session, so users only see their own transfers.
+    if "transfer_tracker" not in st.session_state:
+        st.session_state.transfer_tracker = TransferTracker()
+    return st.session_state.transfer_tracker
 
-        for assignment in grants.privilege_assignments:
-            for privilege in assignment.privileges:
-                if privilege.privilege.value in ["ALL_PRIVILEGES", "WRITE_VOLUME"]:
-                    return "Volume and permissions validated"
 
-        return "Insufficient permissions: Required privileges not found."
-    except Exception as e:
-        return f"Error: {e}"
+@st.cache_resource
+def get_upload_manifest():
+    return UploadManifest()
+
+
+@st.cache_resource
+def get_dedup_uploader():
+    return DedupUploader(w, get_upload_manifest())
+
+
+def get_parquet_ingest(compression: str):
+    return ParquetIngest(w, compression=compression)
+
+
+def get_volume_sync(max_workers: int):
+    return VolumeSync(
+        w,
+        get_upload_manifest(),
+        max_workers=max_workers,
+        tracker=get_transfer_tracker(),
+        local_root=LOCAL_SYNC_ROOT,
+    )
+
+
+def list_target_folders(volume_name: str):
+    try:
+        listing = get_volume_browser().list(volume_name)
+        return [entry.name for entry in listing.directories]
+    except Exception:
+        return []
 
 
 if "volume_check_success" not in st.session_state:
@@ -51,15 +91,39 @@ with tab1:
 
     if st.button(label="Check Volume and permissions", icon=":material/lock_reset:"):
         permission_result = check_upload_permissions(upload_volume_path.strip())
-        if permission_result == "Volume and permissions validated":
+        if permission_result == PERMISSIONS_VALIDATED:
             st.session_state.volume_check_success = True
-            st.success("Volume and permissions validated", icon="✅")
+            st.success(PERMISSIONS_VALIDATED, icon="✅")
         else:
             st.session_state.volume_check_success = False
             st.error(permission_result, icon="🚨")
 
     if st.session_state.volume_check_success:
         uploaded_file = st.file_uploader(label="Pick a file to upload")
+        target_folder = st.selectbox(
+            "Target folder",
+            [""] + list_target_folders(upload_volume_path),
+            format_func=lambda folder: folder or "(volume root)",
+        )
+        # The options exclude each other: a converted file is never compared to the manifest.
+        skip_unchanged = st.toggle(
+            "Skip upload if the file is unchanged",
+            key="skip_unchanged",
+            disabled=st.session_state.get("convert_to_parquet", False),
+            help="Compares a SHA-256 checksum and the remote file metadata against a local manifest of previous uploads. Not available while converting to Parquet.",
+        )
+        convert_to_parquet = st.toggle(
+            "Convert CSV/JSON to Parquet",
+            key="convert_to_parquet",
+            disabled=skip_unchanged,
+            help="Converts `.csv`, `.tsv` and newline-delimited `.json` files to Parquet while uploading. Other files are uploaded as they are. Not available while skipping unchanged files.",
+        )
+        parquet_compression = st.selectbox(
+            "Parquet compression",
+            COMPRESSION_CODECS,
+            index=COMPRESSION_CODECS.index("zstd"),
+            disabled=not convert_to_parquet,
+        )
 
         if st.button(
             f"Upload file to {upload_volume_path}", icon=":material/upload_file:"
@@ -77,18 +141,172 @@ with tab1:
                     catalog = parts[0]
                     schema = parts[1]
                     volume_name = parts[2]
-                    volume_file_path = (
-                        f"/Volumes/{catalog}/{schema}/{volume_name}/{file_name}"
+                    volume_file_path = "/".join(
+                        part
+                        for part in [
+                            normalize_directory(upload_volume_path),
+                            target_folder,
+                            file_name,
+                        ]
+                        if part
                     )
-                    w.files.upload(volume_file_path, binary_data, overwrite=True)
                     volume_url = f"https://{databricks_host}/explore/data/volumes/{catalog}/{schema}/{volume_name}"
-                    st.success(
-                        f"File '{file_name}' successfully uploaded to **{upload_volume_path}**. [Go to volume]({volume_url}).",
-                        icon="✅",
-                    )
+                    ingest_result = None
+                    progress = st.progress(0.0, text="Uploading...")
+                    with get_transfer_tracker().track(
+                        UPLOAD,
+                        volume_file_path,
+                        len(file_bytes),
+                        on_progress=lambda stats: progress.progress(
+                            stats.fraction or 0.0, text=stats.describe()
+                        ),
+                    ) as transfer:
+                        if convert_to_parquet and detect_format(file_name):
+                            ingest_result = get_parquet_ingest(
+                                parquet_compression
+                            ).upload(transfer.wrap(binary_data), volume_file_path)
+                            file_name = os.path.basename(ingest_result.file_path)
+                            uploaded = True
+                        elif skip_unchanged:
+                            # Hashing reads the raw bytes; only the upload counts as progress.
+                            result = get_dedup_uploader().upload(
+                                volume_file_path, binary_data, wrap=transfer.wrap
+                            )
+                            uploaded = result.uploaded
+                            if not uploaded:
+                                transfer.skip()
+                        else:
+                            w.files.upload(
+                                volume_file_path,
+                                transfer.wrap(binary_data),
+                                overwrite=True,
+                            )
+                            uploaded = True
+
+                    if uploaded:
+                        get_volume_browser().invalidate(
+                            volume_file_path.rsplit("/", 1)[0]
+                        )
+                        st.success(
+                            f"File '{file_name}' successfully uploaded to **{upload_volume_path}**. [Go to volume]({volume_url}).",
+                            icon="✅",
+                        )
+                        if ingest_result:
+                            st.caption(
+                                f"{ingest_result.rows:,} rows in {ingest_result.row_groups} row groups, "
+                                f"{ingest_result.input_bytes:,} → {ingest_result.output_bytes:,} bytes "
+                                f"({ingest_result.compression_ratio}x smaller)."
+                            )
+                    else:
+                        progress.empty()
+                        st.info(
+                            f"File '{file_name}' is unchanged in **{upload_volume_path}**, upload skipped. [Go to volume]({volume_url}).",
+                            icon="⏭️",
+                        )
                 except Exception as e:
+                    if is_permission_error(e):
+                        get_permission_cache().invalidate(upload_volume_path.strip())
+                        st.session_state.volume_check_success = False
                     st.error(f"Error uploading file: {e}", icon="🚨")
 
+    if st.session_state.volume_check_success and LOCAL_SYNC_ROOT:
+        with st.expander("Sync a local folder", icon=":material/sync:"):
+            st.write(
+                f"Transfer only the files that differ between a folder under `{LOCAL_SYNC_ROOT}` "
+                f"on the app's file system and a directory of **{upload_volume_path}**."
+            )
+            sync_local_dir = st.text_input(
+                label="Local folder (relative to the sync root):",
+                placeholder="daily_drop",
+            )
+            sync_volume_dir = st.text_input(
+                label="Volume directory:",
+                placeholder="/Volumes/main/marketing/raw_files/daily_drop",
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                sync_direction = st.radio(
+                    "Direction",
+                    [UPLOAD, DOWNLOAD],
+                    format_func=lambda d: (
+                        "Local → volume" if d == UPLOAD else "Volume → local"
+                    ),
+                )
+                sync_workers = st.slider("Concurrent transfers", 1, 32, 8)
+            with col2:
+                sync_delete = st.checkbox(
+                    "Delete files that are not on the source",
+                )
+                sync_confirm_empty = st.checkbox(
+                    "Also if the source is empty (deletes everything on the target)",
+                    disabled=not sync_delete,
+                )
+                sync_dry_run = st.checkbox("Dry run (only report the differences)")
+
+            if st.button("Run sync", icon=":material/sync:"):
+                volume_root = normalize_directory(upload_volume_path)
+                sync_volume_dir = normalize_directory(sync_volume_dir)
+                if not sync_local_dir or not sync_volume_dir:
+                    st.warning(
+                        "Please specify a local folder and a volume directory.",
+                        icon="⚠️",
+                    )
+                elif (
+                    check_upload_permissions(upload_volume_path.strip())
+                    != PERMISSIONS_VALIDATED
+                ):
+                    st.session_state.volume_check_success = False
+                    st.error(
+                        "Please check the volume and permissions again.", icon="🚨"
+                    )
+                elif (
+                    posixpath.commonpath([volume_root, sync_volume_dir]) != volume_root
+                ):
+                    st.warning(
+                        f"The volume directory must be in {volume_root}.", icon="⚠️"
+                    )
+                else:
+                    progress = st.progress(0.0, text="Comparing folders...")
+                    try:
+                        report = get_volume_sync(sync_workers).run(
+                            sync_local_dir.strip(),
+                            sync_volume_dir,
+                            direction=sync_direction,
+                            delete=sync_delete,
+                            dry_run=sync_dry_run,
+                            confirm_empty_source=sync_confirm_empty,
+                            on_progress=lambda done, total, action: progress.progress(
+                                done / total,
+                                text=f"{done}/{total} {action.relative_path}",
+                            ),
+                        )
+                        progress.progress(1.0, text="Sync complete")
+                        get_volume_browser().invalidate(sync_volume_dir)
+                        summary = report.summary()
+                        if report.failed:
+                            st.error(
+                                f"{len(report.failed)} transfers failed.", icon="🚨"
+                            )
+                        st.json(summary)
+                        st.dataframe(report.to_records(), use_container_width=True)
+                    except Exception as e:
+                        st.error(f"Error syncing folder: {e}", icon="🚨")
+
+    with st.expander("Recent transfers", icon=":material/speed:"):
+        st.dataframe(
+            [stats.to_dict() for stats in get_transfer_tracker().recent()],
+            column_order=[
+                "direction",
+                "path",
+                "status",
+                "bytes_transferred",
+                "elapsed",
+                "throughput",
+                "error",
+            ],
+            use_container_width=True,
+        )
+
 with tab2:
     st.code("""
     import io
@@ -134,10 +352,12 @@ with tab3:
         st.markdown("""
                     **Databricks resources**
                     * Unity Catalog volume
+                    * Local folder sync: the `VOLUME_SYNC_LOCAL_ROOT` environment variable, set to the directory the app may sync
                     """)
     with col3:
         st.markdown("""
                     **Dependencies**
                     * [Databricks SDK for Python](https://pypi.org/project/databricks-sdk/) - `databricks-sdk`
+                    * [PyArrow](https://pypi.org/project/pyarrow/) - `pyarrow` (Parquet conversion)
                     * [Streamlit](https://pypi.org/project/streamlit/) - `streamlit`
                     """)